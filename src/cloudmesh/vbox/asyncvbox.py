@@ -0,0 +1,261 @@
+"""
+An asyncio client for VirtualBox with the same results as Vbox.
+"""
+
+import asyncio
+import json
+import time
+
+from cloudmesh.vbox.parse import parse_info
+from cloudmesh.vbox.parse import parse_list
+from cloudmesh.vbox.parse import parse_status
+from cloudmesh.vbox.ssh import SshPool
+from cloudmesh.vbox.wait import backoff
+
+
+class AsyncVbox:
+    """
+    Coroutine counterpart of Vbox.
+
+    Commands are started with asyncio.create_subprocess_exec, so thousands
+    of operations can be in flight without a thread per call. The number of
+    concurrent child processes is bounded by limit.
+    """
+
+    def __init__(self, username=None, limit=64, output="json", ssh_pool=None):
+        """
+        Initialize the AsyncVbox class.
+
+        Args:
+            username (str, optional): The username used by run. Defaults to None.
+            limit (int, optional): The maximum number of concurrent child
+                processes. Defaults to 64.
+            output (str, optional): The form of structured results, "json"
+                or "dict", as in Vbox. Defaults to "json".
+            ssh_pool (bool or SshPool, optional): Reuse one multiplexed ssh
+                connection per VM for run and ssh. Defaults to None.
+        """
+        if output not in ["json", "dict"]:
+            raise ValueError(f"Unknown output: {output}")
+        self.username = username
+        self.limit = limit
+        self.output = output
+        if ssh_pool is True:
+            ssh_pool = SshPool()
+        self.ssh_pool = ssh_pool or None
+        self._semaphore = None
+
+    def _result(self, data):
+        """
+        Return a structured result in the configured output form.
+
+        Args:
+            data (dict or list): The result.
+
+        Returns:
+            str, dict or list: The result as JSON string if output is "json",
+            otherwise unchanged.
+        """
+        if self.output == "json":
+            return json.dumps(data)
+        return data
+
+    async def _run(self, command, timeout=None):
+        """
+        Run a shell command.
+
+        Args:
+            command (list): The command to run as a list of strings.
+            timeout (float, optional): Seconds after which the command is
+                killed. Defaults to None.
+
+        Returns:
+            str: The output of the command.
+
+        Raises:
+            asyncio.TimeoutError: If the command did not finish in time.
+        """
+        if self._semaphore is None:
+            # created lazily so it binds to the running event loop
+            self._semaphore = asyncio.Semaphore(self.limit)
+        async with self._semaphore:
+            process = await asyncio.create_subprocess_exec(
+                *command,
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+            try:
+                stdout, _ = await asyncio.wait_for(process.communicate(), timeout)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise
+        return stdout.decode()
+
+    async def list(self, **kwargs):
+        """
+        List all VMs.
+
+        Args:
+            kwargs (dict): Additional keyword arguments.
+
+        Returns:
+            str or list: The list of VMs, as JSON string unless output is "dict".
+        """
+        output = await self._run(["VBoxManage", "list", "vms"])
+        return self._result(parse_list(output))
+
+    async def info(self, name=None, typed=False, keys=None):
+        """
+        Get information about a VM.
+
+        Args:
+            name (str, optional): The name of the VM. Defaults to None.
+            typed (bool, optional): Convert numbers and on/off values and group
+                NICs, storage controllers and disks. Defaults to False.
+            keys (list, optional): Only return these keys. Defaults to None.
+
+        Returns:
+            str or dict: The information about the VM, as JSON string unless
+            output is "dict".
+        """
+        if name is None:
+            raise ValueError("VM name must be provided")
+
+        output = await self._run(
+            ["VBoxManage", "showvminfo", name, "--machinereadable"]
+        )
+        return self._result(parse_info(output, typed=typed, keys=keys))
+
+    async def status(self, vm=None):
+        """
+        Get the status of a VM.
+
+        Args:
+            vm (str, optional): The name of the VM. Defaults to None.
+
+        Returns:
+            str: The status of the VM.
+        """
+        if vm is None:
+            raise ValueError("VM name must be provided")
+
+        output = await self._run(["VBoxManage", "showvminfo", vm])
+        return parse_status(output)
+
+    async def start(self, name=None, timeout=None):
+        """
+        Start a VM.
+
+        Args:
+            name (str, optional): The name of the VM. Defaults to None.
+            timeout (float, optional): Seconds after which the command is killed. Defaults to None.
+
+        Returns:
+            str: The output of the VBoxManage startvm command.
+        """
+        if name is None:
+            raise ValueError("VM name must be provided")
+
+        return await self._run(["VBoxManage", "startvm", name], timeout=timeout)
+
+    async def stop(self, name=None, timeout=None):
+        """
+        Stop a VM.
+
+        Args:
+            name (str, optional): The name of the VM. Defaults to None.
+            timeout (float, optional): Seconds after which the command is killed. Defaults to None.
+
+        Returns:
+            str: The output of the VBoxManage controlvm command.
+        """
+        if name is None:
+            raise ValueError("VM name must be provided")
+
+        return await self._run(
+            ["VBoxManage", "controlvm", name, "poweroff"], timeout=timeout
+        )
+
+    async def wait(self, vm=None, state=None, interval=5, timeout=60):
+        """
+        Wait for a VM to reach a certain state.
+
+        Args:
+            vm (str, optional): The VM to wait for. Defaults to None.
+            state (str, optional): The state to wait for. Defaults to None.
+            interval (int, optional): The maximal interval between checks.
+                Checks start 0.1 seconds apart and back off exponentially. Defaults to 5.
+            timeout (int, optional): The maximum time to wait. Defaults to 60.
+
+        Returns:
+            str or dict: The vm, state and status, as JSON string unless output
+            is "dict".
+        """
+        if vm is None or state is None:
+            raise ValueError("Both VM and state must be provided")
+
+        delays = backoff(interval)
+        start_time = time.time()
+        while True:
+            current_state = await self.status(vm)
+            if current_state == state:
+                output = {"vm": vm, "state": state, "status": "reached"}
+                return self._result(output)
+            elapsed = time.time() - start_time
+            if elapsed > timeout:
+                output = {"vm": vm, "state": state, "status": "timeout"}
+                return self._result(output)
+
+            await asyncio.sleep(min(next(delays), timeout - elapsed))
+
+    def _ssh_command(self, destination, command=None):
+        """
+        Build an ssh command, using the pooled connection if enabled.
+
+        Args:
+            destination (str): The destination, e.g. user@host.
+            command (str, optional): The remote command. Defaults to None.
+
+        Returns:
+            list: The ssh command as a list of strings.
+        """
+        if self.ssh_pool is not None:
+            return self.ssh_pool.command(destination, command)
+        ssh_command = ["ssh", destination]
+        if command:
+            ssh_command.append(command)
+        return ssh_command
+
+    async def ssh(self, vm=None, username=None, command=None):
+        """
+        SSH into a VM.
+
+        Args:
+            vm (str, optional): The IP address of the VM to SSH into. Defaults to None.
+            username (str, optional): The username to use for SSH. Defaults to None.
+            command (str, optional): The command to run. Defaults to None.
+
+        Returns:
+            str: The output of the SSH command.
+        """
+        if vm is None or username is None:
+            raise ValueError("Both VM IP address and username must be provided")
+
+        return await self._run(self._ssh_command(f"{username}@{vm}", command))
+
+    async def run(self, vm=None, command=None):
+        """
+        Run a command on a VM.
+
+        Args:
+            vm (str, optional): The VM to run the command on. Defaults to None.
+            command (str, optional): The command to run. Defaults to None.
+
+        Returns:
+            str: The output of the command.
+        """
+        if vm is None or command is None:
+            raise ValueError("Both VM and command must be provided")
+
+        return await self._run(self._ssh_command(f"{self.username}@{vm}", command))
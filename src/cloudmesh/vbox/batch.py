@@ -0,0 +1,155 @@
+"""
+Run an operation for many VMs on a bounded thread pool.
+"""
+
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+
+from cloudmesh.common.parameter import Parameter
+
+
+def expand(names):
+    """
+    Expand VM names given as a list or as a parameter pattern.
+
+    Args:
+        names (str or list): A list of names or a pattern such as "vm[001-200]".
+
+    Returns:
+        list: The list of names.
+    """
+    if isinstance(names, str):
+        return Parameter.expand(names)
+    return list(names)
+
+
+class Batch:
+    """
+    Applies a function to many VMs concurrently.
+
+    The number of concurrent calls is bounded overall by parallelism and per
+    host by per_host. Every VM gets an entry in the report, failures do not
+    stop the other VMs.
+    """
+
+    def __init__(self, parallelism=10, per_host=None, host=None):
+        """
+        Initialize the Batch.
+
+        Args:
+            parallelism (int, optional): The size of the thread pool. Defaults to 10.
+            per_host (int, optional): The maximum number of concurrent calls
+                per host. Defaults to None, which means no extra limit.
+            host (dict or callable, optional): Maps a VM name to its host.
+                Defaults to treating all VMs as local.
+        """
+        self.parallelism = parallelism
+        self.per_host = per_host
+        if isinstance(host, dict):
+            # VMs missing from the mapping are local
+            mapping = host
+            host = lambda name: mapping.get(name, "localhost")  # noqa: E731
+        self.host = host or (lambda name: "localhost")
+        self._limits = {}
+        self._lock = threading.Lock()
+
+    def _limit(self, name):
+        host = self.host(name)
+        with self._lock:
+            if host not in self._limits:
+                self._limits[host] = threading.BoundedSemaphore(self.per_host)
+            return self._limits[host]
+
+    def _call(self, function, name, timeout):
+        entry = {"name": name, "status": "ok", "result": None, "error": None}
+        start = time.time()
+        limit = self._limit(name) if self.per_host else None
+        try:
+            if limit is not None:
+                limit.acquire()
+            try:
+                entry["result"] = function(name, timeout=timeout)
+            finally:
+                if limit is not None:
+                    limit.release()
+        except subprocess.TimeoutExpired:
+            entry["status"] = "timeout"
+            entry["error"] = f"timeout after {timeout}s"
+        except subprocess.CalledProcessError as e:
+            entry["status"] = "error"
+            entry["error"] = (e.stderr or str(e)).strip()
+        except Exception as e:
+            entry["status"] = "error"
+            entry["error"] = str(e)
+        entry["time"] = time.time() - start
+        return entry
+
+    def run(self, function, names, timeout=None):
+        """
+        Call function(name, timeout=timeout) for every name.
+
+        Args:
+            function (callable): The operation to apply to a single VM.
+            names (str or list): A list of names or a parameter pattern.
+            timeout (float, optional): The timeout per VM in seconds. Defaults to None.
+
+        Returns:
+            list: One dict per VM with name, status ("ok", "error" or
+            "timeout"), result, error and time, in the order of names.
+        """
+        names = expand(names)
+        with ThreadPoolExecutor(max_workers=self.parallelism) as pool:
+            futures = [
+                pool.submit(self._call, function, name, timeout) for name in names
+            ]
+            return [future.result() for future in futures]
+
+    def stream(self, function, names, timeout=None):
+        """
+        Call function(name, timeout=timeout) for every name and yield the
+        results as they complete.
+
+        Args:
+            function (callable): The operation to apply to a single VM.
+            names (str or list): A list of names or a parameter pattern.
+            timeout (float, optional): The timeout per VM in seconds. Defaults to None.
+
+        Yields:
+            dict: The entry of a VM as described in run, in completion order.
+        """
+        names = expand(names)
+        with ThreadPoolExecutor(max_workers=self.parallelism) as pool:
+            futures = [
+                pool.submit(self._call, function, name, timeout) for name in names
+            ]
+            try:
+                for future in as_completed(futures):
+                    yield future.result()
+            finally:
+                # the consumer stopped early, do not start the remaining calls
+                for future in futures:
+                    future.cancel()
+
+
+def aggregate(entries):
+    """
+    Group entries with identical status and result, as dshbak does for pdsh.
+
+    Args:
+        entries (iterable): Entries as returned by Batch.run or Batch.stream.
+
+    Returns:
+        list: One dict per distinct status and result with the sorted names
+        of the VMs, status, result and error.
+    """
+    groups = {}
+    for entry in entries:
+        key = (entry["status"], entry["result"], entry["error"])
+        groups.setdefault(key, []).append(entry["name"])
+    return [
+        {"names": sorted(names), "status": status, "result": result, "error": error}
+        for (status, result, error), names in groups.items()
+    ]
@@ -0,0 +1,579 @@
+"""
+Benchmarks for Vbox that run against the fake VBoxManage.
+
+Run them with::
+
+    python -m cloudmesh.vbox.benchmark parser
+    python -m cloudmesh.vbox.benchmark memory
+    python -m cloudmesh.vbox.benchmark script
+    python -m cloudmesh.vbox.benchmark importtime
+    python -m cloudmesh.vbox.benchmark boot
+    python -m cloudmesh.vbox.benchmark suite --vms=1,10,100 --output=results.json
+    python -m cloudmesh.vbox.benchmark suite --compare=baseline.json
+
+The suite measures the latency and throughput of the main Vbox methods for
+a growing number of simulated VMs and writes the results as JSON, so runs
+of different releases can be compared.
+"""
+
+import argparse
+import json
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from importlib import metadata
+
+from cloudmesh.vbox.fake import FakeSsh
+from cloudmesh.vbox.fake import FakeVBoxManage
+from cloudmesh.vbox.parse import parse_info
+from cloudmesh.vbox.record import VMRecord
+from cloudmesh.vbox.vbox import Vbox
+
+# output of VBoxManage showvminfo --machinereadable of a VirtualBox 7.0 VM
+SHOWVMINFO = r"""name="ubuntu-22.04"
+Encryption="disabled"
+groups="/"
+ostype="Ubuntu (64-bit)"
+UUID="3f1e6a52-9c4d-4b8e-a1f0-5d2c7b9e8a41"
+CfgFile="/home/cloudmesh/VirtualBox VMs/ubuntu-22.04/ubuntu-22.04.vbox"
+SnapFldr="/home/cloudmesh/VirtualBox VMs/ubuntu-22.04/Snapshots"
+LogFldr="/home/cloudmesh/VirtualBox VMs/ubuntu-22.04/Logs"
+hardwareuuid="3f1e6a52-9c4d-4b8e-a1f0-5d2c7b9e8a41"
+memory=2048
+pagefusion="off"
+vram=16
+cpuexecutioncap=100
+hpet="off"
+cpu-profile="host"
+chipset="piix3"
+firmware="BIOS"
+cpus=2
+pae="off"
+longmode="on"
+triplefaultreset="off"
+apic="on"
+x2apic="on"
+nested-hw-virt="off"
+cpuid-portability-level=0
+bootmenu="messageandmenu"
+boot1="floppy"
+boot2="dvd"
+boot3="disk"
+boot4="none"
+acpi="on"
+ioapic="on"
+biosapic="apic"
+biossystemtimeoffset=0
+BIOS NVRAM File="/home/cloudmesh/VirtualBox VMs/ubuntu-22.04/ubuntu-22.04.nvram"
+rtcuseutc="on"
+hwvirtex="on"
+nestedpaging="on"
+largepages="off"
+vtxvpid="on"
+vtxux="on"
+virtvmsavevmload="on"
+iommu="none"
+paravirtprovider="default"
+effparavirtprovider="kvm"
+VMState="running"
+VMStateChangeTime="2024-03-01T10:11:12.345000000"
+graphicscontroller="vmsvga"
+monitorcount=1
+accelerate3d="off"
+accelerate2dvideo="off"
+teleporterenabled="off"
+teleporterport=0
+teleporteraddress=""
+teleporterpassword=""
+tracing-enabled="off"
+tracing-allow-vm-access="off"
+tracing-config=""
+autostart-enabled="off"
+autostart-delay=0
+defaultfrontend=""
+vmprocpriority="default"
+storagecontrollername0="IDE"
+storagecontrollertype0="PIIX4"
+storagecontrollerinstance0="0"
+storagecontrollermaxportcount0="2"
+storagecontrollerportcount0="2"
+storagecontrollerbootable0="on"
+storagecontrollername1="SATA"
+storagecontrollertype1="IntelAhci"
+storagecontrollerinstance1="0"
+storagecontrollermaxportcount1="30"
+storagecontrollerportcount1="30"
+storagecontrollerbootable1="on"
+"IDE-0-0"="none"
+"IDE-0-1"="none"
+"IDE-1-0"="emptydrive"
+"IDE-IsEjected"="off"
+"IDE-1-1"="none"
+{disks}natnet1="nat"
+macaddress1="080027D2F6B2"
+cableconnected1="on"
+nic1="nat"
+nictype1="82540EM"
+nicspeed1="0"
+mtu="0"
+sockSnd="64"
+sockRcv="64"
+tcpWndSnd="64"
+tcpWndRcv="64"
+Forwarding(0)="ssh,tcp,,2222,,22"
+hostonlyadapter2="vboxnet0"
+macaddress2="0800279A1C3E"
+cableconnected2="on"
+nic2="hostonly"
+nictype2="82540EM"
+nicspeed2="0"
+nic3="none"
+nic4="none"
+nic5="none"
+nic6="none"
+nic7="none"
+nic8="none"
+hidpointing="ps2mouse"
+hidkeyboard="ps2kbd"
+uart1="off"
+uart2="off"
+uart3="off"
+uart4="off"
+lpt1="off"
+lpt2="off"
+audio="default"
+audio_out="off"
+audio_in="off"
+clipboard="disabled"
+draganddrop="disabled"
+SessionName="headless"
+VideoMode="1024,768,32"@0,0 1
+vrde="off"
+usb="off"
+ehci="off"
+xhci="off"
+recording_enabled="off"
+recording_screens=1
+description="golden image, owner \"cloudmesh\", flags a=b"
+GuestMemoryBalloon=0
+GuestOSType="Linux26_64"
+GuestAdditionsRunLevel=2
+GuestAdditionsVersion="7.0.14 r161095"
+GuestAdditionsFacility_VirtualBox Base Driver=50,1709287872000
+GuestAdditionsFacility_VirtualBox System Service=50,1709287875000
+GuestAdditionsFacility_Seamless Mode=0,1709287872000
+GuestAdditionsFacility_Graphics Mode=0,1709287872000
+"""
+
+
+def calls_per_second(function, calls):
+    """
+    Measure how often a function can be called per second.
+
+    Args:
+        function (callable): The function to call without arguments.
+        calls (int): The number of calls.
+
+    Returns:
+        float: The calls per second.
+    """
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return calls / (time.perf_counter() - start)
+
+
+def showvminfo(disks=28):
+    """
+    Build a large showvminfo --machinereadable output.
+
+    Args:
+        disks (int, optional): The number of SATA disks of the VM. Defaults to 28.
+
+    Returns:
+        str: The output.
+    """
+    lines = []
+    for port in range(disks):
+        path = f"/home/cloudmesh/VirtualBox VMs/ubuntu-22.04/disk{port}.vdi"
+        lines.append(f'"SATA-{port}-0"="{path}"\n')
+        lines.append(
+            f'"SATA-ImageUUID-{port}-0"="6a1f0e2b-0000-4000-8000-{port:012d}"\n'
+        )
+    return SHOWVMINFO.replace("{disks}", "".join(lines))
+
+
+def legacy_parse_info(output):
+    # the line by line parser used by Vbox.info before cloudmesh.vbox.parse
+    info = {}
+    for line in output.splitlines():
+        match = re.match(r'^"?(.+?)"?="?(.*?)"?$', line)
+        if match:
+            info[match.group(1)] = match.group(2)
+    return info
+
+
+def parser(calls=2000, disks=28):
+    """
+    Compare the machine readable parsers.
+
+    Args:
+        calls (int, optional): The number of parses per variant. Defaults to 2000.
+        disks (int, optional): The number of disks in the fixture. Defaults to 28.
+
+    Returns:
+        dict: The parses per second for each variant.
+    """
+    output = showvminfo(disks=disks)
+    variants = {
+        "legacy": lambda: legacy_parse_info(output),
+        "flat": lambda: parse_info(output),
+        "typed": lambda: parse_info(output, typed=True),
+        "lazy": lambda: parse_info(output, keys=["VMState"]),
+    }
+    return {
+        name: calls_per_second(function, calls) for name, function in variants.items()
+    }
+
+
+def allocated(function):
+    """
+    Measure the memory retained by the result of a function.
+
+    Args:
+        function (callable): The function to call without arguments.
+
+    Returns:
+        int: The bytes still allocated while the result is alive.
+    """
+    tracemalloc.start()
+    result = function()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return size
+
+
+def memory(vms=1000, disks=4):
+    """
+    Compare the memory of per-VM info dicts with VMRecord objects.
+
+    Args:
+        vms (int, optional): The number of VMs. Defaults to 1000.
+        disks (int, optional): The number of disks per VM. Defaults to 4.
+
+    Returns:
+        dict: The bytes per VM for each form.
+    """
+    outputs = [
+        showvminfo(disks=disks).replace("ubuntu-22.04", f"vm{i}") for i in range(vms)
+    ]
+    forms = {
+        "dict": lambda: [parse_info(output) for output in outputs],
+        "typed dict": lambda: [parse_info(output, typed=True) for output in outputs],
+        "record": lambda: [
+            VMRecord.from_info(parse_info(output, typed=True)) for output in outputs
+        ],
+    }
+    return {name: allocated(function) / vms for name, function in forms.items()}
+
+
+def script(lines=50, latency=0.05):
+    """
+    Compare the wall-clock time of the script modes.
+
+    Args:
+        lines (int, optional): The number of lines of the script. Defaults to 50.
+        latency (float, optional): Seconds the fake ssh takes per new
+            connection. Defaults to 0.05.
+
+    Returns:
+        dict: The seconds per script for each mode.
+    """
+    text = "\n".join(f"echo line {i}" for i in range(lines))
+    results = {}
+    with FakeSsh(latency=latency):
+        variants = {
+            "line": (Vbox(username="cloudmesh"), "line"),
+            "line pooled": (Vbox(username="cloudmesh", ssh_pool=True), "line"),
+            "stream": (Vbox(username="cloudmesh"), "stream"),
+        }
+        for name, (vbox, mode) in variants.items():
+            start = time.perf_counter()
+            vbox.script("vm1", text, mode=mode)
+            results[name] = time.perf_counter() - start
+            vbox.close()
+    return results
+
+
+def boot(vms=5, cold=2.0, restore=0.2):
+    """
+    Compare the time to a running VM of a cold boot and a fast start.
+
+    Both variants create linked clones of a golden VM. The cold ones boot,
+    the fast ones are cloned from the booted snapshot and resume it.
+
+    Args:
+        vms (int, optional): The number of clones per variant. Defaults to 5.
+        cold (float, optional): Seconds the fake takes for a cold boot. Defaults to 2.0.
+        restore (float, optional): Seconds the fake takes to resume a
+            saved VM. Defaults to 0.2.
+
+    Returns:
+        dict: The seconds from start to running per VM for each variant,
+        and the one-time cost of the booted snapshot.
+    """
+    results = {}
+    with FakeVBoxManage(vms=1, prefix="golden", boot=cold, restore=restore):
+        vbox = Vbox(output="dict")
+        start = time.perf_counter()
+        vbox.boot_snapshot("golden1")
+        results["snapshot"] = time.perf_counter() - start
+        for name, fast in [("cold", False), ("fast", True)]:
+            total = 0
+            for i in range(vms):
+                clone = f"{name}{i}"
+                vbox.create(clone, "golden1", fast=fast)
+                start = time.perf_counter()
+                vbox.start(clone)
+                vbox.wait(clone, "running", interval=0.1)
+                total += time.perf_counter() - start
+            results[name] = total / vms
+    return results
+
+
+def importtime(module="cloudmesh.vbox.command.vbox", runs=5, top=5):
+    """
+    Measure the import time of a module with python -X importtime.
+
+    Every run uses a new interpreter, so nothing is imported already.
+
+    Args:
+        module (str, optional): The module. Defaults to the cms vbox plugin.
+        runs (int, optional): The number of interpreters. Defaults to 5.
+        top (int, optional): The number of slowest imports to report. Defaults to 5.
+
+    Returns:
+        dict: The median cumulative import time in seconds and the slowest
+        imports of the last run with their cumulative seconds.
+    """
+    totals = []
+    for _ in range(runs):
+        process = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        imports = []
+        for line in process.stderr.splitlines():
+            if line.startswith("import time:") and "|" in line:
+                _, cumulative, name = line[len("import time:") :].split("|")
+                if not cumulative.strip().isdigit():
+                    continue
+                imports.append((name.strip(), int(cumulative) / 1e6))
+                if name[1:2] != " " and name.strip() != module:
+                    # a top level import of the interpreter startup
+                    imports = []
+        totals.append(imports[-1][1])
+    imports.sort(key=lambda entry: entry[1], reverse=True)
+    return {"seconds": statistics.median(totals), "top": imports[1 : top + 1]}
+
+
+def latency(function, calls):
+    """
+    Measure the latency of a function.
+
+    Args:
+        function (callable): The function to call without arguments.
+        calls (int): The number of calls.
+
+    Returns:
+        dict: The calls, total seconds, calls per second and the p50, p95
+        and max latency in seconds.
+    """
+    times = []
+    for _ in range(calls):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    total = sum(times)
+    percentiles = statistics.quantiles(times, n=20) if calls > 1 else times * 19
+    return {
+        "calls": calls,
+        "seconds": total,
+        "throughput": calls / total,
+        "p50": statistics.median(times),
+        "p95": percentiles[18],
+        "max": max(times),
+    }
+
+
+def suite(vms=(1, 10, 100), calls=20, latency_vboxmanage=0.0, latency_ssh=0.0, size=0):
+    """
+    Measure list, info, status, wait, run and script for growing numbers of VMs.
+
+    Args:
+        vms (tuple, optional): The numbers of simulated VMs. Defaults to (1, 10, 100).
+        calls (int, optional): The calls per method. Defaults to 20.
+        latency_vboxmanage (float, optional): Seconds the fake VBoxManage
+            takes per call. Defaults to 0.0.
+        latency_ssh (float, optional): Seconds the fake ssh takes per new
+            connection. Defaults to 0.0.
+        size (int, optional): Additional lines in the showvminfo output. Defaults to 0.
+
+    Returns:
+        dict: The parameters, the environment and one result per method
+        and number of VMs.
+    """
+    script = "\n".join(f"echo line {i}" for i in range(10))
+    results = []
+    for count in vms:
+        with FakeVBoxManage(vms=count, latency=latency_vboxmanage, size=size), FakeSsh(
+            latency=latency_ssh
+        ):
+            vbox = Vbox(output="dict", username="cloudmesh")
+            first = vbox.list()[0]["name"]
+            vbox.start(first)
+            methods = {
+                "list": lambda: vbox.list(),
+                "info": lambda: vbox.info(first),
+                "status": lambda: vbox.status(first),
+                "wait": lambda: vbox.wait(first, "running", timeout=10),
+                "run": lambda: vbox.run(first, "echo hello"),
+                "script": lambda: vbox.script(first, script, mode="stream"),
+            }
+            for name, function in methods.items():
+                result = latency(function, calls)
+                results.append({"method": name, "vms": count, **result})
+            vbox.close()
+    try:
+        version = metadata.version("cloudmesh-vbox")
+    except metadata.PackageNotFoundError:
+        version = None
+    return {
+        "version": version,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "parameters": {
+            "vms": list(vms),
+            "calls": calls,
+            "latency_vboxmanage": latency_vboxmanage,
+            "latency_ssh": latency_ssh,
+            "size": size,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=0.1):
+    """
+    Compare two suite results.
+
+    Args:
+        baseline (dict): The earlier result of suite.
+        current (dict): The new result of suite.
+        threshold (float, optional): The relative increase of the p50
+            latency that counts as regression. Defaults to 0.1.
+
+    Returns:
+        list: One dict per method and number of VMs in both results with
+        both p50 latencies, their ratio and whether it is a regression.
+    """
+    before = {(r["method"], r["vms"]): r for r in baseline["results"]}
+    comparison = []
+    for result in current["results"]:
+        old = before.get((result["method"], result["vms"]))
+        if old is None:
+            continue
+        ratio = result["p50"] / old["p50"]
+        comparison.append(
+            {
+                "method": result["method"],
+                "vms": result["vms"],
+                "baseline": old["p50"],
+                "current": result["p50"],
+                "ratio": ratio,
+                "regression": ratio > 1 + threshold,
+            }
+        )
+    return comparison
+
+
+def main():
+    argparser = argparse.ArgumentParser(description="Benchmark cloudmesh-vbox")
+    argparser.add_argument(
+        "benchmark",
+        choices=[
+            "parser",
+            "memory",
+            "script",
+            "importtime",
+            "boot",
+            "suite",
+        ],
+    )
+    argparser.add_argument("--calls", type=int)
+    argparser.add_argument("--vms", default="1,10,100")
+    argparser.add_argument("--latency", type=float, default=0.0)
+    argparser.add_argument("--ssh-latency", type=float, default=0.0)
+    argparser.add_argument("--size", type=int, default=0)
+    argparser.add_argument("--output")
+    argparser.add_argument("--compare")
+    args = argparser.parse_args()
+
+    if args.benchmark == "parser":
+        for name, rate in parser(calls=args.calls or 200).items():
+            print(f"{name:<12} {rate:10.1f} parses/s")
+    elif args.benchmark == "memory":
+        for name, size in memory().items():
+            print(f"{name:<12} {size:10.0f} bytes/VM")
+    elif args.benchmark == "script":
+        for name, seconds in script().items():
+            print(f"{name:<12} {seconds:10.3f} s")
+    elif args.benchmark == "importtime":
+        result = importtime()
+        print(f"{'total':<40} {result['seconds'] * 1000:10.1f} ms")
+        for name, seconds in result["top"]:
+            print(f"{name:<40} {seconds * 1000:10.1f} ms")
+    elif args.benchmark == "boot":
+        for name, seconds in boot().items():
+            print(f"{name:<12} {seconds:10.3f} s")
+    elif args.benchmark == "suite":
+        result = suite(
+            vms=[int(count) for count in args.vms.split(",")],
+            calls=args.calls or 20,
+            latency_vboxmanage=args.latency,
+            latency_ssh=args.ssh_latency,
+            size=args.size,
+        )
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(result, f, indent=2)
+        for entry in result["results"]:
+            print(
+                f"{entry['method']:<8} {entry['vms']:>6} VMs "
+                f"{entry['throughput']:10.1f} calls/s "
+                f"p50 {entry['p50'] * 1000:8.2f} ms p95 {entry['p95'] * 1000:8.2f} ms"
+            )
+        if args.compare:
+            with open(args.compare) as f:
+                baseline = json.load(f)
+            regressions = 0
+            for entry in compare(baseline, result):
+                flag = "REGRESSION" if entry["regression"] else ""
+                print(
+                    f"{entry['method']:<8} {entry['vms']:>6} VMs "
+                    f"{entry['ratio']:6.2f}x {flag}"
+                )
+                regressions += entry["regression"]
+            raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+A per-VM result cache with a time to live and LRU eviction.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Caches results per VM for ttl seconds.
+
+    Entries are grouped by VM, so all cached results of a VM can be dropped
+    at once. If more than size VMs are cached, the least recently used VM
+    is evicted.
+    """
+
+    def __init__(self, ttl=2.0, size=1024):
+        """
+        Initialize the TTLCache.
+
+        Args:
+            ttl (float, optional): Seconds an entry stays valid. Defaults to 2.0.
+            size (int, optional): The maximum number of cached VMs. Defaults to 1024.
+        """
+        self.ttl = ttl
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, vm, kind):
+        """
+        Get a cached result.
+
+        Args:
+            vm (str): The name of the VM.
+            kind (str): The kind of result, e.g. "info" or "status".
+
+        Returns:
+            The cached value or None if it is missing or expired.
+        """
+        with self._lock:
+            entry = self._data.get(vm, {}).get(kind)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                self.misses += 1
+                return None
+            self._data.move_to_end(vm)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, vm, kind, value):
+        """
+        Store a result.
+
+        Args:
+            vm (str): The name of the VM.
+            kind (str): The kind of result, e.g. "info" or "status".
+            value: The value to cache.
+        """
+        with self._lock:
+            self._data.setdefault(vm, {})[kind] = (time.monotonic(), value)
+            self._data.move_to_end(vm)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, vm=None):
+        """
+        Drop the cached results of a VM.
+
+        Args:
+            vm (str, optional): The name of the VM. Defaults to None, which
+                drops all entries.
+        """
+        with self._lock:
+            if vm is None:
+                self._data.clear()
+            else:
+                self._data.pop(vm, None)
+
+    def stats(self):
+        """
+        Get the cache counters.
+
+        Returns:
+            dict: The hits, misses and the number of cached VMs.
+        """
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self._data)}
@@ -0,0 +1,315 @@
+"""
+A local catalog of the images VMs are created from.
+
+The catalog holds appliances (OVA, OVF) and disks (VDI, VMDK, VHD) with
+their size, checksum, OS type and last use. It is kept in memory as a dict
+keyed by name, so lookups do not run any command, and stored as a JSON
+lines file. Every change appends one line, and the last line of a name
+wins, so updates never rewrite the file until compact is called::
+
+    {"name": "ubuntu", "path": "/images/ubuntu.ova", "size": 1073741824, ...}
+    {"name": "ubuntu", "last_used": 1705312800.0, ...}
+    {"name": "old", "deleted": true}
+
+Many processes can share the file. Changes and compactions hold a lock on
+images.jsonl.lock and first read the lines that other processes appended,
+so a compaction keeps them. Reads use the state of the last change or load.
+On systems without fcntl the catalog has to have a single writer.
+
+The checksum of a file is only computed again if its size or modification
+time changed.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import re
+import tarfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows, where the catalog has a single writer
+    fcntl = None
+
+CATALOG = os.path.expanduser("~/.cloudmesh/vbox/images.jsonl")
+
+FORMATS = {".ova": "ova", ".ovf": "ovf", ".vdi": "vdi", ".vmdk": "vmdk", ".vhd": "vhd"}
+
+OSTYPE = re.compile(rb'vbox:ostype="([^"]+)"')
+
+
+def checksum(path, size=1 << 24):
+    """
+    Compute the SHA-256 checksum of a file in chunks.
+
+    The file is memory-mapped and hashed through slices of a memoryview, so
+    the chunks are not copied and the hasher releases the GIL while it runs.
+
+    Args:
+        path (str): The file.
+        size (int, optional): The chunk size in bytes. Defaults to 16 MiB.
+
+    Returns:
+        str: The hex digest.
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # an empty file cannot be mapped
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            with memoryview(data) as view:
+                for offset in range(0, len(view), size):
+                    digest.update(view[offset : offset + size])
+    return digest.hexdigest()
+
+
+def ostype(path):
+    """
+    Read the VirtualBox OS type from the OVF descriptor of an appliance.
+
+    Args:
+        path (str): The OVA or OVF file.
+
+    Returns:
+        str: The OS type, e.g. "Ubuntu_64", or None.
+    """
+    try:
+        if path.endswith(".ova"):
+            with tarfile.open(path) as archive:
+                for member in archive:
+                    if member.name.endswith(".ovf"):
+                        descriptor = archive.extractfile(member).read()
+                        break
+                else:
+                    return None
+        else:
+            with open(path, "rb") as f:
+                descriptor = f.read()
+    except (OSError, tarfile.TarError):
+        return None
+    match = OSTYPE.search(descriptor)
+    return match and match.group(1).decode()
+
+
+class Catalog:
+    """
+    The images known on this host, indexed by name.
+    """
+
+    def __init__(self, path=CATALOG):
+        """
+        Initialize the Catalog and load its index.
+
+        Args:
+            path (str, optional): The JSON lines file. Defaults to
+                ~/.cloudmesh/vbox/images.jsonl.
+        """
+        self.path = path
+        self.images = {}
+        self._lines = 0
+        # the first line of the file and the position up to which its
+        # lines are applied, a compaction writes a new first line
+        self._head = None
+        self._offset = 0
+        self._lock = threading.Lock()
+        if os.path.exists(path):
+            with self._locked():
+                # loads the index
+                pass
+
+    def _apply(self, change):
+        self._lines += 1
+        if "name" not in change:
+            # the generation written by compact
+            return
+        if change.get("deleted"):
+            self.images.pop(change["name"], None)
+        else:
+            self.images.setdefault(change["name"], {}).update(change)
+
+    def _load(self):
+        """
+        Apply the lines that were appended since the last load.
+
+        The index is read again from the start if another process compacted
+        it, which is seen from its new first line.
+        """
+        try:
+            f = open(self.path, "rb")
+        except FileNotFoundError:
+            return
+        with f:
+            head = f.readline()
+            if head != self._head:
+                self.images = {}
+                self._lines = 0
+                self._head = head
+                self._offset = 0
+            f.seek(self._offset)
+            for line in f:
+                if line.strip():
+                    self._apply(json.loads(line))
+            self._offset = f.tell()
+
+    @contextmanager
+    def _locked(self):
+        """
+        Hold the lock of the index and load the changes of other processes.
+        """
+        with self._lock:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with open(self.path + ".lock", "a") as lock:
+                if fcntl is not None:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                self._load()
+                yield
+
+    def _append(self, change):
+        """
+        Apply a change and append it to the index.
+
+        The index is compacted once it holds four times more lines than
+        images, e.g. after many touches.
+
+        Args:
+            change (dict): The name of the image and the changed fields.
+        """
+        with self._locked():
+            self._apply(change)
+            line = (json.dumps(change) + "\n").encode()
+            with open(self.path, "ab") as f:
+                if f.tell() == 0:
+                    self._head = line
+                f.write(line)
+                self._offset = f.tell()
+            if self._lines > 4 * len(self.images) + 64:
+                self._compact()
+
+    def register(self, path, name=None, os_type=None, digest=None):
+        """
+        Add an image or update it if its file changed.
+
+        Args:
+            path (str): The file of the image.
+            name (str, optional): The name of the image. Defaults to the file
+                name without its extension.
+            os_type (str, optional): The VirtualBox OS type. Defaults to the
+                one in the OVF descriptor.
+            digest (str, optional): The checksum if it is already known.
+                Defaults to None, computing it.
+
+        Returns:
+            dict: The entry of the image.
+        """
+        path = os.path.abspath(path)
+        base, extension = os.path.splitext(os.path.basename(path))
+        name = name or base
+        stat = os.stat(path)
+        entry = self.images.get(name)
+        if (
+            entry is not None
+            and entry.get("path") == path
+            and entry.get("size") == stat.st_size
+            and entry.get("mtime") == stat.st_mtime
+            and (os_type is None or entry.get("os") == os_type)
+        ):
+            return entry
+        self._append(
+            {
+                "name": name,
+                "path": path,
+                "format": FORMATS.get(extension.lower()),
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "checksum": digest or checksum(path),
+                "os": os_type or ostype(path),
+                "registered": time.time(),
+            }
+        )
+        return self.images[name]
+
+    def scan(self, directory):
+        """
+        Register all images in a directory.
+
+        Unchanged files are not hashed again.
+
+        Args:
+            directory (str): The directory.
+
+        Returns:
+            list: The entries of the images in the directory.
+        """
+        entries = []
+        for filename in sorted(os.listdir(directory)):
+            if os.path.splitext(filename)[1].lower() in FORMATS:
+                entries.append(self.register(os.path.join(directory, filename)))
+        return entries
+
+    def get(self, name):
+        """
+        Look up an image.
+
+        Args:
+            name (str): The name of the image.
+
+        Returns:
+            dict: The entry or None.
+        """
+        return self.images.get(name)
+
+    def list(self):
+        """
+        List all images.
+
+        Returns:
+            list: The entries ordered by name.
+        """
+        return [self.images[name] for name in sorted(self.images)]
+
+    def touch(self, name):
+        """
+        Record that an image was used.
+
+        Args:
+            name (str): The name of the image.
+        """
+        if name in self.images:
+            self._append({"name": name, "last_used": time.time()})
+
+    def remove(self, name):
+        """
+        Remove an image from the catalog. The file is kept.
+
+        Args:
+            name (str): The name of the image.
+        """
+        if name in self.images:
+            self._append({"name": name, "deleted": True})
+
+    def compact(self):
+        """
+        Rewrite the index with one line per image.
+        """
+        with self._locked():
+            self._compact()
+
+    def _compact(self):
+        # a new first line tells other processes to read the file again
+        head = (json.dumps({"generation": uuid.uuid4().hex}) + "\n").encode()
+        with open(self.path + ".tmp", "wb") as f:
+            f.write(head)
+            for name in sorted(self.images):
+                f.write((json.dumps(self.images[name]) + "\n").encode())
+            offset = f.tell()
+        os.replace(self.path + ".tmp", self.path)
+        self._lines = len(self.images)
+        self._head = head
+        self._offset = offset
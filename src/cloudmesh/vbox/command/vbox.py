@@ -1,10 +1,3 @@
-from cloudmesh.vbox.vbox import Vbox
-from cloudmesh.common.console import Console
-from cloudmesh.common.debug import VERBOSE
-from cloudmesh.common.parameter import Parameter
-from cloudmesh.common.util import banner
-from cloudmesh.common.util import path_expand
-from cloudmesh.common.variables import Variables
 from cloudmesh.shell.command import PluginCommand
 from cloudmesh.shell.command import command
 from cloudmesh.shell.command import map_parameters
@@ -20,6 +13,8 @@ class VboxCommand(PluginCommand):
           Usage:
                 vbox --file=FILE
                 vbox list
+                vbox images [PATHS...]
+                vbox metrics [NAMES] [--metrics=METRICS] [--period=PERIOD] [--count=COUNT]
                 vbox [--parameter=PARAMETER] [--experiment=EXPERIMENT] [COMMAND...]
 
           This command does some useful things.
@@ -27,9 +22,14 @@ class VboxCommand(PluginCommand):
           Arguments:
               FILE   a file name
               PARAMETER  a parameterized parameter of the form "a[0-3],a5"
+              NAMES      the VMs, e.g. "vm[1-3]", all VMs if omitted
+              PATHS      image files or directories of images
 
           Options:
-              -f      specify the file
+              -f                 specify the file
+              --metrics=METRICS  the metrics, e.g. CPU/Load/User,RAM/Usage/Used
+              --period=PERIOD    seconds between two samples [default: 1]
+              --count=COUNT      the number of samples [default: 1]
 
           Description:
 
@@ -45,42 +45,32 @@ class VboxCommand(PluginCommand):
             > prints the parameter as dict
             >   {'a': 'b', 'c': 'd'}
 
-        """
-
-        # arguments.FILE = arguments['--file'] or None
+            > cms vbox images ~/images
+            >    registers the new or changed OVA, OVF, VDI, VMDK and VHD
+            >    files in ~/images and prints the image catalog
 
-        # switch debug on
+            > cms vbox metrics "vm[1-3]" --period=5 --count=12
+            >    samples CPU, RAM, disk and network of the VMs every 5
+            >    seconds for a minute and prints one JSON line per sample
 
-        variables = Variables()
-        variables["debug"] = True
+        """
 
-        banner("original arguments", color="RED")
+        # the plugin is loaded on every start of cms, so everything that is
+        # only needed to run the command is imported here
+        import json
+        import time
 
-        VERBOSE(arguments)
-
-        banner(
-            "rewriting arguments so we can use . notation for file, parameter, and experiment",
-            color="RED",
-        )
+        from cloudmesh.common.parameter import Parameter
+        from cloudmesh.common.util import path_expand
+        from cloudmesh.vbox.vbox import Vbox
 
         map_parameters(arguments, "file", "parameter", "experiment")
 
-        VERBOSE(arguments)
-
-        banner(
-            "rewriting arguments so we convert to appropriate types for easier handling",
-            color="RED",
-        )
-
         arguments = Parameter.parse(
             arguments, parameter="expand", experiment="dict", COMMAND="str"
         )
 
-        VERBOSE(arguments)
-
-        banner("showcasing tom simple if parsing based on teh dotdict", color="RED")
-
-        m = Vbox()
+        m = Vbox(output="dict")
 
         #
         # It is important to keep the programming here to a minimum and any substantial programming ought
@@ -91,19 +81,22 @@ class VboxCommand(PluginCommand):
         #
 
         if arguments.file:
-            print("option a")
             m.list(path_expand(arguments.file))
 
         elif arguments.list:
-            print("option b")
-            m.list("just calling list without parameter")
-
-        Console.error("This is just a sample of an error")
-        Console.warning("This is just a sample of a warning")
-        Console.info("This is just a sample of an info")
-
-        Console.info(
-            " You can witch debugging on and off with 'cms debug on' or 'cms debug off'"
-        )
+            print(json.dumps(m.list(), indent=2))
+
+        elif arguments.images:
+            if arguments.PATHS:
+                m.add_images(*map(path_expand, arguments.PATHS))
+            print(json.dumps(m.images(), indent=2))
+
+        elif arguments.metrics:
+            metrics = arguments["--metrics"] and arguments["--metrics"].split(",")
+            period = int(arguments["--period"])
+            m.setup_metrics(metrics=metrics, period=period)
+            for _ in range(int(arguments["--count"])):
+                time.sleep(period)
+                print(json.dumps(m.collect_metrics(arguments.NAMES, metrics=metrics)))
 
         return ""
@@ -0,0 +1,551 @@
+"""
+Stand-ins for VBoxManage and ssh that can be placed on the PATH so Vbox can
+be exercised and benchmarked on hosts without VirtualBox or VMs.
+
+The fake keeps the state of its simulated VMs in a JSON file next to the
+executable, so state changes made by one call are seen by the next one.
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+SCRIPT = r"""#!PYTHON -S
+import fcntl
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+STATE = os.path.join(HERE, "vms.json")
+CONFIG = os.path.join(HERE, "config.json")
+
+
+def load():
+    with open(STATE) as f:
+        return json.load(f)
+
+
+def save(vms):
+    with open(STATE + ".tmp", "w") as f:
+        json.dump(vms, f)
+    os.replace(STATE + ".tmp", STATE)
+
+
+def find(vms, name):
+    for key, vm in vms.items():
+        if name in (key, vm["UUID"]):
+            return key
+    sys.stderr.write(
+        "VBoxManage: error: Could not find a registered machine named '%s'\n" % name
+    )
+    sys.exit(1)
+
+
+def register(vms, name, memory=1024):
+    if name in vms:
+        sys.stderr.write(
+            "VBoxManage: error: Machine settings file '%s' already exists\n" % name
+        )
+        sys.exit(1)
+    vms[name] = {
+        "UUID": "00000000-0000-0000-0001-%012d" % len(vms),
+        "state": "poweroff",
+        "memory": memory,
+        "cpus": 1,
+        "mac": "0800%08X" % (len(vms) + 0x10000),
+    }
+
+
+def padding(size, form):
+    # extra lines to simulate VMs with large configurations
+    return [form % (i, "x" * 40) for i in range(size)]
+
+
+def machinereadable(name, vm, size=0):
+    lines = [
+        'name="%s"' % name,
+        'UUID="%s"' % vm["UUID"],
+        "memory=%d" % vm["memory"],
+        "cpus=%d" % vm["cpus"],
+        'VMState="%s"' % vm["state"],
+        'nic1="nat"',
+        'macaddress1="%s"' % vm["mac"],
+        'VMStateChangeTime="2024-01-01T00:00:00.000000000"',
+        'CfgFile="%s/%s/%s.vbox"' % (HERE, name, name),
+        'LogFldr="%s/%s/Logs"' % (HERE, name),
+    ]
+    lines.extend(padding(size, 'GuestProperty%d="%s"'))
+    return "\n".join(lines)
+
+
+HUMAN = {
+    "poweroff": "powered off",
+    "running": "running",
+    "saved": "saved",
+    "paused": "paused",
+}
+
+
+def human(name, vm, size=0):
+    lines = [
+        "Name:                        %s" % name,
+        "Groups:                      /",
+        "Guest OS:                    Ubuntu (64-bit)",
+        "UUID:                        %s" % vm["UUID"],
+        "Config file:                 %s/%s/%s.vbox" % (HERE, name, name),
+        "Memory size:                 %dMB" % vm["memory"],
+        "Number of CPUs:              %d" % vm["cpus"],
+        "State:                       %s (since 2024-01-01T00:00:00.000000000)"
+        % HUMAN.get(vm["state"], vm["state"]),
+    ]
+    for i in range(1, 9):
+        if i == 1:
+            lines.append(
+                "NIC %d:                       MAC: %s, Attachment: NAT, "
+                "Cable connected: on, Trace: off (file: none), Type: 82540EM, "
+                "Reported speed: 0 Mbps, Boot priority: 0" % (i, vm["mac"])
+            )
+        else:
+            lines.append("NIC %d:                       disabled" % i)
+    lines.extend(padding(size, "Guest property %d:            %s"))
+    lines.append("")
+    lines.append("Snapshots:")
+    lines.append("   Name: base (UUID: %s)" % vm["UUID"])
+    return "\n".join(lines)
+
+
+def main(argv):
+    with open(CONFIG) as f:
+        config = json.load(f)
+    if config.get("latency"):
+        time.sleep(config["latency"])
+    size = config.get("size", 0)
+
+    lock = open(STATE + ".lock", "w")
+    fcntl.flock(lock, fcntl.LOCK_EX)
+    vms = load()
+    out = sys.stdout
+
+    if argv[:2] == ["list", "vms"]:
+        for name, vm in vms.items():
+            out.write('"%s" {%s}\n' % (name, vm["UUID"]))
+    elif argv[:3] in (["list", "-l", "vms"], ["list", "--long", "vms"]):
+        out.write(
+            "\n\n".join(human(name, vm, size) for name, vm in vms.items()) + "\n"
+        )
+    elif argv[:2] == ["list", "hdds"]:
+        media = {}
+        for name, vm in vms.items():
+            for disk in vm.get("disks", []):
+                media.setdefault(disk, []).append("%s (UUID: %s)" % (name, vm["UUID"]))
+        for i, (location, users) in enumerate(sorted(media.items())):
+            out.write("UUID:           00000000-0000-0000-0002-%012d\n" % i)
+            out.write("Parent UUID:    base\n")
+            out.write("State:          created\n")
+            out.write("Type:           multiattach\n")
+            out.write("Location:       %s\n" % location)
+            out.write("In use by VMs:  %s\n\n" % ", ".join(users))
+    elif argv[:2] == ["list", "runningvms"]:
+        for name, vm in vms.items():
+            if vm["state"] == "running":
+                out.write('"%s" {%s}\n' % (name, vm["UUID"]))
+    elif argv[:1] == ["showvminfo"]:
+        name = find(vms, argv[1])
+        if "--machinereadable" in argv:
+            out.write(machinereadable(name, vms[name], size) + "\n")
+        else:
+            out.write(human(name, vms[name], size) + "\n")
+    elif argv[:1] == ["startvm"]:
+        name = find(vms, argv[1])
+        # a saved VM resumes from its memory, all others boot
+        if vms[name]["state"] == "saved":
+            time.sleep(config.get("restore", 0))
+        else:
+            time.sleep(config.get("boot", 0))
+        vms[name]["state"] = "running"
+        save(vms)
+        out.write('VM "%s" has been successfully started.\n' % name)
+    elif argv[:1] == ["controlvm"]:
+        name = find(vms, argv[1])
+        action = argv[2]
+        if action == "poweroff":
+            vms[name]["state"] = "poweroff"
+        elif action == "savestate":
+            vms[name]["state"] = "saved"
+        elif action == "pause":
+            vms[name]["state"] = "paused"
+        elif action == "resume":
+            vms[name]["state"] = "running"
+        save(vms)
+        out.write("0%...10%...20%...30%...40%...50%...60%...70%...80%...90%...100%\n")
+    elif argv[:1] == ["modifyvm"]:
+        name = find(vms, argv[1])
+        if vms[name]["state"] in ("running", "paused"):
+            sys.stderr.write(
+                "VBoxManage: error: The machine '%s' is already locked for a "
+                "session (or being unlocked)\n" % name
+            )
+            sys.exit(1)
+        for option in ["memory", "cpus"]:
+            if "--" + option in argv:
+                vms[name][option] = int(argv[argv.index("--" + option) + 1])
+        if "--name" in argv:
+            destination = argv[argv.index("--name") + 1]
+            if destination in vms:
+                sys.stderr.write(
+                    "VBoxManage: error: Machine settings file '%s' already exists\n"
+                    % destination
+                )
+                sys.exit(1)
+            vms[destination] = vms.pop(name)
+        save(vms)
+    elif argv[:1] == ["snapshot"]:
+        name = find(vms, argv[1])
+        snapshots = vms[name].setdefault("snapshots", [])
+        saved = vms[name].setdefault("saved", [])
+        if argv[2] == "take":
+            snapshots.append(argv[3])
+            if vms[name]["state"] in ("running", "saved"):
+                saved.append(argv[3])
+            save(vms)
+            out.write("0%...10%...20%...30%...40%...50%...60%...70%...80%...90%...100%\n")
+        elif argv[2] == "list":
+            if not snapshots:
+                out.write("This machine does not have any snapshots\n")
+                sys.exit(1)
+            for i, snapshot in enumerate(snapshots):
+                suffix = "-%d" % i if i else ""
+                out.write('SnapshotName%s="%s"\n' % (suffix, snapshot))
+            out.write('CurrentSnapshotName="%s"\n' % snapshots[-1])
+        elif argv[2] == "restore":
+            if argv[3] not in snapshots:
+                sys.stderr.write(
+                    "VBoxManage: error: Could not find a snapshot named '%s'\n"
+                    % argv[3]
+                )
+                sys.exit(1)
+            vms[name]["state"] = "saved" if argv[3] in saved else "poweroff"
+            save(vms)
+            out.write("Restoring snapshot '%s'\n" % argv[3])
+    elif argv[:1] == ["clonevm"]:
+        name = find(vms, argv[1])
+        destination = argv[argv.index("--name") + 1]
+        if destination in vms:
+            sys.stderr.write(
+                "VBoxManage: error: Machine settings file '%s' already exists\n"
+                % destination
+            )
+            sys.exit(1)
+        if "--snapshot" in argv:
+            snapshot = argv[argv.index("--snapshot") + 1]
+            if snapshot not in vms[name].get("snapshots", []):
+                sys.stderr.write(
+                    "VBoxManage: error: Could not find a snapshot named '%s'\n"
+                    % snapshot
+                )
+                sys.exit(1)
+        state = "poweroff"
+        if "--snapshot" in argv and snapshot in vms[name].get("saved", []):
+            # a clone of a live snapshot keeps its saved state
+            state = "saved"
+        clone = dict(vms[name], state=state, snapshots=[], saved=[])
+        clone["UUID"] = "00000000-0000-0000-0001-%012d" % len(vms)
+        clone["mac"] = "0800%08X" % (len(vms) + 0x10000)
+        vms[destination] = clone
+        save(vms)
+        out.write("0%...10%...20%...30%...40%...50%...60%...70%...80%...90%...100%\n")
+        out.write('Machine has been successfully cloned as "%s"\n' % destination)
+    elif argv[:1] == ["createvm"]:
+        destination = argv[argv.index("--name") + 1]
+        register(vms, destination, memory=128)
+        save(vms)
+        out.write("Virtual machine '%s' is created and registered.\n" % destination)
+    elif argv[:1] == ["import"]:
+        if not os.path.exists(argv[1]):
+            sys.stderr.write("VBoxManage: error: File not found: %s\n" % argv[1])
+            sys.exit(1)
+        register(vms, argv[argv.index("--vmname") + 1])
+        save(vms)
+        out.write("0%...10%...20%...30%...40%...50%...60%...70%...80%...90%...100%\n")
+        out.write("Successfully imported the appliance.\n")
+    elif argv[:1] == ["storagectl"]:
+        find(vms, argv[1])
+    elif argv[:1] == ["storageattach"]:
+        name = find(vms, argv[1])
+        medium = argv[argv.index("--medium") + 1]
+        if not os.path.exists(medium):
+            sys.stderr.write("VBoxManage: error: Could not find file '%s'\n" % medium)
+            sys.exit(1)
+        vms[name].setdefault("disks", []).append(medium)
+        save(vms)
+    elif argv[:2] == ["metrics", "setup"]:
+        pass
+    elif argv[:2] == ["metrics", "query"]:
+        names = [argv[2]] if len(argv) > 2 and argv[2] != "*" else list(vms)
+        wanted = argv[3].split(",") if len(argv) > 3 else None
+        out.write("%-15s %-40s %s\n" % ("Object", "Metric", "Values"))
+        out.write("%s %s %s\n" % ("-" * 15, "-" * 40, "-" * 44))
+        now = time.time()
+        for name in names:
+            vm = vms[find(vms, name)]
+            if vm["state"] != "running":
+                continue
+            usage = (now * 7 + int(vm["mac"], 16)) % 100
+            values = [
+                ("CPU/Load/User", "%.2f%%" % usage),
+                ("CPU/Load/Kernel", "%.2f%%" % (usage / 4)),
+                ("RAM/Usage/Used", "%d kB" % (vm["memory"] * 1024)),
+                ("Disk/Usage/Used", "2048 MB"),
+                ("Net/Rate/Rx", "%d B/s" % (usage * 1000)),
+                ("Net/Rate/Tx", "%d B/s" % (usage * 100)),
+            ]
+            for metric, value in values:
+                if wanted is None or metric in wanted:
+                    out.write("%-15s %-40s %s\n" % (name, metric, value))
+    elif argv[:1] == ["unregistervm"]:
+        name = find(vms, argv[1])
+        del vms[name]
+        save(vms)
+    else:
+        sys.stderr.write("VBoxManage: error: Unknown command '%s'\n" % " ".join(argv))
+        sys.exit(1)
+
+
+main(sys.argv[1:])
+"""
+
+SSH = r"""#!PYTHON -S
+import json
+import os
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# options of ssh that take an argument
+ARGUMENT = set("bcDEeFIiJLlmOopQRSWw")
+
+
+def main(argv):
+    with open(os.path.join(HERE, "ssh.json")) as f:
+        config = json.load(f)
+    options = {}
+    i = 0
+    while i < len(argv) and argv[i].startswith("-"):
+        flag = argv[i][1:2]
+        if flag in ARGUMENT:
+            value = argv[i][2:] or argv[i + 1]
+            i += 1 if argv[i][2:] else 2
+            if flag == "o":
+                key, _, option = value.partition("=")
+                options[key] = option
+            else:
+                options[flag] = value
+        else:
+            i += 1
+    if options.get("O") == "exit":
+        path = options.get("ControlPath")
+        if path and os.path.exists(path):
+            os.remove(path)
+        return
+    command = " ".join(argv[i + 1:])
+
+    # a new connection pays the handshake, a multiplexed one does not
+    path = options.get("ControlPath")
+    if path and os.path.exists(path):
+        pass
+    else:
+        time.sleep(config["latency"])
+        if path and options.get("ControlMaster") in ("auto", "yes"):
+            open(path, "w").close()
+    if command:
+        os.execvp("sh", ["sh", "-c", command])
+    os.execvp("sh", ["sh"])
+
+
+main(sys.argv[1:])
+"""
+
+
+class FakeSsh:
+    """
+    Installs a fake ssh executable in a temporary directory.
+
+    The fake runs the remote command locally with sh. Every new connection
+    sleeps latency seconds to simulate the handshake; connections through
+    an existing ControlMaster socket do not.
+    """
+
+    def __init__(self, latency=0.05, directory=None):
+        """
+        Initialize the fake.
+
+        Args:
+            latency (float, optional): Seconds a new connection takes. Defaults to 0.05.
+            directory (str, optional): Where to install the fake. Defaults to
+                a new temporary directory.
+        """
+        self.latency = latency
+        self.directory = directory
+        self._path = None
+
+    def install(self):
+        """
+        Write the executable and its configuration.
+
+        Returns:
+            str: The directory containing the fake ssh.
+        """
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="fake-ssh-")
+        with open(os.path.join(self.directory, "ssh.json"), "w") as f:
+            json.dump({"latency": self.latency}, f)
+        executable = os.path.join(self.directory, "ssh")
+        with open(executable, "w") as f:
+            f.write(SSH.replace("PYTHON", sys.executable, 1))
+        os.chmod(executable, 0o755)
+        return self.directory
+
+    def remove(self):
+        """
+        Delete the directory of the fake.
+        """
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def __enter__(self):
+        self.install()
+        self._path = os.environ.get("PATH", "")
+        os.environ["PATH"] = self.directory + os.pathsep + self._path
+        return self
+
+    def __exit__(self, *exc):
+        os.environ["PATH"] = self._path
+        self.remove()
+
+
+class FakeVBoxManage:
+    """
+    Installs a fake VBoxManage executable in a temporary directory.
+
+    Use it as a context manager to prepend the directory to the PATH for
+    the duration of a block::
+
+        with FakeVBoxManage(vms=100) as fake:
+            Vbox().list()
+    """
+
+    def __init__(
+        self,
+        vms=3,
+        latency=0.0,
+        prefix="vm",
+        directory=None,
+        size=0,
+        boot=0.0,
+        restore=0.0,
+    ):
+        """
+        Initialize the fake.
+
+        Args:
+            vms (int, optional): The number of simulated VMs. Defaults to 3.
+            latency (float, optional): Seconds each call sleeps before it
+                answers. Defaults to 0.0.
+            prefix (str, optional): The prefix of the VM names. Defaults to "vm".
+            directory (str, optional): Where to install the fake. Defaults to
+                a new temporary directory.
+            size (int, optional): The number of additional lines in the
+                showvminfo output of every VM. Defaults to 0.
+            boot (float, optional): Seconds startvm takes for a cold boot. Defaults to 0.0.
+            restore (float, optional): Seconds startvm takes to resume a
+                saved VM. Defaults to 0.0.
+        """
+        self.vms = vms
+        self.latency = latency
+        self.size = size
+        self.boot = boot
+        self.restore = restore
+        self.prefix = prefix
+        self.directory = directory
+        self._path = None
+
+    def install(self):
+        """
+        Write the executable, its configuration, and the initial VM state.
+
+        Returns:
+            str: The directory containing the fake VBoxManage.
+        """
+        if self.directory is None:
+            self.directory = tempfile.mkdtemp(prefix="fake-vboxmanage-")
+        width = len(str(self.vms))
+        vms = {}
+        for i in range(1, self.vms + 1):
+            name = f"{self.prefix}{i:0{width}d}"
+            vms[name] = {
+                "UUID": f"00000000-0000-0000-0000-{i:012d}",
+                "state": "poweroff",
+                "memory": 1024,
+                "cpus": 1,
+                "mac": f"080027{i:06X}",
+            }
+        with open(os.path.join(self.directory, "vms.json"), "w") as f:
+            json.dump(vms, f)
+        self.configure()
+        executable = os.path.join(self.directory, "VBoxManage")
+        with open(executable, "w") as f:
+            f.write(SCRIPT.replace("PYTHON", sys.executable, 1))
+        os.chmod(executable, 0o755)
+        return self.directory
+
+    def configure(self, **kwargs):
+        """
+        Update the runtime configuration of an installed fake.
+
+        Args:
+            kwargs (dict): Attributes to change, e.g. latency=0.01.
+        """
+        for key, value in kwargs.items():
+            setattr(self, key, value)
+        config = {
+            "latency": self.latency,
+            "size": self.size,
+            "boot": self.boot,
+            "restore": self.restore,
+        }
+        with open(os.path.join(self.directory, "config.json"), "w") as f:
+            json.dump(config, f)
+
+    def state(self):
+        """
+        Read the current state of the simulated VMs.
+
+        Returns:
+            dict: The VMs keyed by name.
+        """
+        with open(os.path.join(self.directory, "vms.json")) as f:
+            return json.load(f)
+
+    def remove(self):
+        """
+        Delete the directory of the fake.
+        """
+        if self.directory is not None:
+            shutil.rmtree(self.directory, ignore_errors=True)
+            self.directory = None
+
+    def __enter__(self):
+        self.install()
+        self._path = os.environ.get("PATH", "")
+        os.environ["PATH"] = self.directory + os.pathsep + self._path
+        return self
+
+    def __exit__(self, *exc):
+        os.environ["PATH"] = self._path
+        self.remove()
@@ -0,0 +1,157 @@
+"""
+A content-addressed store for image files that keeps each unique file once.
+
+Files are stored under their SHA-256 checksum, so adding a copy of a disk
+that is already stored only adds a name for it::
+
+    ~/.cloudmesh/vbox/images/
+        images.jsonl                    the catalog of the stored images
+        blobs/d5/d574b4...39aa.vdi      read-only, shared by all its names
+
+Vbox attaches stored disks as multiattach media, so every VM writes to its
+own differencing disk and the stored disk stays unchanged. If the stored
+files exceed the quota, the least recently used ones that are not in use
+are deleted with all their names.
+"""
+
+import os
+import shutil
+
+from cloudmesh.vbox.catalog import Catalog
+from cloudmesh.vbox.catalog import checksum
+
+STORE = os.path.expanduser("~/.cloudmesh/vbox/images")
+
+
+class ImageStore:
+    """
+    Stores image files by content and evicts them by last use.
+    """
+
+    def __init__(self, directory=STORE, quota=None, catalog=None, in_use=None):
+        """
+        Initialize the ImageStore.
+
+        Args:
+            directory (str, optional): The directory of the store. Defaults to
+                ~/.cloudmesh/vbox/images.
+            quota (int, optional): The maximum size of the stored files in
+                bytes. Defaults to None, no limit.
+            catalog (Catalog, optional): The catalog the images are registered
+                with. Defaults to the catalog in the directory.
+            in_use (callable, optional): Returns the paths of files that must
+                not be evicted, e.g. disks attached to VMs. Defaults to None.
+        """
+        # absolute like the paths the catalog registers
+        self.directory = os.path.abspath(directory)
+        self.quota = quota
+        self.catalog = catalog or Catalog(os.path.join(self.directory, "images.jsonl"))
+        self.in_use = in_use
+        self.blobs = os.path.join(self.directory, "blobs")
+
+    def _path(self, digest, extension):
+        return os.path.join(self.blobs, digest[:2], digest + extension.lower())
+
+    def add(self, path, name=None, os_type=None, move=False):
+        """
+        Store an image file unless a file with the same content is stored.
+
+        Args:
+            path (str): The file.
+            name (str, optional): The name of the image. Defaults to the file
+                name without its extension.
+            os_type (str, optional): The VirtualBox OS type. Defaults to the
+                one in the OVF descriptor.
+            move (bool, optional): Remove the file once it is stored, e.g. to
+                deduplicate copies. Defaults to False.
+
+        Returns:
+            dict: The catalog entry of the image.
+        """
+        base, extension = os.path.splitext(os.path.basename(path))
+        digest = checksum(path)
+        target = self._path(digest, extension)
+        if os.path.exists(target):
+            if move:
+                os.remove(path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            if move:
+                shutil.move(path, target + ".tmp")
+            else:
+                shutil.copyfile(path, target + ".tmp")
+            # the file is shared by all names and VMs, nobody may change it
+            os.chmod(target + ".tmp", 0o444)
+            os.replace(target + ".tmp", target)
+        entry = self.catalog.register(
+            target, name=name or base, os_type=os_type, digest=digest
+        )
+        self.evict(keep=[target])
+        return entry
+
+    def files(self):
+        """
+        Get the stored files.
+
+        Returns:
+            dict: The size, last use and names of each file keyed by path.
+        """
+        files = {}
+        prefix = self.blobs + os.sep
+        for entry in self.catalog.list():
+            if not entry["path"].startswith(prefix):
+                continue
+            used = entry.get("last_used") or entry.get("registered", 0)
+            info = files.setdefault(
+                entry["path"], {"size": entry["size"], "used": used, "names": []}
+            )
+            info["used"] = max(info["used"], used)
+            info["names"].append(entry["name"])
+        return files
+
+    def usage(self):
+        """
+        Get the size of the stored files.
+
+        Returns:
+            int: The size in bytes, every file counted once.
+        """
+        return sum(info["size"] for info in self.files().values())
+
+    def evict(self, quota=None, keep=()):
+        """
+        Delete the least recently used files until the store fits the quota.
+
+        Files in use and files in keep are not deleted.
+
+        Args:
+            quota (int, optional): The maximum size in bytes. Defaults to the
+                quota of the store.
+            keep (list, optional): Paths that must not be deleted. Defaults to ().
+
+        Returns:
+            list: The names of the evicted images.
+        """
+        quota = self.quota if quota is None else quota
+        if quota is None:
+            return []
+        files = self.files()
+        total = sum(info["size"] for info in files.values())
+        if total <= quota:
+            return []
+        keep = set(keep)
+        if self.in_use is not None:
+            keep |= set(self.in_use())
+        evicted = []
+        for path, info in sorted(files.items(), key=lambda item: item[1]["used"]):
+            if total <= quota:
+                break
+            if path in keep:
+                continue
+            for name in info["names"]:
+                self.catalog.remove(name)
+            if os.path.exists(path):
+                os.remove(path)
+            total -= info["size"]
+            evicted.extend(info["names"])
+        return evicted
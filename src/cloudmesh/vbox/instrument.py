@@ -0,0 +1,320 @@
+"""
+Latency histograms and counters for the commands run by Vbox.
+
+A Registry records every VBoxManage and ssh call with its latency, exit
+status and output size, the time spent parsing, and the retries of the
+wait methods. Pass one to Vbox to enable it::
+
+    registry = Registry()
+    vbox = Vbox(instrument=registry)
+    ...
+    registry.export("vbox.prom")
+
+The export is either the Prometheus text format, e.g. for the textfile
+collector of the node exporter, or JSON. profile and trace_memory capture
+a cProfile or tracemalloc report of a block of code.
+"""
+
+import cProfile
+import io
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+# upper bounds of the histogram buckets in seconds
+BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+class Histogram:
+    """
+    Counts observations in buckets with fixed upper bounds.
+    """
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds=BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        """
+        Add an observation.
+
+        Args:
+            value (float): The value, e.g. a latency in seconds.
+        """
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q):
+        """
+        Estimate a quantile from the buckets.
+
+        Args:
+            q (float): The quantile, e.g. 0.99.
+
+        Returns:
+            float: The upper bound of the bucket containing the quantile,
+            or inf if it is above the largest bound.
+        """
+        rank = q * self.count
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            if total >= rank:
+                return bound
+        return float("inf")
+
+    def to_dict(self):
+        """
+        Convert the histogram to a dict.
+
+        Returns:
+            dict: The count, sum, p50, p99 and the cumulative buckets.
+        """
+        buckets = {}
+        total = 0
+        for bound, count in zip(self.bounds, self.counts):
+            total += count
+            buckets[str(bound)] = total
+        return {
+            "count": self.count,
+            "sum": self.sum,
+            "p50": self.quantile(0.5),
+            "p99": self.quantile(0.99),
+            "buckets": buckets,
+        }
+
+
+def labels(values):
+    return ",".join(f'{key}="{value}"' for key, value in values)
+
+
+class Registry:
+    """
+    Holds the histograms and counters, keyed by name and labels.
+    """
+
+    def __init__(self, buckets=BUCKETS):
+        """
+        Initialize the Registry.
+
+        Args:
+            buckets (tuple, optional): The upper bounds of the histogram
+                buckets in seconds. Defaults to BUCKETS.
+        """
+        self.buckets = buckets
+        self.histograms = {}
+        self.counters = {}
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, **labels):
+        """
+        Add an observation to a histogram.
+
+        Args:
+            name (str): The name of the histogram.
+            value (float): The value.
+            labels (dict): The labels of the histogram.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(self.buckets)
+            histogram.observe(value)
+
+    def increment(self, name, value=1, **labels):
+        """
+        Increase a counter.
+
+        Args:
+            name (str): The name of the counter.
+            value (float, optional): The increment. Defaults to 1.
+            labels (dict): The labels of the counter.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def record(self, kind, operation, seconds, status, size=0):
+        """
+        Record a finished command.
+
+        Args:
+            kind (str): "vboxmanage", "ssh" or "log".
+            operation (str): The subcommand or method, e.g. "showvminfo" or "run".
+            seconds (float): The latency.
+            status: The exit status or "timeout".
+            size (int, optional): The size of the output in characters. Defaults to 0.
+        """
+        self.observe("vbox_seconds", seconds, kind=kind, operation=operation)
+        self.increment(
+            "vbox_calls_total", kind=kind, operation=operation, status=str(status)
+        )
+        self.increment("vbox_output_bytes_total", size, kind=kind, operation=operation)
+
+    @contextmanager
+    def timer(self, kind, operation):
+        """
+        Time a block of code, e.g. a parser.
+
+        Args:
+            kind (str): The kind of work, e.g. "parse".
+            operation (str): The operation, e.g. "info".
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(
+                "vbox_seconds",
+                time.perf_counter() - start,
+                kind=kind,
+                operation=operation,
+            )
+
+    def to_dict(self):
+        """
+        Convert all metrics to a dict that can be serialized as JSON.
+
+        Returns:
+            dict: The histograms and counters, each a list of dicts with
+            name, labels and value.
+        """
+        with self._lock:
+            return {
+                "histograms": [
+                    {"name": name, "labels": dict(key), **histogram.to_dict()}
+                    for (name, key), histogram in sorted(self.histograms.items())
+                ],
+                "counters": [
+                    {"name": name, "labels": dict(key), "value": value}
+                    for (name, key), value in sorted(self.counters.items())
+                ],
+            }
+
+    def prometheus(self):
+        """
+        Format all metrics in the Prometheus text exposition format.
+
+        Returns:
+            str: The metrics.
+        """
+        lines = []
+        with self._lock:
+            names = sorted({name for name, _ in self.histograms})
+            for name in names:
+                lines.append(f"# TYPE {name} histogram")
+                for (other, key), histogram in sorted(self.histograms.items()):
+                    if other != name:
+                        continue
+                    total = 0
+                    for bound, count in zip(histogram.bounds, histogram.counts):
+                        total += count
+                        bucket = labels(key + (("le", bound),))
+                        lines.append(f"{name}_bucket{{{bucket}}} {total}")
+                    bucket = labels(key + (("le", "+Inf"),))
+                    lines.append(f"{name}_bucket{{{bucket}}} {histogram.count}")
+                    lines.append(f"{name}_sum{{{labels(key)}}} {histogram.sum}")
+                    lines.append(f"{name}_count{{{labels(key)}}} {histogram.count}")
+            names = sorted({name for name, _ in self.counters})
+            for name in names:
+                lines.append(f"# TYPE {name} counter")
+                for (other, key), value in sorted(self.counters.items()):
+                    if other == name:
+                        lines.append(f"{name}{{{labels(key)}}} {value}")
+        return "\n".join(lines) + "\n"
+
+    def export(self, path):
+        """
+        Write all metrics to a file, replacing it atomically.
+
+        Args:
+            path (str): The file. Files ending in .json get JSON, all
+                others the Prometheus text format.
+        """
+        if path.endswith(".json"):
+            content = json.dumps(self.to_dict(), indent=2)
+        else:
+            content = self.prometheus()
+        with open(path + ".tmp", "w") as f:
+            f.write(content)
+        os.replace(path + ".tmp", path)
+
+    def reset(self):
+        """
+        Drop all metrics.
+        """
+        with self._lock:
+            self.histograms.clear()
+            self.counters.clear()
+
+
+@contextmanager
+def profile(path=None, sort="cumulative", limit=30):
+    """
+    Profile a block of code with cProfile.
+
+    Args:
+        path (str, optional): Also save the raw statistics to this file for
+            snakeviz or pstats. Defaults to None.
+        sort (str, optional): The sort order of the report. Defaults to "cumulative".
+        limit (int, optional): The number of functions in the report. Defaults to 30.
+
+    Yields:
+        dict: Contains the text report under "report" once the block ends.
+    """
+    result = {}
+    profiler = cProfile.Profile()
+    profiler.enable()
+    try:
+        yield result
+    finally:
+        profiler.disable()
+        if path is not None:
+            profiler.dump_stats(path)
+        stream = io.StringIO()
+        pstats.Stats(profiler, stream=stream).sort_stats(sort).print_stats(limit)
+        result["report"] = stream.getvalue()
+
+
+@contextmanager
+def trace_memory(limit=10, frames=1):
+    """
+    Trace the memory allocated by a block of code with tracemalloc.
+
+    Args:
+        limit (int, optional): The number of allocation sites in the report. Defaults to 10.
+        frames (int, optional): The depth of the stored tracebacks. Defaults to 1.
+
+    Yields:
+        dict: Contains the peak in bytes under "peak" and the largest
+        allocation sites under "top" once the block ends.
+    """
+    result = {}
+    started = not tracemalloc.is_tracing()
+    if started:
+        tracemalloc.start(frames)
+    tracemalloc.reset_peak()
+    before = tracemalloc.take_snapshot()
+    try:
+        yield result
+    finally:
+        after = tracemalloc.take_snapshot()
+        _, result["peak"] = tracemalloc.get_traced_memory()
+        result["top"] = [
+            str(statistic) for statistic in after.compare_to(before, "lineno")[:limit]
+        ]
+        if started:
+            tracemalloc.stop()
@@ -0,0 +1,263 @@
+"""
+A memory-mapped reader for the VBox.log of a VM on the local host.
+
+Every line of a VBox.log starts with the time since the VM process started,
+e.g. "00:01:02.345678 VMMDev: Guest Additions ...". The reader keeps a
+sparse index with the offset and time of the first line after every block
+of block bytes. Building it touches one page per block instead of reading
+the whole file, and on later calls only the blocks appended since the last
+call are indexed. Time range queries use the index to jump close to the
+first line and only read the lines in the range.
+"""
+
+import bisect
+import mmap
+import os
+import re
+from array import array
+from datetime import datetime
+from datetime import timedelta
+
+TIME = re.compile(rb"(\d+):(\d\d):(\d\d)\.(\d+) ")
+OPENED = re.compile(rb"Log opened (\d{4}-\d\d-\d\dT\d\d:\d\d:\d\d(?:\.\d{1,6})?)")
+
+
+def seconds(line):
+    """
+    Get the time of a log line.
+
+    Args:
+        line (bytes): The line.
+
+    Returns:
+        float: The seconds since the VM process started or None if the line
+        has no time.
+    """
+    match = TIME.match(line)
+    if match is None:
+        return None
+    hours, minutes, secs, fraction = match.groups()
+    return (
+        int(hours) * 3600
+        + int(minutes) * 60
+        + int(secs)
+        + int(fraction) / 10 ** len(fraction)
+    )
+
+
+class LogReader:
+    """
+    Reads a VBox.log through mmap with an incremental time index.
+    """
+
+    def __init__(self, path, block=65536):
+        """
+        Initialize the LogReader.
+
+        Args:
+            path (str): The path of the log file.
+            block (int, optional): The distance in bytes between two index
+                entries. Defaults to 65536.
+        """
+        self.path = path
+        self.block = block
+        self.offsets = array("Q")
+        self.times = array("d")
+        self.opened = None
+        self._inode = None
+        self._size = 0
+        self._map = None
+
+    def close(self):
+        """
+        Unmap the file.
+        """
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def refresh(self):
+        """
+        Map the current content of the file and index the appended blocks.
+
+        The index is rebuilt if the file was rotated or truncated.
+        """
+        stat = os.stat(self.path)
+        if stat.st_ino != self._inode or stat.st_size < self._size:
+            self.offsets = array("Q")
+            self.times = array("d")
+            self.opened = None
+            self._inode = stat.st_ino
+            self._size = 0
+        if stat.st_size == self._size and self._map is not None:
+            return
+        self.close()
+        self._size = stat.st_size
+        if self._size == 0:
+            return
+        with open(self.path, "rb") as file:
+            self._map = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.opened is None:
+            match = OPENED.search(self._map, 0, min(self._size, 4096))
+            if match:
+                self.opened = datetime.fromisoformat(match.group(1).decode())
+        position = self.block * len(self.offsets)
+        while position < self._size:
+            offset = 0 if position == 0 else self._map.find(b"\n", position) + 1
+            if offset == 0 and position != 0 or offset >= self._size:
+                break
+            entry = self._time_after(offset, position + self.block)
+            if entry is None:
+                # the rest of the block has no complete timed line yet
+                break
+            self.offsets.append(entry[0])
+            self.times.append(entry[1])
+            position += self.block
+
+    def _time_after(self, offset, limit):
+        """
+        Find the first complete line with a time at or after offset.
+
+        Args:
+            offset (int): The start of a line.
+            limit (int): Do not look at lines starting after limit.
+
+        Returns:
+            tuple: The offset and time of the line or None.
+        """
+        while offset < min(limit, self._size):
+            end = self._map.find(b"\n", offset)
+            if end == -1:
+                return None
+            time = seconds(self._map[offset : offset + 32])
+            if time is not None:
+                return offset, time
+            offset = end + 1
+        return None
+
+    def _lines(self, offset=0):
+        """
+        Yield the offset and content of the complete lines from offset on.
+
+        Args:
+            offset (int, optional): The start of a line. Defaults to 0.
+
+        Yields:
+            tuple: The offset and the line as bytes including its newline.
+        """
+        while offset < self._size:
+            end = self._map.find(b"\n", offset)
+            if end == -1:
+                return
+            yield offset, self._map[offset : end + 1]
+            offset = end + 1
+
+    def lines(self, start=None, end=None):
+        """
+        Yield the lines in a time range.
+
+        Lines without a time belong to the preceding line.
+
+        Args:
+            start (float or datetime, optional): The first time, as seconds
+                since the VM process started or as datetime. Defaults to None.
+            end (float or datetime, optional): The last time. Defaults to None.
+
+        Yields:
+            str: A line including its newline.
+        """
+        self.refresh()
+        if self._map is None:
+            return
+        start = self._seconds(start)
+        end = self._seconds(end)
+        offset = 0
+        if start is not None:
+            # the last indexed line before start, lines are in time order
+            index = bisect.bisect_left(self.times, start) - 1
+            offset = self.offsets[index] if index >= 0 else 0
+        current = None
+        for _, line in self._lines(offset):
+            time = seconds(line)
+            if time is not None:
+                current = time
+            if start is not None and (current is None or current < start):
+                continue
+            if end is not None and current is not None and current > end:
+                return
+            yield line.decode(errors="replace")
+
+    def tail(self, count=10):
+        """
+        Get the last lines of the log by reading backwards from the end.
+
+        Args:
+            count (int, optional): The number of lines. Defaults to 10.
+
+        Returns:
+            list: The lines including their newlines.
+        """
+        self.refresh()
+        if self._map is None or count <= 0:
+            return []
+        end = self._size
+        if self._map[end - 1 : end] == b"\n":
+            end -= 1
+        position = end
+        for _ in range(count):
+            position = self._map.rfind(b"\n", 0, position)
+            if position == -1:
+                break
+        return [line.decode(errors="replace") for _, line in self._lines(position + 1)]
+
+    def search(self, pattern, start=None, end=None):
+        """
+        Yield the lines that match a regular expression.
+
+        Args:
+            pattern (str): The regular expression.
+            start (float or datetime, optional): Only search from this time on. Defaults to None.
+            end (float or datetime, optional): Only search up to this time. Defaults to None.
+
+        Yields:
+            str: A matching line including its newline.
+        """
+        if start is not None or end is not None:
+            expression = re.compile(pattern)
+            for line in self.lines(start, end):
+                if expression.search(line):
+                    yield line
+            return
+        self.refresh()
+        if self._map is None:
+            return
+        # the regular expression runs directly on the mapped bytes, ^ and $
+        # match at line boundaries as they do for the single lines above
+        expression = re.compile(pattern.encode(), re.MULTILINE)
+        position = 0
+        while True:
+            match = expression.search(self._map, position, self._size)
+            if match is None:
+                return
+            first = self._map.rfind(b"\n", 0, match.start()) + 1
+            last = self._map.find(b"\n", match.start())
+            if last == -1:
+                return
+            yield self._map[first : last + 1].decode(errors="replace")
+            position = last + 1
+
+    def _seconds(self, value):
+        """
+        Convert a datetime to the seconds since the log was opened.
+
+        Args:
+            value (float or datetime): The time.
+
+        Returns:
+            float: The seconds or None.
+        """
+        if isinstance(value, datetime):
+            if self.opened is None:
+                raise ValueError(f"The start time of {self.path} is unknown")
+            return (value - self.opened) / timedelta(seconds=1)
+        return value
@@ -0,0 +1,183 @@
+"""
+Bounded in-memory storage for VM metrics.
+
+Every series of a VM and metric is a ring buffer of two arrays of C
+doubles, one for the times and one for the values, so a sample takes 16
+bytes and the memory of a series never grows beyond its capacity.
+"""
+
+import threading
+from array import array
+
+# the metrics of a VM reported by VBoxManage metrics, the Guest/ ones need
+# the Guest Additions
+METRICS = [
+    "CPU/Load/User",
+    "CPU/Load/Kernel",
+    "RAM/Usage/Used",
+    "Disk/Usage/Used",
+    "Net/Rate/Rx",
+    "Net/Rate/Tx",
+    "Guest/CPU/Load/User",
+    "Guest/CPU/Load/Kernel",
+    "Guest/RAM/Usage/Free",
+]
+
+
+class RingBuffer:
+    """
+    Keeps the last capacity samples of a series.
+    """
+
+    __slots__ = ("capacity", "times", "values", "start", "count")
+
+    def __init__(self, capacity=3600):
+        """
+        Initialize the RingBuffer.
+
+        Args:
+            capacity (int, optional): The number of samples. Defaults to 3600.
+        """
+        self.capacity = capacity
+        self.times = array("d", bytes(8 * capacity))
+        self.values = array("d", bytes(8 * capacity))
+        self.start = 0
+        self.count = 0
+
+    def append(self, time, value):
+        """
+        Add a sample, replacing the oldest one if the buffer is full.
+
+        Args:
+            time (float): The time of the sample as seconds since the epoch.
+            value (float): The value.
+        """
+        index = (self.start + self.count) % self.capacity
+        self.times[index] = time
+        self.values[index] = value
+        if self.count < self.capacity:
+            self.count += 1
+        else:
+            self.start = (self.start + 1) % self.capacity
+
+    def items(self, start=None):
+        """
+        Get the samples, oldest first.
+
+        Args:
+            start (float, optional): Only return samples from this time on. Defaults to None.
+
+        Returns:
+            list: The samples as (time, value) tuples.
+        """
+        indices = [(self.start + i) % self.capacity for i in range(self.count)]
+        return [
+            (self.times[i], self.values[i])
+            for i in indices
+            if start is None or self.times[i] >= start
+        ]
+
+    def last(self):
+        """
+        Get the newest sample.
+
+        Returns:
+            tuple: The time and value or None if the buffer is empty.
+        """
+        if self.count == 0:
+            return None
+        index = (self.start + self.count - 1) % self.capacity
+        return self.times[index], self.values[index]
+
+    def __len__(self):
+        return self.count
+
+
+class Metrics:
+    """
+    The series of all VMs and metrics.
+    """
+
+    def __init__(self, capacity=3600):
+        """
+        Initialize the Metrics.
+
+        Args:
+            capacity (int, optional): The number of samples kept per VM and
+                metric. Defaults to 3600.
+        """
+        self.capacity = capacity
+        self.series = {}
+        self.units = {}
+        self._lock = threading.Lock()
+
+    def add(self, vm, metric, time, value, unit=""):
+        """
+        Add a sample.
+
+        Args:
+            vm (str): The name of the VM.
+            metric (str): The metric, e.g. "CPU/Load/User".
+            time (float): The time of the sample as seconds since the epoch.
+            value (float): The value.
+            unit (str, optional): The unit of the value, e.g. "%". Defaults to "".
+        """
+        with self._lock:
+            series = self.series.get((vm, metric))
+            if series is None:
+                series = self.series[(vm, metric)] = RingBuffer(self.capacity)
+            series.append(time, value)
+            self.units[metric] = unit
+
+    def query(self, vm=None, metric=None, start=None):
+        """
+        Get the samples of the matching series.
+
+        Args:
+            vm (str, optional): Only return this VM. Defaults to None.
+            metric (str, optional): Only return this metric. Defaults to None.
+            start (float, optional): Only return samples from this time on. Defaults to None.
+
+        Returns:
+            list: One dict per series with vm, metric, unit and the samples
+            as [time, value] lists.
+        """
+        with self._lock:
+            return [
+                {
+                    "vm": name,
+                    "metric": key,
+                    "unit": self.units.get(key, ""),
+                    "samples": [list(sample) for sample in series.items(start)],
+                }
+                for (name, key), series in sorted(self.series.items())
+                if vm in (None, name) and metric in (None, key)
+            ]
+
+    def latest(self):
+        """
+        Get the newest value of every series.
+
+        Returns:
+            dict: The values keyed by VM and metric.
+        """
+        result = {}
+        with self._lock:
+            for (vm, metric), series in sorted(self.series.items()):
+                sample = series.last()
+                if sample is not None:
+                    result.setdefault(vm, {})[metric] = sample[1]
+        return result
+
+    def clear(self, vm=None):
+        """
+        Drop the series of a VM.
+
+        Args:
+            vm (str, optional): The name of the VM. Defaults to None, which
+                drops all series.
+        """
+        with self._lock:
+            for key in list(self.series):
+                if vm in (None, key[0]):
+                    del self.series[key]
@@ -0,0 +1,351 @@
+"""
+Parsers for the output of VBoxManage.
+
+They are shared by Vbox and AsyncVbox so both return identical data.
+"""
+
+import re
+
+
+def parse_list(output):
+    """
+    Parse the output of VBoxManage list vms.
+
+    Args:
+        output (str): The output of the command.
+
+    Returns:
+        list: A list of dicts with the name and UUID of each VM.
+    """
+    vms = []
+    for line in output.splitlines():
+        match = re.match(r'^"(.+)" {(.+)}$', line)
+        if match:
+            vms.append(
+                {
+                    "name": match.group(1),
+                    "UUID": match.group(2),
+                }
+            )
+    return vms
+
+
+# a line of --machinereadable output: key=value where key and value are
+# either "quoted" with backslash escapes or bare
+MACHINEREADABLE = re.compile(
+    r'^(?:"((?:[^"\\]|\\.)*)"|([^=\n]+))=(?:"((?:[^"\\]|\\.)*)"|([^\n]*))$',
+    re.MULTILINE,
+)
+ESCAPE = re.compile(r"\\(.)")
+ESCAPES = {"n": "\n", "r": "\r", "t": "\t"}
+INTEGER = re.compile(r"^-?\d+$")
+NIC = re.compile(
+    r"^(nic|nictype|nicspeed|macaddress|cableconnected|bridgeadapter|"
+    r"hostonlyadapter|hostonly-network|intnet|natnet|genericdrv|nicproperties"
+    r"|nictrace|nictracefile|nicbootprio|nicpromisc|nicbwgroup)(\d+)$"
+)
+CONTROLLER = re.compile(
+    r"^storagecontroller(name|type|instance|maxportcount|portcount|bootable)(\d+)$"
+)
+DISK = re.compile(
+    r"^(.+?)-(?:(ImageUUID|IsEjected|tempeject|nonrotational|discard"
+    r"|hot-pluggable)-)?(\d+)-(\d+)$"
+)
+
+
+def unescape(value):
+    """
+    Remove the backslash escapes of a quoted machine readable value.
+
+    Args:
+        value (str): The value without the surrounding quotes.
+
+    Returns:
+        str: The unescaped value.
+    """
+    if "\\" not in value:
+        return value
+    return ESCAPE.sub(lambda m: ESCAPES.get(m.group(1), m.group(1)), value)
+
+
+def convert(value, quoted):
+    """
+    Convert a machine readable value to int or bool where possible.
+
+    VBoxManage quotes strings and prints numbers bare, so only bare values
+    become int and only quoted on/off become bool.
+
+    Args:
+        value (str): The value.
+        quoted (bool): Whether the value was quoted.
+
+    Returns:
+        int, bool or str: The converted value.
+    """
+    if quoted:
+        return {"on": True, "off": False}.get(value, value)
+    if INTEGER.match(value):
+        return int(value)
+    return value
+
+
+def group(info):
+    """
+    Move the NIC and storage entries of a parsed VM into nested groups.
+
+    Args:
+        info (dict): The flat information about the VM.
+
+    Returns:
+        dict: The information with "nics", "storagecontrollers" and "disks"
+        entries, each keyed by their index or attachment.
+    """
+    nics = {}
+    controllers = {}
+    disks = {}
+    result = {}
+    names = {
+        info[key]
+        for key in info
+        if key.startswith("storagecontrollername") and isinstance(info[key], str)
+    }
+    for key, value in info.items():
+        if not key[-1:].isdigit():
+            result[key] = value
+            continue
+        match = NIC.match(key)
+        if match:
+            nics.setdefault(int(match.group(2)), {})[match.group(1)] = value
+            continue
+        match = CONTROLLER.match(key)
+        if match:
+            controllers.setdefault(int(match.group(2)), {})[match.group(1)] = value
+            continue
+        match = "-" in key and DISK.match(key)
+        if match and match.group(1) in names:
+            attachment = f"{match.group(1)}-{match.group(3)}-{match.group(4)}"
+            field = (match.group(2) or "path").lower()
+            disks.setdefault(attachment, {})[field] = value
+            continue
+        result[key] = value
+    result["nics"] = nics
+    result["storagecontrollers"] = controllers
+    result["disks"] = disks
+    return result
+
+
+def parse_info(output, typed=False, keys=None):
+    """
+    Parse the output of VBoxManage showvminfo --machinereadable.
+
+    The output is scanned in a single pass. Lines are split at the first
+    "=" and only lines with a quoted key that contains "=" fall back to the
+    precompiled MACHINEREADABLE expression. Quoted keys and values are
+    unescaped, so values may contain "=" and escaped quotes.
+
+    Args:
+        output (str): The output of the command.
+        typed (bool, optional): Convert numbers to int and on/off to bool,
+            and group NICs, storage controllers and disks. Defaults to False.
+        keys (list, optional): Only return these keys and stop scanning as
+            soon as all of them were found. Defaults to None, all keys.
+
+    Returns:
+        dict: The information about the VM.
+    """
+    info = {}
+    wanted = set(keys) if keys else None
+    for line in output.splitlines():
+        key, separator, value = line.partition("=")
+        if not separator:
+            continue
+        if key[:1] == '"':
+            if len(key) > 1 and key[-1] == '"':
+                key = unescape(key[1:-1])
+            else:
+                match = MACHINEREADABLE.match(line)
+                if match is None:
+                    continue
+                key = unescape(match.group(1) or match.group(2))
+                value = match.group(4)
+                if value is None:
+                    value = '"' + match.group(3) + '"'
+        if wanted is not None and key not in wanted:
+            continue
+        quoted = len(value) > 1 and value[0] == '"' and value[-1] == '"'
+        if quoted:
+            value = unescape(value[1:-1])
+        info[key] = convert(value, quoted) if typed else value
+        if wanted is not None:
+            wanted.discard(key)
+            if not wanted:
+                break
+    if typed and keys is None:
+        info = group(info)
+    return info
+
+
+def parse_status(output):
+    """
+    Parse the state from the output of VBoxManage showvminfo.
+
+    Args:
+        output (str): The output of the command.
+
+    Returns:
+        str: The state of the VM or "Unknown".
+    """
+    for line in output.split("\n"):
+        if line.startswith("State:"):
+            return parse_state(line.split(":", 1)[1])
+    return "Unknown"
+
+
+def parse_state(value):
+    """
+    Parse the value of a State line of VBoxManage.
+
+    Args:
+        value (str): The value, e.g. "running (since 2024-01-01T00:00:00.000000000)".
+
+    Returns:
+        str: The state without the time stamp, e.g. "running".
+    """
+    return value.split(" (since ")[0].strip()
+
+
+def parse_nic(value):
+    """
+    Parse the value of a NIC line of VBoxManage list -l vms.
+
+    Args:
+        value (str): The value, e.g. "MAC: 080027A1B2C3, Attachment: NAT, ...".
+
+    Returns:
+        dict: The attributes of the NIC with lower case keys, e.g. mac and attachment.
+    """
+    nic = {}
+    for part in value.split(", "):
+        key, _, attribute = part.partition(": ")
+        nic[key.strip().lower().replace(" ", "_")] = attribute.strip()
+    return nic
+
+
+def parse_inventory(output):
+    """
+    Parse the output of VBoxManage list -l vms.
+
+    Args:
+        output (str): The output of the command.
+
+    Returns:
+        list: A list of dicts with name, UUID, state, memory, cpus and nics of each VM.
+    """
+    vms = []
+    vm = None
+    for line in output.splitlines():
+        # nested entries such as snapshots are indented and ignored
+        match = re.match(r"^(\S[^:]*):\s*(.*)$", line)
+        if not match:
+            continue
+        key, value = match.group(1), match.group(2).strip()
+        if key == "Name" and not value.startswith("'"):
+            vm = {
+                "name": value,
+                "UUID": None,
+                "state": None,
+                "memory": None,
+                "cpus": None,
+                "nics": [],
+            }
+            vms.append(vm)
+        elif vm is None:
+            continue
+        elif key == "UUID":
+            vm["UUID"] = value
+        elif key == "State":
+            vm["state"] = parse_state(value)
+        elif key == "Memory size":
+            vm["memory"] = int(re.sub(r"\D", "", value))
+        elif key == "Number of CPUs":
+            vm["cpus"] = int(value)
+        elif re.match(r"^NIC \d+$", key) and value != "disabled":
+            nic = parse_nic(value)
+            nic["nic"] = int(key.split()[1])
+            vm["nics"].append(nic)
+    return vms
+
+
+METRIC = re.compile(r"^(.+?)\s+(\S+/\S+)\s+(.*)$")
+VALUE = re.compile(r"^(-?[\d.]+)\s*(.*)$")
+
+
+def parse_metrics(output):
+    """
+    Parse the output of VBoxManage metrics query.
+
+    Args:
+        output (str): The output of the command, one line per object and
+            metric such as "vm1  RAM/Usage/Used  1048576 kB".
+
+    Returns:
+        list: A list of dicts with the object, metric, values as floats,
+        oldest first, and the unit of each line.
+    """
+    metrics = []
+    for line in output.splitlines():
+        match = METRIC.match(line)
+        if match is None or match.group(1) == "Object":
+            continue
+        name, metric, text = match.groups()
+        values = []
+        unit = ""
+        for value in text.split(","):
+            value = VALUE.match(value.strip())
+            if value:
+                values.append(float(value.group(1)))
+                unit = value.group(2)
+        metrics.append(
+            {"object": name, "metric": metric, "values": values, "unit": unit}
+        )
+    return metrics
+
+
+def parse_media(output):
+    """
+    Parse the output of VBoxManage list hdds.
+
+    Args:
+        output (str): The output of the command, one block per medium.
+
+    Returns:
+        list: A list of dicts with the UUID, parent UUID, type, location and
+        the names of the VMs using each medium.
+    """
+    media = []
+    medium = None
+    for line in output.splitlines():
+        match = re.match(r"^(\S[^:]*):\s*(.*)$", line)
+        if not match:
+            continue
+        key, value = match.group(1), match.group(2).strip()
+        if key == "UUID":
+            medium = {
+                "UUID": value,
+                "parent": None,
+                "type": None,
+                "location": None,
+                "vms": [],
+            }
+            media.append(medium)
+        elif medium is None:
+            continue
+        elif key == "Parent UUID":
+            medium["parent"] = None if value == "base" else value
+        elif key == "Type":
+            medium["type"] = value
+        elif key == "Location":
+            medium["location"] = value
+        elif key == "In use by VMs":
+            medium["vms"] = re.findall(r"\s*([^,]+?) \(UUID: [^)]*\)", value)
+    return media
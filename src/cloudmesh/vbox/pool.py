@@ -0,0 +1,275 @@
+"""
+A warm pool of VMs that were created and booted ahead of time.
+
+The pool keeps up to size linked clones of an image either in saved state
+or running. Vbox.create takes a VM from the pool of its image and renames
+it, which takes seconds instead of a clone and a full boot. VirtualBox
+cannot rename a running VM, so running VMs are saved for the rename, which
+makes saved pools the faster choice. Either way the VM is handed out
+saved, like a fast clone, and start resumes it. If the rename fails, the
+VM goes back to the pool, or is dropped if it no longer exists, and create
+clones a new VM. A background thread refills the pool after every
+hand-out. A VM that fails to be created or booted is deleted again.
+If no VM was taken for idle seconds the pool shrinks to min_size, and VMs
+older than max_age are replaced.
+"""
+
+import logging
+import subprocess
+import threading
+import time
+import uuid
+from collections import deque
+from functools import partial
+
+log = logging.getLogger(__name__)
+
+
+class WarmPool:
+    """
+    Keeps pre-created VMs of one image ready to be handed out.
+    """
+
+    def __init__(
+        self,
+        vbox,
+        image,
+        size=2,
+        state="saved",
+        min_size=0,
+        idle=None,
+        max_age=None,
+        interval=10,
+        timeout=300,
+    ):
+        """
+        Initialize the WarmPool.
+
+        Args:
+            vbox (Vbox): The Vbox that creates the VMs.
+            image (str): The name of the golden VM.
+            size (int, optional): The number of ready VMs. Defaults to 2.
+            state (str, optional): "saved" keeps the VMs in saved state,
+                which uses no CPU or RAM of the host, "running" keeps them
+                booted. Defaults to "saved".
+            min_size (int, optional): The number of VMs kept after the pool
+                was idle. Defaults to 0.
+            idle (float, optional): Seconds without a hand-out after which
+                the pool shrinks to min_size. Defaults to None, never.
+            max_age (float, optional): Seconds after which a ready VM is
+                replaced. Defaults to None, never.
+            interval (float, optional): Seconds between two checks of the
+                background thread. Defaults to 10.
+            timeout (float, optional): Seconds to wait for a VM to boot. Defaults to 300.
+        """
+        if state not in ["running", "saved"]:
+            raise ValueError(f"Unknown state: {state}")
+        self.vbox = vbox
+        self.image = image
+        self.size = size
+        self.state = state
+        self.min_size = min_size
+        self.idle = idle
+        self.max_age = max_age
+        self.interval = interval
+        self.timeout = timeout
+        self.prefix = f"{image}-pool-"
+        self.ready = deque()
+        self.used = time.monotonic()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def target(self):
+        """
+        Get the number of VMs the pool should hold now.
+
+        Returns:
+            int: size, or min_size once the pool was idle for idle seconds.
+        """
+        if self.idle is not None and time.monotonic() - self.used > self.idle:
+            return self.min_size
+        return self.size
+
+    def adopt(self):
+        """
+        Take over the pool VMs of an earlier process, e.g. after a restart.
+
+        Only VMs in the state of the pool are taken over.
+
+        Returns:
+            int: The number of adopted VMs.
+        """
+        states = self.vbox._states()
+        now = time.monotonic()
+        with self._lock:
+            known = {name for name, _ in self.ready}
+            adopted = [
+                name
+                for name, state in sorted(states.items())
+                if name.startswith(self.prefix)
+                and name not in known
+                and state == self.state
+            ]
+            self.ready.extend((name, now) for name in adopted)
+        return len(adopted)
+
+    def _boot(self, name, timeout=None):
+        """
+        Create, boot and optionally save one VM.
+
+        Args:
+            name (str): The name of the VM.
+            timeout (float, optional): Seconds to wait for each command and
+                for the boot. Defaults to None.
+
+        Raises:
+            subprocess.TimeoutExpired: If the VM did not boot in time.
+        """
+        self.vbox.create(name, self.image, timeout=timeout, pool=False)
+        self.vbox.start(name, timeout=timeout)
+        if self.vbox._wait(name, "running", timeout=timeout)["status"] != "reached":
+            raise subprocess.TimeoutExpired(["VBoxManage", "startvm", name], timeout)
+        if self.state == "saved":
+            self.vbox.suspend(name, timeout=timeout)
+
+    def _prepare(self):
+        """
+        Create, boot and optionally save one VM.
+
+        Returns:
+            str: The name of the VM.
+
+        Raises:
+            subprocess.CalledProcessError: If a command failed, the partly
+                created VM is deleted.
+            subprocess.TimeoutExpired: If the VM did not boot in time, it is
+                deleted.
+        """
+        name = f"{self.prefix}{uuid.uuid4().hex[:8]}"
+        try:
+            self.vbox._checked(self._boot)(name, timeout=self.timeout)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            # both fail silently if the clone was not created or is not running
+            self.vbox.stop(name)
+            self.vbox.destroy(name)
+            raise
+        return name
+
+    def _discard(self, name):
+        """
+        Power off and delete a VM of the pool.
+
+        Args:
+            name (str): The name of the VM.
+        """
+        if self.state == "running":
+            self.vbox.stop(name)
+        self.vbox.destroy(name)
+
+    def fill(self):
+        """
+        Replace expired VMs, then create or delete VMs to reach the target.
+
+        Returns:
+            int: The number of ready VMs.
+        """
+        expired = []
+        with self._lock:
+            if self.max_age is not None:
+                now = time.monotonic()
+                while self.ready and now - self.ready[0][1] > self.max_age:
+                    expired.append(self.ready.popleft()[0])
+            while len(self.ready) > self.target():
+                # the oldest VMs are evicted first
+                expired.append(self.ready.popleft()[0])
+            missing = self.target() - len(self.ready)
+        for name in expired:
+            self._discard(name)
+        for _ in range(missing):
+            if self._stopped.is_set():
+                break
+            name = self._prepare()
+            with self._lock:
+                self.ready.append((name, time.monotonic()))
+        return len(self.ready)
+
+    def acquire(self, name):
+        """
+        Hand out a ready VM under a new name and trigger a refill.
+
+        Args:
+            name (str): The name the VM gets.
+
+        Returns:
+            str: The name of the saved VM, or None if the pool is empty or
+            the rename failed, e.g. because the name is taken.
+        """
+        with self._lock:
+            if not self.ready:
+                entry = None
+            else:
+                entry = self.ready.popleft()
+            self.used = time.monotonic()
+        self._wake.set()
+        if entry is None:
+            return None
+        vm = entry[0]
+        try:
+            if self.state == "running":
+                # a running VM holds the session lock that the rename needs
+                self.vbox._checked(self.vbox.suspend)(vm, timeout=self.timeout)
+            rename = partial(self.vbox.rename, destination=name)
+            self.vbox._checked(rename)(vm, timeout=self.timeout)
+        except (subprocess.CalledProcessError, subprocess.TimeoutExpired):
+            state = self.vbox._states().get(vm)
+            if state is None:
+                # e.g. deleted by someone else, the refill replaces it
+                return None
+            if self.state == "running" and state != "running":
+                self.vbox.resume(vm)
+            with self._lock:
+                self.ready.appendleft(entry)
+            return None
+        return name
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            # cleared before the fill, so a hand-out during it is not missed
+            self._wake.clear()
+            try:
+                self.fill()
+            except Exception:
+                # e.g. a timeout of VBoxManage, retried in the next round
+                log.exception("Filling the warm pool of %s failed", self.image)
+            self._wake.wait(self.interval)
+
+    def start(self):
+        """
+        Adopt existing pool VMs and keep the pool filled in a background thread.
+        """
+        self.adopt()
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._loop, daemon=True)
+        self._thread.start()
+
+    def stop(self, drain=False):
+        """
+        Stop the background thread.
+
+        Args:
+            drain (bool, optional): Also delete the ready VMs. Defaults to False,
+                which keeps them for the next start.
+        """
+        self._stopped.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if drain:
+            with self._lock:
+                names = [name for name, _ in self.ready]
+                self.ready.clear()
+            for name in names:
+                self._discard(name)
@@ -0,0 +1,197 @@
+"""
+Compact records for VMs, their NICs and their disks.
+
+The records use __slots__ instead of a per-instance dict, and the keys and
+short values of the remaining VM attributes are interned, so thousands of
+VMs can be kept in memory with a fraction of the space of the parsed dicts.
+"""
+
+import sys
+
+
+def intern(value):
+    """
+    Intern short strings, which repeat across VMs, e.g. "off" or "none".
+
+    Args:
+        value: The value.
+
+    Returns:
+        The interned string or the unchanged value.
+    """
+    if isinstance(value, str) and len(value) <= 16:
+        return sys.intern(value)
+    return value
+
+
+class NICRecord:
+    """
+    A network interface of a VM.
+    """
+
+    __slots__ = ("index", "attachment", "type", "mac", "cable")
+
+    def __init__(self, index, attachment=None, type=None, mac=None, cable=None):
+        self.index = index
+        self.attachment = attachment
+        self.type = type
+        self.mac = mac
+        self.cable = cable
+
+    def to_dict(self):
+        """
+        Convert the record to a dict.
+
+        Returns:
+            dict: The attributes of the NIC.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"NICRecord({self.index}, {self.attachment!r}, mac={self.mac!r})"
+
+
+class DiskRecord:
+    """
+    A disk attached to a storage controller of a VM.
+    """
+
+    __slots__ = ("attachment", "path", "uuid")
+
+    def __init__(self, attachment, path=None, uuid=None):
+        self.attachment = attachment
+        self.path = path
+        self.uuid = uuid
+
+    def to_dict(self):
+        """
+        Convert the record to a dict.
+
+        Returns:
+            dict: The attributes of the disk.
+        """
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"DiskRecord({self.attachment!r}, {self.path!r})"
+
+
+class VMRecord:
+    """
+    A VM with its most used attributes as slots.
+
+    All other attributes reported by VBoxManage are kept in extra.
+    """
+
+    __slots__ = ("name", "UUID", "state", "memory", "cpus", "nics", "disks", "extra")
+
+    def __init__(
+        self,
+        name,
+        UUID=None,
+        state=None,
+        memory=None,
+        cpus=None,
+        nics=(),
+        disks=(),
+        extra=None,
+    ):
+        self.name = name
+        self.UUID = UUID
+        self.state = state
+        self.memory = memory
+        self.cpus = cpus
+        self.nics = tuple(nics)
+        self.disks = tuple(disks)
+        self.extra = extra
+
+    @classmethod
+    def from_list(cls, vm):
+        """
+        Create a record from an entry of parse_list or parse_inventory.
+
+        Args:
+            vm (dict): The entry with name, UUID and optionally state,
+                memory, cpus and nics.
+
+        Returns:
+            VMRecord: The record.
+        """
+        nics = [
+            NICRecord(
+                nic["nic"],
+                attachment=nic.get("attachment"),
+                type=nic.get("type"),
+                mac=nic.get("mac"),
+                cable=nic.get("cable_connected") == "on",
+            )
+            for nic in vm.get("nics", ())
+        ]
+        return cls(
+            vm["name"],
+            UUID=vm.get("UUID"),
+            state=vm.get("state"),
+            memory=vm.get("memory"),
+            cpus=vm.get("cpus"),
+            nics=nics,
+        )
+
+    @classmethod
+    def from_info(cls, info):
+        """
+        Create a record from the typed result of parse_info.
+
+        Args:
+            info (dict): The information about the VM parsed with typed=True.
+
+        Returns:
+            VMRecord: The record.
+        """
+        info = dict(info)
+        nics = [
+            NICRecord(
+                index,
+                attachment=nic.get("nic"),
+                type=nic.get("nictype"),
+                mac=nic.get("macaddress"),
+                cable=nic.get("cableconnected"),
+            )
+            for index, nic in sorted(info.pop("nics", {}).items())
+            if nic.get("nic", "none") != "none"
+        ]
+        disks = [
+            DiskRecord(attachment, path=disk.get("path"), uuid=disk.get("imageuuid"))
+            for attachment, disk in info.pop("disks", {}).items()
+            if disk.get("path") not in (None, "none", "emptydrive")
+        ]
+        return cls(
+            info.pop("name", None),
+            UUID=info.pop("UUID", None),
+            state=info.pop("VMState", None),
+            memory=info.pop("memory", None),
+            cpus=info.pop("cpus", None),
+            nics=nics,
+            disks=disks,
+            extra={sys.intern(key): intern(value) for key, value in info.items()},
+        )
+
+    def to_dict(self):
+        """
+        Convert the record to a dict that can be serialized as JSON.
+
+        Returns:
+            dict: The attributes of the VM.
+        """
+        return {
+            "name": self.name,
+            "UUID": self.UUID,
+            "state": self.state,
+            "memory": self.memory,
+            "cpus": self.cpus,
+            "nics": [nic.to_dict() for nic in self.nics],
+            "disks": [disk.to_dict() for disk in self.disks],
+            "extra": self.extra,
+        }
+
+    def __repr__(self):
+        return f"VMRecord({self.name!r}, {self.UUID!r}, state={self.state!r})"
@@ -0,0 +1,115 @@
+"""
+A pool of persistent, multiplexed OpenSSH connections.
+
+Each destination gets one master connection through an OpenSSH
+ControlMaster socket. Later ssh calls to the same destination reuse it and
+skip the TCP and key exchange handshakes. A master closes itself once no
+client used it for idle seconds (ControlPersist). OpenSSH counts that time
+from the moment the last session ended, so a master is never closed under
+a command that is still running, and building a command never blocks.
+"""
+
+import hashlib
+import os
+import subprocess
+import tempfile
+import threading
+
+
+class SshPool:
+    """
+    Builds ssh commands that share one master connection per destination.
+    """
+
+    def __init__(self, directory=None, idle=300, options=None):
+        """
+        Initialize the SshPool.
+
+        Args:
+            directory (str, optional): Where the control sockets are created.
+                Defaults to a new temporary directory.
+            idle (int, optional): Seconds after the last session ended
+                until a master connection closes itself. Defaults to 300.
+            options (list, optional): Additional ssh options such as
+                ["-o", "StrictHostKeyChecking=no"]. Defaults to None.
+        """
+        self.directory = directory or tempfile.mkdtemp(prefix="cm-ssh-")
+        self.idle = idle
+        self.options = options or []
+        self.used = set()
+        self._lock = threading.Lock()
+
+    def control_path(self, destination):
+        """
+        Get the control socket of a destination.
+
+        The name is a short hash, as Unix socket paths are limited to about
+        100 characters.
+
+        Args:
+            destination (str): The destination, e.g. user@host.
+
+        Returns:
+            str: The path of the control socket.
+        """
+        digest = hashlib.sha1(destination.encode()).hexdigest()[:16]
+        return os.path.join(self.directory, digest)
+
+    def _options(self, destination):
+        return [
+            "-o",
+            "ControlMaster=auto",
+            "-o",
+            f"ControlPath={self.control_path(destination)}",
+            "-o",
+            f"ControlPersist={self.idle}",
+        ] + self.options
+
+    def command(self, destination, command=None):
+        """
+        Build an ssh command that uses the pooled connection.
+
+        Args:
+            destination (str): The destination, e.g. user@host.
+            command (str, optional): The remote command. Defaults to None.
+
+        Returns:
+            list: The ssh command as a list of strings.
+        """
+        with self._lock:
+            self.used.add(destination)
+        ssh_command = ["ssh"] + self._options(destination) + [destination]
+        if command:
+            ssh_command.append(command)
+        return ssh_command
+
+    def close(self, destination):
+        """
+        Close the master connection of a destination.
+
+        Args:
+            destination (str): The destination, e.g. user@host.
+        """
+        with self._lock:
+            self.used.discard(destination)
+        if os.path.exists(self.control_path(destination)):
+            subprocess.run(self.exit_command(destination), capture_output=True)
+
+    def exit_command(self, destination):
+        """
+        Build the ssh command that closes the master connection of a destination.
+
+        Args:
+            destination (str): The destination, e.g. user@host.
+
+        Returns:
+            list: The ssh command as a list of strings.
+        """
+        return ["ssh"] + self._options(destination) + ["-O", "exit", destination]
+
+    def close_all(self):
+        """
+        Close all master connections.
+        """
+        for destination in list(self.used):
+            self.close(destination)
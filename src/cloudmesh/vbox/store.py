@@ -0,0 +1,350 @@
+"""
+An append-only, columnar store for the history of VM metrics.
+
+The samples are partitioned by resolution, UTC day and metric. Every
+partition is a directory with one file per column holding the raw machine
+values of an array, so appending is a write at the end of each file and
+reading a column is a single read into an array::
+
+    ~/.cloudmesh/vbox/metrics/
+        vms.json                        the VM names, the vm column holds
+                                        their index
+        0/2024-01-15/CPU-Load-User/     raw samples
+            time  vm  value
+        300/2024-01-15/CPU-Load-User/   5 minute means
+            time  vm  value  min  max  count
+
+compact moves partitions older than the retention of their resolution to
+the next coarser resolution and deletes them from the coarsest one.
+The store expects a single writer.
+"""
+
+import json
+import os
+import shutil
+import time
+from array import array
+
+STORE = os.path.expanduser("~/.cloudmesh/vbox/metrics")
+
+DAY = 86400
+
+# the resolutions in seconds, 0 for raw samples, and how long their
+# partitions are kept
+RETENTION = [(0, 7 * DAY), (300, 90 * DAY), (3600, 730 * DAY)]
+
+COLUMNS = {"time": "d", "vm": "I", "value": "d", "min": "d", "max": "d", "count": "I"}
+RAW = ["time", "vm", "value"]
+
+
+def day(timestamp):
+    """
+    Get the partition of a time.
+
+    Args:
+        timestamp (float): Seconds since the epoch.
+
+    Returns:
+        str: The UTC date, e.g. "2024-01-15".
+    """
+    return time.strftime("%Y-%m-%d", time.gmtime(timestamp))
+
+
+class MetricStore:
+    """
+    Appends metric samples to column files and answers range queries.
+    """
+
+    def __init__(self, directory=STORE, retention=None):
+        """
+        Initialize the MetricStore.
+
+        Args:
+            directory (str, optional): The directory of the store. Defaults to
+                ~/.cloudmesh/vbox/metrics.
+            retention (list, optional): (resolution, seconds) pairs from fine
+                to coarse. The resolutions must divide a day. Defaults to
+                RETENTION.
+        """
+        self.directory = directory
+        self.retention = retention or RETENTION
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, "vms.json")
+        self.vms = []
+        if os.path.exists(path):
+            with open(path) as f:
+                self.vms = json.load(f)
+        self._index = {name: i for i, name in enumerate(self.vms)}
+
+    def _vm(self, name):
+        """
+        Get the index of a VM and register new names.
+
+        Args:
+            name (str): The name of the VM.
+
+        Returns:
+            int: The index of the VM.
+        """
+        if name not in self._index:
+            self._index[name] = len(self.vms)
+            self.vms.append(name)
+            path = os.path.join(self.directory, "vms.json")
+            with open(path + ".tmp", "w") as f:
+                json.dump(self.vms, f)
+            os.replace(path + ".tmp", path)
+        return self._index[name]
+
+    def _partition(self, resolution, date, metric):
+        return os.path.join(
+            self.directory, str(resolution), date, metric.replace("/", "-")
+        )
+
+    def _write(self, path, columns):
+        """
+        Append columns to a partition.
+
+        Args:
+            path (str): The directory of the partition.
+            columns (dict): The arrays keyed by column name.
+        """
+        os.makedirs(path, exist_ok=True)
+        for name, values in columns.items():
+            with open(os.path.join(path, name), "ab") as f:
+                values.tofile(f)
+
+    def _read(self, path):
+        """
+        Read all columns of a partition.
+
+        Raw partitions are completed with min, max and count.
+
+        Args:
+            path (str): The directory of the partition.
+
+        Returns:
+            dict: The arrays keyed by column name.
+        """
+        columns = {}
+        for name, typecode in COLUMNS.items():
+            filename = os.path.join(path, name)
+            if not os.path.exists(filename):
+                continue
+            values = array(typecode)
+            with open(filename, "rb") as f:
+                values.frombytes(f.read())
+            columns[name] = values
+        if not columns:
+            return {name: array(typecode) for name, typecode in COLUMNS.items()}
+        # a crashed append may have left columns of different lengths
+        length = min(len(values) for values in columns.values())
+        for name in columns:
+            del columns[name][length:]
+        if "count" not in columns:
+            columns["min"] = columns["value"]
+            columns["max"] = columns["value"]
+            columns["count"] = array("I", [1]) * length
+        return columns
+
+    def append(self, samples):
+        """
+        Add raw samples.
+
+        Args:
+            samples (iterable): (time, vm, metric, value) tuples.
+        """
+        partitions = {}
+        for timestamp, vm, metric, value in samples:
+            key = (day(timestamp), metric)
+            if key not in partitions:
+                partitions[key] = {name: array(COLUMNS[name]) for name in RAW}
+            columns = partitions[key]
+            columns["time"].append(timestamp)
+            columns["vm"].append(self._vm(vm))
+            columns["value"].append(value)
+        for (date, metric), columns in partitions.items():
+            self._write(self._partition(0, date, metric), columns)
+
+    def _partitions(self, metric, start=None, end=None):
+        """
+        Find the partitions of a metric in a time range.
+
+        A day that exists in several resolutions is read from the finest.
+
+        Args:
+            metric (str): The metric.
+            start (float, optional): The first time. Defaults to None.
+            end (float, optional): The last time. Defaults to None.
+
+        Returns:
+            list: The directories of the partitions ordered by day.
+        """
+        first = start and day(start)
+        last = end and day(end)
+        found = {}
+        for resolution, _ in reversed(self.retention):
+            base = os.path.join(self.directory, str(resolution))
+            if not os.path.isdir(base):
+                continue
+            for date in os.listdir(base):
+                if first and date < first or last and date > last:
+                    continue
+                path = self._partition(resolution, date, metric)
+                if os.path.isdir(path):
+                    found[date] = path
+        return [found[date] for date in sorted(found)]
+
+    def query(self, metric, vm=None, start=None, end=None):
+        """
+        Get the history of a metric.
+
+        Args:
+            metric (str): The metric, e.g. "CPU/Load/User".
+            vm (str, optional): Only return this VM. Defaults to None.
+            start (float, optional): The first time as seconds since the epoch. Defaults to None.
+            end (float, optional): The last time. Defaults to None.
+
+        Returns:
+            dict: The (time, value) samples of each VM ordered by time. Values
+            of downsampled days are means.
+        """
+        index = self._index.get(vm) if vm is not None else None
+        if vm is not None and index is None:
+            return {}
+        result = {}
+        for path in self._partitions(metric, start, end):
+            columns = self._read(path)
+            for timestamp, number, value in zip(
+                columns["time"], columns["vm"], columns["value"]
+            ):
+                if index is not None and number != index:
+                    continue
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp > end:
+                    continue
+                result.setdefault(self.vms[number], []).append((timestamp, value))
+        for samples in result.values():
+            samples.sort()
+        return result
+
+    def summary(self, metric, start=None, end=None):
+        """
+        Summarize a metric per VM, e.g. for capacity planning.
+
+        Args:
+            metric (str): The metric, e.g. "RAM/Usage/Used".
+            start (float, optional): The first time as seconds since the epoch. Defaults to None.
+            end (float, optional): The last time. Defaults to None.
+
+        Returns:
+            dict: The mean, min, max and number of raw samples of each VM.
+        """
+        totals = {}
+        for path in self._partitions(metric, start, end):
+            columns = self._read(path)
+            for row in zip(
+                columns["time"],
+                columns["vm"],
+                columns["value"],
+                columns["min"],
+                columns["max"],
+                columns["count"],
+            ):
+                timestamp, number, value, low, high, count = row
+                if start is not None and timestamp < start:
+                    continue
+                if end is not None and timestamp > end:
+                    continue
+                total = totals.get(number)
+                if total is None:
+                    totals[number] = [value * count, low, high, count]
+                else:
+                    total[0] += value * count
+                    total[1] = min(total[1], low)
+                    total[2] = max(total[2], high)
+                    total[3] += count
+        return {
+            self.vms[number]: {
+                "mean": total[0] / total[3],
+                "min": total[1],
+                "max": total[2],
+                "count": total[3],
+            }
+            for number, total in totals.items()
+        }
+
+    def _downsample(self, path, resolution):
+        """
+        Aggregate the rows of a partition into buckets of resolution seconds.
+
+        Args:
+            path (str): The directory of the partition.
+            resolution (int): The length of a bucket in seconds.
+
+        Returns:
+            dict: The arrays of the aggregated partition.
+        """
+        columns = self._read(path)
+        buckets = {}
+        for row in zip(
+            columns["time"],
+            columns["vm"],
+            columns["value"],
+            columns["min"],
+            columns["max"],
+            columns["count"],
+        ):
+            timestamp, number, value, low, high, count = row
+            key = (timestamp // resolution * resolution, number)
+            bucket = buckets.get(key)
+            if bucket is None:
+                buckets[key] = [value * count, low, high, count]
+            else:
+                bucket[0] += value * count
+                bucket[1] = min(bucket[1], low)
+                bucket[2] = max(bucket[2], high)
+                bucket[3] += count
+        result = {name: array(typecode) for name, typecode in COLUMNS.items()}
+        for (timestamp, number), (total, low, high, count) in sorted(buckets.items()):
+            result["time"].append(timestamp)
+            result["vm"].append(number)
+            result["value"].append(total / count)
+            result["min"].append(low)
+            result["max"].append(high)
+            result["count"].append(count)
+        return result
+
+    def compact(self, now=None):
+        """
+        Apply the retention: downsample expired days into the next
+        resolution and delete them.
+
+        Args:
+            now (float, optional): The current time. Defaults to time.time().
+
+        Returns:
+            int: The number of partitions that were moved or deleted.
+        """
+        now = time.time() if now is None else now
+        changed = 0
+        for level, (resolution, keep) in enumerate(self.retention):
+            base = os.path.join(self.directory, str(resolution))
+            if not os.path.isdir(base):
+                continue
+            expired = day(now - keep)
+            for date in sorted(os.listdir(base)):
+                if date >= expired:
+                    continue
+                if level + 1 < len(self.retention):
+                    coarser = self.retention[level + 1][0]
+                    for metric in os.listdir(os.path.join(base, date)):
+                        path = os.path.join(base, date, metric)
+                        target = os.path.join(self.directory, str(coarser), date)
+                        self._write(
+                            os.path.join(target, metric),
+                            self._downsample(path, coarser),
+                        )
+                shutil.rmtree(os.path.join(base, date))
+                changed += 1
+        return changed
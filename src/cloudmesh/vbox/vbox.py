@@ -1,31 +1,434 @@
 from cloudmesh.abstract.ComputeNodeABC import ComputeNodeABC
 import subprocess
+import threading
 import json
-import re
+import os
+import signal
 import time
+import uuid
 import json
+from collections import deque
+from contextlib import nullcontext
+
+from cloudmesh.vbox.batch import Batch
+from cloudmesh.vbox.batch import aggregate as aggregate_results
+from cloudmesh.vbox.batch import expand
+from cloudmesh.vbox.cache import TTLCache
+from cloudmesh.vbox.catalog import CATALOG
+from cloudmesh.vbox.catalog import Catalog
+from cloudmesh.vbox.imagestore import ImageStore
+from cloudmesh.vbox.instrument import Registry
+from cloudmesh.vbox.logreader import LogReader
+from cloudmesh.vbox.metrics import METRICS
+from cloudmesh.vbox.metrics import Metrics
+from cloudmesh.vbox.parse import parse_info
+from cloudmesh.vbox.parse import parse_inventory
+from cloudmesh.vbox.parse import parse_list
+from cloudmesh.vbox.parse import parse_media
+from cloudmesh.vbox.parse import parse_metrics
+from cloudmesh.vbox.parse import parse_status
+from cloudmesh.vbox.pool import WarmPool
+from cloudmesh.vbox.record import VMRecord
+from cloudmesh.vbox.ssh import SshPool
+from cloudmesh.vbox.store import MetricStore
+from cloudmesh.vbox.wait import backoff
+from cloudmesh.vbox.wait import wait_for
+from cloudmesh.vbox.watcher import WatcherClient
+
+# VBoxManage subcommands that change a VM and invalidate its cached results
+MUTATING = {
+    "startvm",
+    "controlvm",
+    "modifyvm",
+    "unregistervm",
+    "clonevm",
+    "snapshot",
+    "storageattach",
+}
+
+# the snapshot of a golden VM that linked clones are created from
+SNAPSHOT = "cloudmesh-base"
+
+# the live snapshot of a booted VM that fast starts restore
+BOOTED = "cloudmesh-booted"
+
+# the characters of stderr kept by _stream for its CalledProcessError
+STDERR_TAIL = 65536
+
+# catalog formats that are imported as golden VM or attached as disk
+APPLIANCES = {"ova", "ovf"}
+DISKS = {"vdi", "vmdk", "vhd"}
+
+
+def drain(stream):
+    """
+    Read a stream on a thread and keep its end, e.g. the stderr of a
+    command whose stdout is consumed, which would block once it fills the
+    stderr pipe.
+
+    Args:
+        stream (file): The stream, read until EOF.
+
+    Returns:
+        tuple: The thread and a deque with the chunks of the last
+        STDERR_TAIL characters.
+    """
+    tail = deque()
+
+    def read():
+        kept = 0
+        for chunk in iter(lambda: stream.read(4096), ""):
+            tail.append(chunk)
+            kept += len(chunk)
+            while kept - len(tail[0]) >= STDERR_TAIL:
+                kept -= len(tail.popleft())
+
+    reader = threading.Thread(target=read, daemon=True)
+    reader.start()
+    return reader, tail
+
+
+def kill(process):
+    """
+    Kill a command started with start_new_session and the processes it
+    started, e.g. the shell of a wrapper around ssh that would keep its
+    pipes open.
+
+    Args:
+        process (subprocess.Popen): The command.
+    """
+    try:
+        os.killpg(process.pid, signal.SIGKILL)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        # no process groups on Windows, or the command already exited
+        process.kill()
 
 
 class Vbox(ComputeNodeABC):
-    def __init__(self):
+    def __init__(
+        self,
+        watcher=None,
+        cache_ttl=0,
+        cache_size=1024,
+        output="json",
+        username=None,
+        ssh_pool=None,
+        metrics_size=3600,
+        metrics_store=None,
+        instrument=None,
+        catalog=None,
+        image_store=None,
+        image_quota=None,
+    ):
         """
         Initialize the Vbox class.
+
+        Args:
+            watcher (str, optional): The socket of a running
+                cloudmesh.vbox.watcher. If given, status and the wait methods
+                query the watcher instead of VBoxManage, and the wait methods
+                block on its change events instead of polling. Defaults to None.
+            cache_ttl (float, optional): Seconds the results of info and status
+                are cached per VM. The cache of a VM is dropped whenever this
+                instance runs a command on it. Defaults to 0, no caching.
+            cache_size (int, optional): The maximum number of cached VMs. Defaults to 1024.
+            output (str, optional): The form of structured results. "json"
+                returns JSON strings, "dict" returns the dicts and lists
+                directly without a serialization round-trip, and "record"
+                returns VMRecord objects from list, inventory and info.
+                Defaults to "json".
+            username (str, optional): The username used by run and script. Defaults to None.
+            ssh_pool (bool or SshPool, optional): Reuse one multiplexed ssh
+                connection per VM for run, ssh and script. Pass an SshPool to
+                share connections between instances. Defaults to None.
+            metrics_size (int, optional): The number of samples kept per VM
+                and metric by collect_metrics. Defaults to 3600.
+            metrics_store (str or MetricStore, optional): Also append the
+                collected metrics to this store, or a store in this
+                directory, for their history. Defaults to None.
+            instrument (bool or Registry, optional): Record the latency, exit
+                status and output size of every VBoxManage and ssh call and
+                the time spent parsing in this Registry, or a new one if
+                True. Defaults to None.
+            catalog (str or Catalog, optional): The image catalog used by
+                images and image, or the path of its index. Defaults to
+                ~/.cloudmesh/vbox/images.jsonl.
+            image_store (str or ImageStore, optional): Keep the files of
+                store_image in this content-addressed store, or a store in
+                this directory that uses the catalog. Disks attached to VMs
+                are never evicted from it. Defaults to None.
+            image_quota (int, optional): The quota of the image store in
+                bytes. Defaults to None, the quota of a given ImageStore or
+                no limit.
         """
         super().__init__()
-
-    def _run(self, command):
+        if output not in ["json", "dict", "record"]:
+            raise ValueError(f"Unknown output: {output}")
+        self.output = output
+        self.username = username
+        if ssh_pool is True:
+            ssh_pool = SshPool()
+        self.ssh_pool = ssh_pool or None
+        self._watcher = WatcherClient(watcher) if watcher else None
+        self.cache = TTLCache(cache_ttl, cache_size) if cache_ttl else None
+        self._local = threading.local()
+        self._logs = {}
+        self._snapshots = set()
+        self._snapshot_locks = {}
+        self._snapshot_lock = threading.Lock()
+        self.pools = {}
+        self.metrics = Metrics(metrics_size)
+        if isinstance(metrics_store, str):
+            metrics_store = MetricStore(metrics_store)
+        self.metrics_store = metrics_store
+        if instrument is True:
+            instrument = Registry()
+        self.instrument = instrument or None
+        if not isinstance(catalog, Catalog):
+            catalog = Catalog(catalog or CATALOG)
+        self.catalog = catalog
+        if isinstance(image_store, str):
+            image_store = ImageStore(image_store, catalog=catalog)
+        if image_store is not None:
+            if image_store.in_use is None:
+                image_store.in_use = self._disks_in_use
+            if image_quota is not None:
+                image_store.quota = image_quota
+        self.image_store = image_store
+        self._imported = set()
+
+    def _run(self, command, timeout=None):
         """
         Run a shell command.
 
         Args:
             command (list): The command to run as a list of strings.
+            timeout (float, optional): Seconds after which the command is
+                killed. Defaults to None.
+
+        Returns:
+            str: The output of the command.
+
+        Raises:
+            subprocess.TimeoutExpired: If the command did not finish in time.
+            subprocess.CalledProcessError: If the command failed while called
+                through _checked.
+        """
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(
+                command, capture_output=True, text=True, timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            self._record("vboxmanage", command[1], start, "timeout")
+            raise
+        self._record(
+            "vboxmanage", command[1], start, result.returncode, len(result.stdout)
+        )
+        if self.cache and command[1] in MUTATING:
+            for argument in command[2:]:
+                self.cache.invalidate(argument)
+        return self._check(result)
+
+    def _stream(self, command, timeout=None, size=None, kind="ssh"):
+        """
+        Run a shell command and yield its output as it arrives.
+
+        Only one line or chunk is held in memory at a time, so this can be
+        used for outputs that do not fit into memory.
+
+        Args:
+            command (list): The command to run as a list of strings.
+            timeout (float, optional): Seconds after which the command is
+                killed. Defaults to None.
+            size (int, optional): Yield chunks of at most size characters
+                instead of lines. Defaults to None.
+            kind (str, optional): The kind the command is recorded as, "ssh"
+                or "log" for a local tail of a VM log. Defaults to "ssh".
+
+        Yields:
+            str: A line including its newline, or a chunk.
+
+        Raises:
+            subprocess.TimeoutExpired: If the command did not finish in time.
+            subprocess.CalledProcessError: If the command failed while called
+                through _checked.
+        """
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            command,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            start_new_session=True,
+        )
+        reader, tail = drain(process.stderr)
+        timer = None
+        if timeout is not None:
+            timer = threading.Timer(timeout, kill, [process])
+            timer.start()
+        total = 0
+        try:
+            if size is None:
+                chunks = process.stdout
+            else:
+                chunks = iter(lambda: process.stdout.read(size), "")
+            for chunk in chunks:
+                total += len(chunk)
+                yield chunk
+            process.wait()
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if process.poll() is None:
+                # the consumer stopped early
+                kill(process)
+                process.wait()
+            process.stdout.close()
+            reader.join()
+            process.stderr.close()
+        stderr = "".join(tail)[-STDERR_TAIL:]
+        if timer is not None and timer.finished.is_set() and process.returncode < 0:
+            self._record(kind, "stream", start, "timeout", total)
+            raise subprocess.TimeoutExpired(command, timeout)
+        self._record(kind, "stream", start, process.returncode, total)
+        self._check(
+            subprocess.CompletedProcess(command, process.returncode, None, stderr)
+        )
+
+    def _record(self, kind, operation, start, status, size=0):
+        """
+        Record a finished command in the instrumentation registry.
+
+        Args:
+            kind (str): "vboxmanage", "ssh" or "log".
+            operation (str): The subcommand or method, e.g. "showvminfo".
+            start (float): The time.perf_counter() when the command started.
+            status: The exit status or "timeout".
+            size (int, optional): The size of the output. Defaults to 0.
+        """
+        if self.instrument is not None:
+            self.instrument.record(
+                kind, operation, time.perf_counter() - start, status, size
+            )
+
+    def _timer(self, operation):
+        """
+        Time the parsing of an output if instrumentation is enabled.
+
+        Args:
+            operation (str): The method, e.g. "info".
+
+        Returns:
+            A context manager.
+        """
+        if self.instrument is None:
+            return nullcontext()
+        return self.instrument.timer("parse", operation)
+
+    def _check(self, result):
+        """
+        Return the output of a finished command.
+
+        Args:
+            result (subprocess.CompletedProcess): The finished command.
 
         Returns:
             str: The output of the command.
+
+        Raises:
+            subprocess.CalledProcessError: If the command failed while called
+                through _checked.
         """
-        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0 and getattr(self._local, "check", False):
+            raise subprocess.CalledProcessError(
+                result.returncode, result.args, result.stdout, result.stderr
+            )
         return result.stdout
 
+    def _checked(self, function):
+        """
+        Wrap a method so that failed commands raise instead of returning "".
+
+        Args:
+            function (callable): The method, called as function(name, timeout=timeout).
+
+        Returns:
+            callable: The wrapped method.
+        """
+
+        def call(name, timeout=None):
+            # restored afterwards, so checked calls can be nested
+            previous = getattr(self._local, "check", False)
+            self._local.check = True
+            try:
+                return function(name, timeout=timeout)
+            finally:
+                self._local.check = previous
+
+        return call
+
+    def _result(self, data, record=None):
+        """
+        Return a structured result in the configured output form.
+
+        Args:
+            data (dict or list): The result.
+            record (callable, optional): Converts the result, or each entry
+                of a list, to a record if output is "record". Defaults to None.
+
+        Returns:
+            The result as JSON string if output is "json", converted by record
+            if output is "record", otherwise unchanged.
+        """
+        if self.output == "json":
+            return json.dumps(data)
+        if self.output == "record" and record is not None:
+            if isinstance(data, list):
+                return [record(entry) for entry in data]
+            return record(data)
+        return data
+
+    def _many(
+        self, function, names, parallelism=10, per_host=None, timeout=None, host=None
+    ):
+        """
+        Apply a lifecycle method to many VMs concurrently.
+
+        Args:
+            function (callable): The method to apply, e.g. self.start.
+            names (str or list): A list of names or a parameter pattern such as "vm[001-200]".
+            parallelism (int, optional): The size of the thread pool. Defaults to 10.
+            per_host (int, optional): The maximum concurrent calls per host. Defaults to None.
+            timeout (float, optional): The timeout per VM in seconds. Defaults to None.
+            host (dict or callable, optional): Maps a VM name to the host
+                whose per_host limit applies, e.g. the storage or hypervisor
+                it shares with other VMs. Defaults to None, all VMs on the
+                local host, where per_host caps the concurrent VBoxManage
+                calls like parallelism.
+
+        Returns:
+            str or list: One entry per VM containing name, status, result,
+            error and time, as JSON string unless output is "dict".
+        """
+        # failed commands are reported per VM instead of returning ""
+        batch = Batch(parallelism=parallelism, per_host=per_host, host=host)
+        return self._result(batch.run(self._checked(function), names, timeout=timeout))
+
+    def close(self):
+        """
+        Release the watcher connection, the pooled ssh connections, the
+        log readers and the warm pools.
+        """
+        if self._watcher is not None:
+            self._watcher.close()
+        if self.ssh_pool is not None:
+            self.ssh_pool.close_all()
+        for reader in self._logs.values():
+            reader.close()
+        for pool in self.pools.values():
+            pool.stop()
+
     def list(self, **kwargs):
         """
         List all VMs.
@@ -34,28 +437,47 @@ class Vbox(ComputeNodeABC):
             kwargs (dict): Additional keyword arguments.
 
         Returns:
-            str: A JSON string representing the list of VMs.
+            str or list: The list of VMs, as JSON string unless output is
+            "dict", or as list of VMRecord if output is "record".
         """
         output = self._run(["VBoxManage", "list", "vms"])
-        lines = output.splitlines()
-        vms = []
-        for line in lines:
-            match = re.match(r'^"(.+)" {(.+)}$', line)
-            if match:
-                vms.append(
-                    {
-                        "name": match.group(1),
-                        "UUID": match.group(2),
-                    }
-                )
-        return json.dumps(vms)
+        with self._timer("list"):
+            vms = parse_list(output)
+        return self._result(vms, VMRecord.from_list)
+
+    def inventory(self, **kwargs):
+        """
+        List all VMs with their state, memory, CPUs and NICs.
+
+        All VMs are queried with a single VBoxManage list -l vms call instead
+        of one showvminfo call per VM.
+
+        Args:
+            kwargs (dict): Additional keyword arguments.
+
+        Returns:
+            str or list: The list of VMs, as JSON string unless output is
+            "dict", or as list of VMRecord if output is "record".
+        """
+        output = self._run(["VBoxManage", "list", "--long", "vms"])
+        with self._timer("inventory"):
+            vms = parse_inventory(output)
+        return self._result(vms, VMRecord.from_list)
 
-    def start(self, name=None):
+    def start(self, name=None, timeout=None, reset=False):
         """
         Start a VM.
 
+        A saved VM, e.g. a new clone of create(fast=True), resumes instead
+        of booting.
+
         Args:
             name (str, optional): The name of the VM. Defaults to None.
+            timeout (float, optional): Seconds after which the command is killed. Defaults to None.
+            reset (bool, optional): Restore the booted snapshot of the VM, see
+                boot_snapshot, and resume it. This discards all changes to
+                the disks and memory of the VM since the snapshot. VMs
+                without the snapshot start as they are. Defaults to False.
 
         Returns:
             str: The output of the VBoxManage startvm command.
@@ -63,14 +485,19 @@ class Vbox(ComputeNodeABC):
         if name is None:
             raise ValueError("VM name must be provided")
 
-        return self._run(["VBoxManage", "startvm", name])
+        if reset:
+            self._run(
+                ["VBoxManage", "snapshot", name, "restore", BOOTED], timeout=timeout
+            )
+        return self._run(["VBoxManage", "startvm", name], timeout=timeout)
 
-    def stop(self, name=None):
+    def stop(self, name=None, timeout=None):
         """
         Stop a VM.
 
         Args:
             name (str, optional): The name of the VM. Defaults to None.
+            timeout (float, optional): Seconds after which the command is killed. Defaults to None.
 
         Returns:
             str: The output of the VBoxManage controlvm command.
@@ -78,36 +505,43 @@ class Vbox(ComputeNodeABC):
         if name is None:
             raise ValueError("VM name must be provided")
 
-        return self._run(["VBoxManage", "controlvm", name, "poweroff"])
+        return self._run(["VBoxManage", "controlvm", name, "poweroff"], timeout=timeout)
 
-    def info(self, name=None):
+    def info(self, name=None, typed=False, keys=None):
         """
         Get information about a VM.
 
         Args:
             name (str, optional): The name of the VM. Defaults to None.
+            typed (bool, optional): Convert numbers and on/off values and group
+                NICs, storage controllers and disks. Defaults to False.
+            keys (list, optional): Only return these keys. Defaults to None.
 
         Returns:
-            str: A JSON string representing the information about the VM.
+            str or dict: The information about the VM, as JSON string unless
+            output is "dict", or as VMRecord if output is "record".
         """
         if name is None:
             raise ValueError("VM name must be provided")
 
-        output = self._run(["VBoxManage", "showvminfo", name, "--machinereadable"])
-        lines = output.splitlines()
-        info = {}
-        for line in lines:
-            match = re.match(r'^"?(.+?)"?="?(.*?)"?$', line)
-            if match:
-                info[match.group(1)] = match.group(2)
-        return json.dumps(info)
+        output = self.cache and self.cache.get(name, "info")
+        if output is None:
+            output = self._run(["VBoxManage", "showvminfo", name, "--machinereadable"])
+            if self.cache:
+                self.cache.put(name, "info", output)
+        if self.output == "record":
+            typed = True
+        with self._timer("info"):
+            info = parse_info(output, typed=typed, keys=keys)
+        return self._result(info, VMRecord.from_info)
 
-    def suspend(self, name=None):
+    def suspend(self, name=None, timeout=None):
         """
         Suspend a VM.
 
         Args:
             name (str, optional): The name of the VM. Defaults to None.
+            timeout (float, optional): Seconds after which the command is killed. Defaults to None.
 
         Returns:
             str: The output of the VBoxManage controlvm command.
@@ -115,14 +549,17 @@ class Vbox(ComputeNodeABC):
         if name is None:
             raise ValueError("VM name must be provided")
 
-        return self._run(["VBoxManage", "controlvm", name, "savestate"])
+        return self._run(
+            ["VBoxManage", "controlvm", name, "savestate"], timeout=timeout
+        )
 
-    def resume(self, name=None):
+    def resume(self, name=None, timeout=None):
         """
         Resume a VM.
 
         Args:
             name (str, optional): The name of the VM. Defaults to None.
+            timeout (float, optional): Seconds after which the command is killed. Defaults to None.
 
         Returns:
             str: The output of the VBoxManage startvm command.
@@ -130,14 +567,15 @@ class Vbox(ComputeNodeABC):
         if name is None:
             raise ValueError("VM name must be provided")
 
-        return self._run(["VBoxManage", "startvm", name])
+        return self._run(["VBoxManage", "startvm", name], timeout=timeout)
 
-    def reboot(self, name=None):
+    def reboot(self, name=None, timeout=None):
         """
         Reboot a VM.
 
         Args:
             name (str, optional): The name of the VM. Defaults to None.
+            timeout (float, optional): Seconds after which the command is killed. Defaults to None.
 
         Returns:
             str: The output of the VBoxManage controlvm command.
@@ -145,28 +583,326 @@ class Vbox(ComputeNodeABC):
         if name is None:
             raise ValueError("VM name must be provided")
 
-        return self._run(["VBoxManage", "controlvm", name, "reset"])
+        return self._run(["VBoxManage", "controlvm", name, "reset"], timeout=timeout)
+
+    def snapshots(self, name=None):
+        """
+        List the snapshots of a VM.
+
+        Args:
+            name (str, optional): The name of the VM. Defaults to None.
+
+        Returns:
+            list: The names of the snapshots.
+        """
+        if name is None:
+            raise ValueError("VM name must be provided")
+
+        try:
+            output = self._run(
+                ["VBoxManage", "snapshot", name, "list", "--machinereadable"]
+            )
+        except subprocess.CalledProcessError:
+            # raised inside _many if the VM has no snapshots yet
+            output = ""
+        return [
+            value
+            for key, value in parse_info(output).items()
+            if key.startswith("SnapshotName")
+        ]
+
+    def _ensure_snapshot(self, image, snapshot, take):
+        """
+        Make sure a golden VM has a snapshot.
+
+        The snapshot is looked up once per image and instance, and only one
+        thread takes it if many clones of the same image are created at once.
+
+        Args:
+            image (str): The name of the golden VM.
+            snapshot (str): The name of the snapshot.
+            take (callable): Takes the snapshot if it does not exist.
+
+        Returns:
+            str: The name of the snapshot.
+        """
+        if image is None:
+            raise ValueError("Image must be provided")
+
+        with self._snapshot_lock:
+            lock = self._snapshot_locks.setdefault(image, threading.Lock())
+        with lock:
+            if (image, snapshot) not in self._snapshots:
+                if snapshot not in self.snapshots(image):
+                    take()
+                self._snapshots.add((image, snapshot))
+        return snapshot
+
+    def base_snapshot(self, image=None, snapshot=SNAPSHOT):
+        """
+        Get the base snapshot of a golden VM, taking it if it does not exist.
+
+        Args:
+            image (str, optional): The name of the golden VM. Defaults to None.
+            snapshot (str, optional): The name of the snapshot. Defaults to
+                "cloudmesh-base".
+
+        Returns:
+            str: The name of the snapshot.
+        """
+        return self._ensure_snapshot(
+            image,
+            snapshot,
+            lambda: self._run(["VBoxManage", "snapshot", image, "take", snapshot]),
+        )
+
+    def boot_snapshot(self, image=None, snapshot=BOOTED, settle=0, timeout=300):
+        """
+        Get the live snapshot of a booted golden VM, taking it if it does not exist.
+
+        To take it, the image is booted once and its memory is saved with
+        the snapshot. Clones of the snapshot and VMs restoring it resume
+        from that point instead of booting.
+
+        Args:
+            image (str, optional): The name of the golden VM. Defaults to None.
+            snapshot (str, optional): The name of the snapshot. Defaults to
+                "cloudmesh-booted".
+            settle (float, optional): Seconds to wait after the VM is running,
+                e.g. until its services started. Defaults to 0.
+            timeout (float, optional): Seconds to wait for the boot. Defaults to 300.
+
+        Returns:
+            str: The name of the snapshot.
+
+        Raises:
+            subprocess.TimeoutExpired: If the image did not boot in time.
+        """
+
+        def take():
+            # a running image is used as it is and kept running
+            previous = self.status(image, cached=False)
+            if previous != "running":
+                self.start(image)
+                if self._wait(image, "running", timeout=timeout)["status"] != "reached":
+                    self.stop(image)
+                    raise subprocess.TimeoutExpired(
+                        ["VBoxManage", "startvm", image], timeout
+                    )
+                time.sleep(settle)
+            self._run(["VBoxManage", "snapshot", image, "take", snapshot, "--live"])
+            if previous == "saved":
+                self.suspend(image)
+            elif previous != "running":
+                self.stop(image)
+
+        return self._ensure_snapshot(image, snapshot, take)
+
+    def _import(self, image, timeout=None):
+        """
+        Import the appliance of a catalog image as golden VM of the same name.
+
+        The appliance is imported once, later calls use the VM.
+
+        Args:
+            image (str): The name of the image.
+            timeout (float, optional): The timeout of the import. Defaults to None.
+        """
+        entry = self.catalog.get(image)
+        if entry is None or entry["format"] not in APPLIANCES:
+            return
+        with self._snapshot_lock:
+            lock = self._snapshot_locks.setdefault(image, threading.Lock())
+        with lock:
+            if image not in self._imported:
+                if image not in self._states():
+                    command = ["VBoxManage", "import", entry["path"]]
+                    command += ["--vsys", "0", "--vmname", image]
+                    self._run(command, timeout=timeout)
+                self._imported.add(image)
+
+    def _attach(self, name, entry, timeout=None):
+        """
+        Create a VM that boots from the disk of a catalog image.
+
+        The disk is attached as multiattach medium, so VirtualBox gives the
+        VM its own differencing disk and the disk is shared unchanged.
+
+        Args:
+            name (str): The name of the VM.
+            entry (dict): The catalog entry of the disk.
+            timeout (float, optional): The timeout of each command. Defaults to None.
+
+        Returns:
+            str: The output of the VBoxManage createvm command.
+        """
+        output = self._run(
+            ["VBoxManage", "createvm", "--name", name, "--register"]
+            + ["--ostype", entry.get("os") or "Other_64"],
+            timeout=timeout,
+        )
+        self._run(
+            ["VBoxManage", "storagectl", name, "--name", "SATA", "--add", "sata"],
+            timeout=timeout,
+        )
+        self._run(
+            ["VBoxManage", "storageattach", name, "--storagectl", "SATA"]
+            + ["--port", "0", "--device", "0", "--type", "hdd"]
+            + ["--medium", entry["path"], "--mtype", "multiattach"],
+            timeout=timeout,
+        )
+        return output
 
     def create(self, name=None, image=None, size=None, timeout=360, **kwargs):
         """
-        Create a new VM.
+        Create a new VM as linked clone of a golden VM.
+
+        The clone shares the disks of the base snapshot of the image, see
+        base_snapshot, and only stores its own changes, so it is created in
+        seconds regardless of the size of the disks. An appliance in the
+        catalog is imported as golden VM first. A disk in the catalog, e.g.
+        from store_image, is attached to a new VM as a shared base disk.
+
+        The new VM is never running. It is powered off, or saved if it is a
+        fast clone or was taken from the warm pool, and start boots or
+        resumes it.
 
         Args:
             name (str, optional): The name of the VM. Defaults to None.
-            image (str, optional): The image to use for the VM. Defaults to None.
+            image (str, optional): The name of the golden VM or catalog image
+                to clone. Defaults to None.
             size (str, optional): The size of the VM. Defaults to None.
             timeout (int, optional): The timeout for creating the VM. Defaults to 360.
-            kwargs (dict): Additional keyword arguments.
+            kwargs (dict): Additional keyword arguments. memory in MB and
+                cpus change the clone, full=True creates a full clone,
+                fast=True clones the booted snapshot so start resumes the
+                clone instead of booting it and start(reset=True) can return
+                it to that point, and pool=False does not take a VM from the
+                warm pool.
+
+        Returns:
+            str: The output of the VBoxManage clonevm or createvm command.
+        """
+        if name is None or image is None:
+            raise ValueError("Both VM name and image must be provided")
+
+        self.catalog.touch(image)
+        pool = self.pools.get(image)
+        custom = any(kwargs.get(key) for key in ["memory", "cpus", "full"])
+        if pool is not None and kwargs.get("pool", True) and not custom:
+            if pool.acquire(name) is not None:
+                return f'Machine has been taken from the warm pool as "{name}"'
+
+        fast = kwargs.get("fast")
+        if fast and (kwargs.get("memory") or kwargs.get("cpus")):
+            raise ValueError("The memory and cpus of a fast clone cannot change")
+
+        entry = self.catalog.get(image)
+        if entry is not None and entry["format"] in DISKS:
+            if fast or kwargs.get("full"):
+                raise ValueError("A disk image can only be attached as shared disk")
+            output = self._attach(name, entry, timeout=timeout)
+            options = ["--nic1", "nat"]
+        else:
+            self._import(image, timeout=timeout)
+            command = ["VBoxManage", "clonevm", image, "--name", name, "--register"]
+            if fast:
+                snapshot = self.boot_snapshot(image)
+                command += ["--snapshot", snapshot, "--options", "link"]
+            elif not kwargs.get("full"):
+                snapshot = self.base_snapshot(image)
+                command += ["--snapshot", snapshot, "--options", "link"]
+            output = self._run(command, timeout=timeout)
+            if fast:
+                # the clone starts in the saved state, keep it for later restores
+                self._run(
+                    ["VBoxManage", "snapshot", name, "take", BOOTED], timeout=timeout
+                )
+            options = []
+        for option in ["memory", "cpus"]:
+            if kwargs.get(option) is not None:
+                options += [f"--{option}", str(kwargs[option])]
+        if options:
+            self._run(["VBoxManage", "modifyvm", name] + options, timeout=timeout)
+        return output
+
+    def warm_pool(self, image=None, size=2, state="saved", **kwargs):
         """
-        pass
+        Keep VMs of an image created and booted ahead of time for create.
+
+        Args:
+            image (str, optional): The name of the golden VM. Defaults to None.
+            size (int, optional): The number of ready VMs. Defaults to 2.
+            state (str, optional): "saved" or "running". Defaults to "saved".
+            kwargs (dict): min_size, idle, max_age, interval and timeout of
+                the WarmPool.
+
+        Returns:
+            WarmPool: The started pool.
+        """
+        if image is None:
+            raise ValueError("Image must be provided")
+
+        if image in self.pools:
+            self.pools.pop(image).stop()
+        pool = WarmPool(self, image, size=size, state=state, **kwargs)
+        pool.start()
+        self.pools[image] = pool
+        return pool
+
+    def create_many(
+        self,
+        names=None,
+        image=None,
+        parallelism=10,
+        per_host=None,
+        timeout=360,
+        host=None,
+        **kwargs,
+    ):
+        """
+        Create many linked clones of a golden VM concurrently, see _many.
+
+        Args:
+            names (str or list): A list of names or a pattern such as "vm[001-050]".
+            image (str, optional): The name of the golden VM to clone. Defaults to None.
+            parallelism (int, optional): The size of the thread pool. Defaults to 10.
+            per_host (int, optional): The maximum concurrent calls per host. Defaults to None.
+            timeout (float, optional): The timeout per VM in seconds. Defaults to 360.
+            host (dict or callable, optional): Maps a VM name to its host, see _many. Defaults to None.
+            kwargs (dict): Additional keyword arguments passed to create.
 
-    def rename(self, name=None, destination=None):
+        Returns:
+            str or list: The result of each VM, see _many.
+        """
+        if image is None:
+            raise ValueError("Image must be provided")
+
+        # import the appliance and take the snapshot once before the clones start
+        self._import(image, timeout=timeout)
+        entry = self.catalog.get(image)
+        if entry is None or entry["format"] not in DISKS:
+            if kwargs.get("fast"):
+                self.boot_snapshot(image)
+            elif not kwargs.get("full"):
+                self.base_snapshot(image)
+
+        def create(name, timeout=None):
+            return self.create(name, image, timeout=timeout, **kwargs)
+
+        return self._many(create, names, parallelism, per_host, timeout, host)
+
+    def rename(self, name=None, destination=None, timeout=None):
         """
         Rename a VM.
 
+        The VM must be powered off or saved, a running VM holds the session
+        lock that modifyvm needs.
+
         Args:
             name (str, optional): The current name of the VM. Defaults to None.
             destination (str, optional): The new name for the VM. Defaults to None.
+            timeout (float, optional): Seconds after which the command is killed. Defaults to None.
 
         Returns:
             str: The output of the VBoxManage modifyvm command.
@@ -174,14 +910,17 @@ class Vbox(ComputeNodeABC):
         if name is None or destination is None:
             raise ValueError("Both current and new VM names must be provided")
 
-        return self._run(["VBoxManage", "modifyvm", name, "--name", destination])
+        return self._run(
+            ["VBoxManage", "modifyvm", name, "--name", destination], timeout=timeout
+        )
 
-    def destroy(self, name=None):
+    def destroy(self, name=None, timeout=None):
         """
         Destroy a VM.
 
         Args:
             name (str, optional): The name of the VM. Defaults to None.
+            timeout (float, optional): Seconds after which the command is killed. Defaults to None.
 
         Returns:
             str: The output of the VBoxManage unregistervm command.
@@ -189,7 +928,117 @@ class Vbox(ComputeNodeABC):
         if name is None:
             raise ValueError("VM name must be provided")
 
-        return self._run(["VBoxManage", "unregistervm", name, "--delete"])
+        return self._run(
+            ["VBoxManage", "unregistervm", name, "--delete"], timeout=timeout
+        )
+
+    def start_many(
+        self, names=None, parallelism=10, per_host=None, timeout=None, host=None
+    ):
+        """
+        Start many VMs concurrently, see _many.
+
+        Args:
+            names (str or list): A list of names or a pattern such as "vm[001-200]".
+            parallelism (int, optional): The size of the thread pool. Defaults to 10.
+            per_host (int, optional): The maximum concurrent calls per host. Defaults to None.
+            timeout (float, optional): The timeout per VM in seconds. Defaults to None.
+            host (dict or callable, optional): Maps a VM name to its host, see _many. Defaults to None.
+
+        Returns:
+            str or list: The result of each VM, see _many.
+        """
+        return self._many(self.start, names, parallelism, per_host, timeout, host)
+
+    def stop_many(
+        self, names=None, parallelism=10, per_host=None, timeout=None, host=None
+    ):
+        """
+        Stop many VMs concurrently, see _many.
+
+        Args:
+            names (str or list): A list of names or a pattern such as "vm[001-200]".
+            parallelism (int, optional): The size of the thread pool. Defaults to 10.
+            per_host (int, optional): The maximum concurrent calls per host. Defaults to None.
+            timeout (float, optional): The timeout per VM in seconds. Defaults to None.
+            host (dict or callable, optional): Maps a VM name to its host, see _many. Defaults to None.
+
+        Returns:
+            str or list: The result of each VM, see _many.
+        """
+        return self._many(self.stop, names, parallelism, per_host, timeout, host)
+
+    def suspend_many(
+        self, names=None, parallelism=10, per_host=None, timeout=None, host=None
+    ):
+        """
+        Suspend many VMs concurrently, see _many.
+
+        Args:
+            names (str or list): A list of names or a pattern such as "vm[001-200]".
+            parallelism (int, optional): The size of the thread pool. Defaults to 10.
+            per_host (int, optional): The maximum concurrent calls per host. Defaults to None.
+            timeout (float, optional): The timeout per VM in seconds. Defaults to None.
+            host (dict or callable, optional): Maps a VM name to its host, see _many. Defaults to None.
+
+        Returns:
+            str or list: The result of each VM, see _many.
+        """
+        return self._many(self.suspend, names, parallelism, per_host, timeout, host)
+
+    def resume_many(
+        self, names=None, parallelism=10, per_host=None, timeout=None, host=None
+    ):
+        """
+        Resume many VMs concurrently, see _many.
+
+        Args:
+            names (str or list): A list of names or a pattern such as "vm[001-200]".
+            parallelism (int, optional): The size of the thread pool. Defaults to 10.
+            per_host (int, optional): The maximum concurrent calls per host. Defaults to None.
+            timeout (float, optional): The timeout per VM in seconds. Defaults to None.
+            host (dict or callable, optional): Maps a VM name to its host, see _many. Defaults to None.
+
+        Returns:
+            str or list: The result of each VM, see _many.
+        """
+        return self._many(self.resume, names, parallelism, per_host, timeout, host)
+
+    def reboot_many(
+        self, names=None, parallelism=10, per_host=None, timeout=None, host=None
+    ):
+        """
+        Reboot many VMs concurrently, see _many.
+
+        Args:
+            names (str or list): A list of names or a pattern such as "vm[001-200]".
+            parallelism (int, optional): The size of the thread pool. Defaults to 10.
+            per_host (int, optional): The maximum concurrent calls per host. Defaults to None.
+            timeout (float, optional): The timeout per VM in seconds. Defaults to None.
+            host (dict or callable, optional): Maps a VM name to its host, see _many. Defaults to None.
+
+        Returns:
+            str or list: The result of each VM, see _many.
+        """
+        return self._many(self.reboot, names, parallelism, per_host, timeout, host)
+
+    def destroy_many(
+        self, names=None, parallelism=10, per_host=None, timeout=None, host=None
+    ):
+        """
+        Destroy many VMs concurrently, see _many.
+
+        Args:
+            names (str or list): A list of names or a pattern such as "vm[001-200]".
+            parallelism (int, optional): The size of the thread pool. Defaults to 10.
+            per_host (int, optional): The maximum concurrent calls per host. Defaults to None.
+            timeout (float, optional): The timeout per VM in seconds. Defaults to None.
+            host (dict or callable, optional): Maps a VM name to its host, see _many. Defaults to None.
+
+        Returns:
+            str or list: The result of each VM, see _many.
+        """
+        return self._many(self.destroy, names, parallelism, per_host, timeout, host)
 
     def get_server_metadata(self, name):
         """
@@ -220,6 +1069,24 @@ class Vbox(ComputeNodeABC):
         """
         pass
 
+    def _ssh_command(self, destination, command=None):
+        """
+        Build an ssh command, using the pooled connection if enabled.
+
+        Args:
+            destination (str): The destination, e.g. user@host.
+            command (str, optional): The remote command. Defaults to None.
+
+        Returns:
+            list: The ssh command as a list of strings.
+        """
+        if self.ssh_pool is not None:
+            return self.ssh_pool.command(destination, command)
+        ssh_command = ["ssh", destination]
+        if command:
+            ssh_command.append(command)
+        return ssh_command
+
     def ssh(self, vm=None, username=None, command=None):
         """
         SSH into a VM.
@@ -235,20 +1102,41 @@ class Vbox(ComputeNodeABC):
         if vm is None or username is None:
             raise ValueError("Both VM IP address and username must be provided")
 
-        ssh_command = ["ssh", f"{username}@{vm}"]
-        if command:
-            ssh_command.append(command)
-
+        ssh_command = self._ssh_command(f"{username}@{vm}", command)
+        start = time.perf_counter()
         result = subprocess.run(ssh_command, capture_output=True, text=True)
+        self._record("ssh", "ssh", start, result.returncode, len(result.stdout))
         return result.stdout
 
-    def run(self, vm=None, command=None):
+    def ssh_stream(self, vm=None, username=None, command=None, size=None):
+        """
+        Run a command over SSH and yield its output as it arrives.
+
+        Args:
+            vm (str, optional): The IP address of the VM to SSH into. Defaults to None.
+            username (str, optional): The username to use for SSH. Defaults to None.
+            command (str, optional): The command to run. Defaults to None.
+            size (int, optional): Yield chunks of at most size characters
+                instead of lines. Defaults to None.
+
+        Yields:
+            str: A line or chunk of the output.
+        """
+        if vm is None or username is None:
+            raise ValueError("Both VM IP address and username must be provided")
+
+        yield from self._stream(
+            self._ssh_command(f"{username}@{vm}", command), size=size
+        )
+
+    def run(self, vm=None, command=None, timeout=None):
         """
         Run a command on a VM.
 
         Args:
             vm (str, optional): The VM to run the command on. Defaults to None.
             command (str, optional): The command to run. Defaults to None.
+            timeout (float, optional): Seconds after which the command is killed. Defaults to None.
 
         Returns:
             str: The output of the command.
@@ -256,9 +1144,84 @@ class Vbox(ComputeNodeABC):
         if vm is None or command is None:
             raise ValueError("Both VM and command must be provided")
 
-        ssh_command = ["ssh", f"{self.username}@{vm}", command]
-        result = subprocess.run(ssh_command, capture_output=True, text=True)
-        return result.stdout
+        ssh_command = self._ssh_command(f"{self.username}@{vm}", command)
+        start = time.perf_counter()
+        try:
+            result = subprocess.run(
+                ssh_command, capture_output=True, text=True, timeout=timeout
+            )
+        except subprocess.TimeoutExpired:
+            self._record("ssh", "run", start, "timeout")
+            raise
+        self._record("ssh", "run", start, result.returncode, len(result.stdout))
+        return self._check(result)
+
+    def run_stream(self, vm=None, command=None, timeout=None, size=None):
+        """
+        Run a command on a VM and yield its output as it arrives.
+
+        Args:
+            vm (str, optional): The VM to run the command on. Defaults to None.
+            command (str, optional): The command to run. Defaults to None.
+            timeout (float, optional): Seconds after which the command is killed. Defaults to None.
+            size (int, optional): Yield chunks of at most size characters
+                instead of lines. Defaults to None.
+
+        Yields:
+            str: A line or chunk of the output.
+        """
+        if vm is None or command is None:
+            raise ValueError("Both VM and command must be provided")
+
+        yield from self._stream(
+            self._ssh_command(f"{self.username}@{vm}", command),
+            timeout=timeout,
+            size=size,
+        )
+
+    def run_many(
+        self,
+        vms=None,
+        command=None,
+        parallelism=10,
+        per_host=None,
+        timeout=None,
+        aggregate=False,
+        host=None,
+    ):
+        """
+        Run the same command on many VMs concurrently.
+
+        The connections are taken from the ssh pool if it is enabled.
+
+        Args:
+            vms (str or list): A list of names or a pattern such as "vm[001-200]".
+            command (str, optional): The command to run. Defaults to None.
+            parallelism (int, optional): The number of concurrent commands. Defaults to 10.
+            per_host (int, optional): The maximum concurrent commands per host. Defaults to None.
+            timeout (float, optional): The timeout per VM in seconds. Defaults to None.
+            aggregate (bool, optional): Wait for all VMs and yield one entry per
+                distinct output with the names of the VMs instead. Defaults to False.
+            host (dict or callable, optional): Maps a VM name to the host
+                whose per_host limit applies, e.g. the hypervisor that runs
+                it. Defaults to None, all VMs on the local host, where
+                per_host caps the concurrent commands like parallelism.
+
+        Yields:
+            dict: The name, status ("ok", "error" or "timeout"), result, error
+            and time of each VM as soon as it finished.
+        """
+        if vms is None or command is None:
+            raise ValueError("Both VMs and command must be provided")
+
+        def call(vm, timeout=None):
+            return self.run(vm, command, timeout=timeout)
+
+        batch = Batch(parallelism=parallelism, per_host=per_host, host=host)
+        results = batch.stream(self._checked(call), vms, timeout=timeout)
+        if aggregate:
+            results = aggregate_results(results)
+        yield from results
 
     def console(self, vm=None):
         raise
@@ -270,34 +1233,124 @@ class Vbox(ComputeNodeABC):
         """
         pass
 
-    def log(self, vm=None):
+    def logfile(self, vm=None):
+        """
+        Get the path of the VBox.log of a VM.
+
+        Args:
+            vm (str, optional): The name of the VM. Defaults to None.
+
+        Returns:
+            str: The path of the log file or None if it is unknown.
+        """
+        if vm is None:
+            raise ValueError("VM name must be provided")
+
+        info = parse_info(
+            self._run(["VBoxManage", "showvminfo", vm, "--machinereadable"]),
+            keys=["LogFldr"],
+        )
+        if "LogFldr" not in info:
+            return None
+        return os.path.join(info["LogFldr"], "VBox.log")
+
+    def log_reader(self, vm=None):
+        """
+        Get the reader of the VBox.log of a VM.
+
+        The reader and its index are kept, so later queries only index the
+        lines appended in between.
+
+        Args:
+            vm (str, optional): The VM to get the log for. Defaults to None.
+
+        Returns:
+            LogReader: The reader or None if there is no log file.
+        """
+        logfile = self.logfile(vm)
+        if logfile is None or not os.path.exists(logfile):
+            return None
+        if logfile not in self._logs:
+            self._logs[logfile] = LogReader(logfile)
+        return self._logs[logfile]
+
+    def log(self, vm=None, tail=None, start=None, end=None):
         """
         Get the log for a VM.
 
         Args:
             vm (str, optional): The VM to get the log for. Defaults to None.
+            tail (int, optional): Only return the last tail lines. Defaults to None.
+            start (float or datetime, optional): Only return lines from this
+                time on, as seconds since the VM started or as datetime. Defaults to None.
+            end (float or datetime, optional): Only return lines up to this time. Defaults to None.
 
         Returns:
             str: The output of the log.
         """
-        if vm is None:
-            raise ValueError("VM name must be provided")
+        reader = self.log_reader(vm)
+        if reader is None:
+            return "No log file found"
+        if tail is not None:
+            return "".join(reader.tail(tail))
+        return "".join(reader.lines(start, end))
+
+    def log_search(self, vm=None, pattern=None, start=None, end=None):
+        """
+        Search the log of a VM with a regular expression.
+
+        Args:
+            vm (str, optional): The VM to get the log for. Defaults to None.
+            pattern (str, optional): The regular expression. Defaults to None.
+            start (float or datetime, optional): Only search from this time on. Defaults to None.
+            end (float or datetime, optional): Only search up to this time. Defaults to None.
 
-        output = self.run(vm, "VBoxManage showvminfo --machinereadable")
-        for line in output.split("\n"):
-            if "Logfile" in line:
-                logfile = line.split("=")[1].strip().strip('"')
-                return self.run(vm, f"cat {logfile}")
+        Returns:
+            list: The matching lines.
+        """
+        if pattern is None:
+            raise ValueError("Pattern must be provided")
+
+        reader = self.log_reader(vm)
+        if reader is None:
+            return []
+        return list(reader.search(pattern, start, end))
 
-        return "No log file found"
+    def log_stream(self, vm=None, tail=None, follow=False, size=None):
+        """
+        Yield the lines of the VBox.log of a VM without loading the whole file.
 
-    def script(self, vm=None, script=None):
+        Args:
+            vm (str, optional): The VM to get the log for. Defaults to None.
+            tail (int, optional): Start with the last tail lines instead of the
+                beginning of the file. Defaults to None.
+            follow (bool, optional): Keep yielding lines as they are appended,
+                as tail -f does, until the consumer stops. Defaults to False.
+            size (int, optional): Yield chunks of at most size characters
+                instead of lines. Defaults to None.
+
+        Yields:
+            str: A line or chunk of the log.
+        """
+        logfile = self.logfile(vm)
+        if logfile is None:
+            return
+        command = ["tail", "-n", "+1" if tail is None else str(tail)]
+        if follow:
+            # follows the log across the rotation on a restart of the VM
+            command.append("-F")
+        yield from self._stream(command + [logfile], size=size, kind="log")
+
+    def script(self, vm=None, script=None, mode="line"):
         """
         Run a script on a VM.
 
         Args:
             vm (str, optional): The VM to run the script on. Defaults to None.
             script (str, optional): The script to run. Defaults to None.
+            mode (str, optional): "line" runs every non-empty line as its own
+                command, "stream" runs the whole script in one remote shell,
+                see script_stream. Defaults to "line".
 
         Returns:
             str: The output of the script.
@@ -305,14 +1358,126 @@ class Vbox(ComputeNodeABC):
         if vm is None or script is None:
             raise ValueError("Both VM and script must be provided")
 
+        if mode == "stream":
+            return "".join(entry["output"] for entry in self.script_stream(vm, script))
+
         commands = script.split("\n")
-        output = ""
+        output = []
 
         for command in commands:
             if command.strip():  # Ignore empty lines
-                output += self.run(vm, command)
+                output.append(self.run(vm, command))
 
-        return output
+        return "".join(output)
+
+    def script_stream(self, vm=None, script=None):
+        """
+        Run a script in a single remote shell and yield the result per line.
+
+        The script is sent to one "sh -s" over stdin, so the shell state such
+        as the working directory and variables is kept between lines. Every
+        non-empty line runs with its stdin from /dev/null, so it cannot read
+        the rest of the script, and is followed by a marker with its exit
+        status, which separates the output of the lines. Each line must
+        therefore be a complete command.
+
+        If a line ends the shell, e.g. with exit, or the connection drops,
+        the interrupted line is yielded with the exit status of ssh and the
+        remaining lines are not run.
+
+        Args:
+            vm (str, optional): The VM to run the script on. Defaults to None.
+            script (str, optional): The script to run. Defaults to None.
+
+        Yields:
+            dict: The line number, command, output and exit status of each
+            line as soon as it finished.
+
+        Raises:
+            subprocess.CalledProcessError: If ssh exited with a non-zero
+                status, after the interrupted line was yielded.
+        """
+        if vm is None or script is None:
+            raise ValueError("Both VM and script must be provided")
+
+        marker = f"__cloudmesh_{uuid.uuid4().hex}__"
+        commands = {}
+        lines = []
+        for number, command in enumerate(script.split("\n"), start=1):
+            if command.strip():
+                commands[number] = command
+                lines.append("{ " + command + "\n} </dev/null")
+                lines.append(f"printf '\\n{marker} {number} %d\\n' $?")
+
+        ssh_command = self._ssh_command(f"{self.username}@{vm}", "sh -s")
+        start = time.perf_counter()
+        process = subprocess.Popen(
+            ssh_command,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            text=True,
+            start_new_session=True,
+        )
+
+        def write():
+            # written on a thread, a script larger than the pipe buffer
+            # would otherwise block while its output is not read
+            try:
+                process.stdin.write("\n".join(lines) + "\n")
+                process.stdin.close()
+            except BrokenPipeError:
+                # the shell ended before it read the whole script
+                pass
+
+        writer = threading.Thread(target=write, daemon=True)
+        writer.start()
+        reader, tail = drain(process.stderr)
+        output = []
+        reported = set()
+        total = 0
+        finished = False
+        try:
+            for line in process.stdout:
+                total += len(line)
+                if line.startswith(marker):
+                    _, number, status = line.split()
+                    number = int(number)
+                    reported.add(number)
+                    # the marker starts with a newline that is not output
+                    text = "".join(output)[:-1]
+                    output = []
+                    yield {
+                        "line": number,
+                        "command": commands[number],
+                        "output": text,
+                        "exit": int(status),
+                    }
+                else:
+                    output.append(line)
+            finished = True
+        finally:
+            if not finished and process.poll() is None:
+                # the consumer stopped early
+                kill(process)
+            process.stdout.close()
+            process.wait()
+            writer.join()
+            reader.join()
+            process.stderr.close()
+            self._record("ssh", "script", start, process.returncode, total)
+        missing = [number for number in commands if number not in reported]
+        if missing:
+            yield {
+                "line": missing[0],
+                "command": commands[missing[0]],
+                "output": "".join(output),
+                "exit": process.returncode,
+            }
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(
+                process.returncode, ssh_command, "".join(output), "".join(tail)
+            )
 
     def wait(self, vm=None, state=None, interval=5, timeout=60):
         """
@@ -321,33 +1486,120 @@ class Vbox(ComputeNodeABC):
         Args:
             vm (str, optional): The VM to wait for. Defaults to None.
             state (str, optional): The state to wait for. Defaults to None.
-            interval (int, optional): The interval to wait between checks. Defaults to 5.
+            interval (int, optional): The maximal interval between checks.
+                Checks start 0.1 seconds apart and back off exponentially. Defaults to 5.
             timeout (int, optional): The maximum time to wait. Defaults to 60.
 
         Returns:
-            str: The output in JSON format.
+            str or dict: The vm, state and status, as JSON string unless output
+            is "dict".
         """
         if vm is None or state is None:
             raise ValueError("Both VM and state must be provided")
 
+        return self._result(self._wait(vm, state, interval, timeout))
+
+    def _wait(self, vm, state, interval=5, timeout=60):
+        """
+        Wait for a VM to reach a certain state, see wait.
+
+        Returns:
+            dict: The vm, state and status, "reached" or "timeout".
+        """
+        if self._watcher is not None:
+            return self._wait_for([vm], state, interval, timeout)[0]
+        delays = backoff(interval)
         start_time = time.time()
         while True:
-            current_state = self.status(vm)
+            current_state = self.status(vm, cached=False)
             if current_state == state:
-                output = {"vm": vm, "state": state, "status": "reached"}
-                return json.dumps(output)
-            elif time.time() - start_time > timeout:
-                output = {"vm": vm, "state": state, "status": "timeout"}
-                return json.dumps(output)
+                return {"vm": vm, "state": state, "status": "reached"}
+            elapsed = time.time() - start_time
+            if elapsed > timeout:
+                return {"vm": vm, "state": state, "status": "timeout"}
 
-            time.sleep(interval)
+            if self.instrument is not None:
+                self.instrument.increment("vbox_retries_total", operation="wait")
+            time.sleep(min(next(delays), timeout - elapsed))
 
-    def status(self, vm=None):
+    def _states(self):
+        """
+        Get the state of all VMs with a single VBoxManage call.
+
+        Returns:
+            dict: The state of each VM keyed by name.
+        """
+        if self._watcher is not None:
+            return self._watcher.states()
+        output = self._run(["VBoxManage", "list", "--long", "vms"])
+        return {vm["name"]: vm["state"] for vm in parse_inventory(output)}
+
+    def _wait_for(self, vms, state, interval, timeout, count=None):
+        """
+        Wait for VMs with wait_for.
+
+        With a watcher, every round waits for its next change event instead
+        of sleeping, so a change is seen as soon as the watcher polled it.
+
+        Returns:
+            list: The vm, state and status per VM.
+        """
+        if self._watcher is None:
+            return wait_for(self._states, vms, state, interval, timeout, count)
+        with self._watcher.events(timeout) as events:
+            return wait_for(
+                self._watcher.states, vms, state, interval, timeout, count, events
+            )
+
+    def wait_all(self, vms=None, state=None, interval=5, timeout=60):
+        """
+        Wait for many VMs to reach a certain state.
+
+        The VMs are checked together with one VBoxManage call per round.
+
+        Args:
+            vms (str or list): A list of names or a pattern such as "vm[001-200]".
+            state (str, optional): The state to wait for. Defaults to None.
+            interval (int, optional): The maximal interval between checks. Defaults to 5.
+            timeout (int, optional): The maximum time to wait. Defaults to 60.
+
+        Returns:
+            str or list: The vm, state and status ("reached" or "timeout") per
+            VM, as JSON string unless output is "dict".
+        """
+        if vms is None or state is None:
+            raise ValueError("Both VMs and state must be provided")
+
+        result = self._wait_for(expand(vms), state, interval, timeout)
+        return self._result(result)
+
+    def wait_any(self, vms=None, state=None, interval=5, timeout=60):
+        """
+        Wait until at least one of many VMs reaches a certain state.
+
+        Args:
+            vms (str or list): A list of names or a pattern such as "vm[001-200]".
+            state (str, optional): The state to wait for. Defaults to None.
+            interval (int, optional): The maximal interval between checks. Defaults to 5.
+            timeout (int, optional): The maximum time to wait. Defaults to 60.
+
+        Returns:
+            str or list: The vm, state and status ("reached", "pending" or
+            "timeout") per VM, as JSON string unless output is "dict".
+        """
+        if vms is None or state is None:
+            raise ValueError("Both VMs and state must be provided")
+
+        result = self._wait_for(expand(vms), state, interval, timeout, 1)
+        return self._result(result)
+
+    def status(self, vm=None, cached=True):
         """
         Get the status of a VM.
 
         Args:
             vm (str, optional): The name of the VM. Defaults to None.
+            cached (bool, optional): Whether a cached status may be returned. Defaults to True.
 
         Returns:
             str: The status of the VM.
@@ -355,12 +1607,129 @@ class Vbox(ComputeNodeABC):
         if vm is None:
             raise ValueError("VM name must be provided")
 
-        output = self._run(["VBoxManage", "showvminfo", vm])
-        for line in output.split("\n"):
-            if "State:" in line:
-                return line.split(":")[1].strip()
+        if self._watcher is not None:
+            return self._watcher.status(vm)
+        status = cached and self.cache and self.cache.get(vm, "status")
+        if not status:
+            output = self._run(["VBoxManage", "showvminfo", vm])
+            with self._timer("status"):
+                status = parse_status(output)
+            if self.cache:
+                self.cache.put(vm, "status", status)
+        return status
+
+    def setup_metrics(self, vms=None, metrics=None, period=1, samples=1):
+        """
+        Enable the collection of metrics by VirtualBox.
+
+        Args:
+            vms (str, optional): The VM to set up. Defaults to None, all VMs.
+            metrics (list, optional): The metrics. Defaults to METRICS.
+            period (int, optional): Seconds between two samples taken by
+                VirtualBox. Defaults to 1.
+            samples (int, optional): The number of samples VirtualBox keeps. Defaults to 1.
+
+        Returns:
+            str: The output of the VBoxManage metrics setup command.
+        """
+        return self._run(
+            [
+                "VBoxManage",
+                "metrics",
+                "setup",
+                "--period",
+                str(period),
+                "--samples",
+                str(samples),
+                vms or "*",
+                ",".join(metrics or METRICS),
+            ]
+        )
+
+    def collect_metrics(self, vms=None, metrics=None):
+        """
+        Query the newest metrics of many VMs with a single VBoxManage call.
+
+        The samples are added to the ring buffers in self.metrics and to
+        the metrics store if there is one. Call
+        setup_metrics once before and this method at least once per period.
+
+        Args:
+            vms (str or list, optional): A list of names or a pattern such as
+                "vm[001-200]". Defaults to None, all VMs.
+            metrics (list, optional): The metrics. Defaults to METRICS.
+
+        Returns:
+            str or dict: The newest value of each metric keyed by VM and
+            metric, as JSON string unless output is "dict".
+        """
+        names = None if vms is None else set(expand(vms))
+        output = self._run(
+            ["VBoxManage", "metrics", "query", "*", ",".join(metrics or METRICS)]
+        )
+        now = time.time()
+        result = {}
+        for entry in parse_metrics(output):
+            vm = entry["object"]
+            if vm == "host" or not entry["values"]:
+                continue
+            if names is not None and vm not in names:
+                continue
+            value = entry["values"][-1]
+            self.metrics.add(vm, entry["metric"], now, value, entry["unit"])
+            result.setdefault(vm, {})[entry["metric"]] = value
+        if self.metrics_store is not None:
+            self.metrics_store.append(
+                (now, vm, metric, value)
+                for vm, values in result.items()
+                for metric, value in values.items()
+            )
+        return self._result(result)
+
+    def query_metrics(self, vm=None, metric=None, start=None):
+        """
+        Get the collected samples.
+
+        Args:
+            vm (str, optional): Only return this VM. Defaults to None.
+            metric (str, optional): Only return this metric. Defaults to None.
+            start (float, optional): Only return samples from this time on,
+                as seconds since the epoch. Defaults to None.
+
+        Returns:
+            str or list: One entry per VM and metric with vm, metric, unit and
+            samples, as JSON string unless output is "dict".
+        """
+        return self._result(self.metrics.query(vm=vm, metric=metric, start=start))
+
+    def history(self, metric=None, vm=None, start=None, end=None, summary=False):
+        """
+        Get the stored history of a metric.
 
-        return "Unknown"
+        Args:
+            metric (str, optional): The metric, e.g. "CPU/Load/User". Defaults to None.
+            vm (str, optional): Only return this VM. Defaults to None.
+            start (float, optional): The first time as seconds since the epoch. Defaults to None.
+            end (float, optional): The last time. Defaults to None.
+            summary (bool, optional): Return the mean, min, max and count per
+                VM instead of the samples. Defaults to False.
+
+        Returns:
+            str or dict: The samples or summary keyed by VM, as JSON string
+            unless output is "dict".
+        """
+        if metric is None:
+            raise ValueError("Metric must be provided")
+        if self.metrics_store is None:
+            raise ValueError("No metrics store is configured")
+
+        if summary:
+            result = self.metrics_store.summary(metric, start=start, end=end)
+            if vm is not None:
+                result = {vm: result[vm]} if vm in result else {}
+        else:
+            result = self.metrics_store.query(metric, vm=vm, start=start, end=end)
+        return self._result(result)
 
     def keys(self):
         """
@@ -388,18 +1757,111 @@ class Vbox(ComputeNodeABC):
 
     def images(self, **kwargs):
         """
-        Lists the images on the cloud
-        :return: dict
+        List the images of the catalog.
+
+        The catalog is read from its local index, no command is run. Use
+        add_images to register new or changed image files.
+
+        Args:
+            kwargs (dict): Additional keyword arguments.
+
+        Returns:
+            list: The entries with name, path, format, size, checksum, os
+            and last_used, as JSON string if output is "json".
         """
-        raise NotImplementedError
+        return self._result(self.catalog.list())
 
     def image(self, name=None):
         """
-        Gets the image with a given nmae
-        :param name: The name of the image
-        :return: the dict of the image
+        Look up an image in the catalog.
+
+        Args:
+            name (str, optional): The name of the image. Defaults to None.
+
+        Returns:
+            dict: The entry of the image or None, as JSON string if output is "json".
+        """
+        return self._result(self.catalog.get(name))
+
+    def add_images(self, *paths):
         """
-        raise NotImplementedError
+        Register image files or all images in directories with the catalog.
+
+        Only files that are new or changed since they were registered are
+        hashed.
+
+        Args:
+            paths (str): Files or directories.
+
+        Returns:
+            list: The entries of the registered images, as JSON string if
+            output is "json".
+        """
+        entries = []
+        for path in paths:
+            if os.path.isdir(path):
+                entries.extend(self.catalog.scan(path))
+            else:
+                entries.append(self.catalog.register(path))
+        return self._result(entries)
+
+    def store_image(self, path=None, name=None, os_type=None, move=False):
+        """
+        Keep an image file once in the image store and register it.
+
+        A file whose content is already stored only adds the name, so
+        copies of the same disk share one file. If the store exceeds its
+        quota, the least recently used images that no VM uses are evicted.
+
+        Args:
+            path (str, optional): The file. Defaults to None.
+            name (str, optional): The name of the image. Defaults to the file
+                name without its extension.
+            os_type (str, optional): The VirtualBox OS type. Defaults to the
+                one in the OVF descriptor.
+            move (bool, optional): Remove the file once it is stored. Defaults to False.
+
+        Returns:
+            dict: The catalog entry, as JSON string if output is "json".
+        """
+        if self.image_store is None:
+            raise ValueError("No image store is configured")
+        entry = self.image_store.add(path, name=name, os_type=os_type, move=move)
+        return self._result(entry)
+
+    def evict_images(self, quota=None):
+        """
+        Evict the least recently used images that no VM uses from the store.
+
+        Args:
+            quota (int, optional): The size in bytes the store must fit.
+                Defaults to the quota of the store.
+
+        Returns:
+            list: The names of the evicted images.
+        """
+        if self.image_store is None:
+            raise ValueError("No image store is configured")
+        return self.image_store.evict(quota)
+
+    def _disks_in_use(self):
+        """
+        Get the disks attached to VMs, including the bases of their
+        differencing disks.
+
+        Returns:
+            set: The paths of the disks.
+        """
+        media = parse_media(self._run(["VBoxManage", "list", "hdds"]))
+        locations = {medium["UUID"]: medium for medium in media}
+        used = set()
+        for medium in media:
+            if not medium["vms"]:
+                continue
+            while medium is not None:
+                used.add(medium["location"])
+                medium = locations.get(medium["parent"])
+        return used
 
     def flavors(self, **kwargs):
         """
@@ -417,15 +1879,6 @@ class Vbox(ComputeNodeABC):
         """
         raise NotImplementedError
 
-    def reboot(self, name=None):
-        """
-        Reboot a list of nodes with the given names
-
-        :param name: A list of node names
-        :return:  A list of dict representing the nodes
-        """
-        raise NotImplementedError
-
     def attach_public_ip(self, name=None, ip=None):
         """
         adds a public ip to the named vm
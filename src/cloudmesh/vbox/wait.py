@@ -0,0 +1,82 @@
+"""
+Helpers to wait for VMs to reach a state with adaptive polling.
+"""
+
+import time
+
+
+def backoff(interval, initial=0.1, factor=2):
+    """
+    Generate exponentially growing delays capped at interval.
+
+    Args:
+        interval (float): The maximal delay.
+        initial (float, optional): The first delay. Defaults to 0.1.
+        factor (float, optional): The growth per step. Defaults to 2.
+
+    Yields:
+        float: The next delay in seconds.
+    """
+    delay = min(initial, interval)
+    while True:
+        yield delay
+        delay = min(delay * factor, interval)
+
+
+def wait_for(states, vms, state, interval=5, timeout=60, count=None, events=None):
+    """
+    Wait until count of the given VMs have reached a state.
+
+    All VMs are checked with a single call of states per round. The delay
+    between rounds starts small, doubles up to interval, and is reset
+    whenever any of the VMs changed its state. With events, a round starts
+    as soon as the next change event arrives instead.
+
+    Args:
+        states (callable): Returns a dict mapping VM names to their state.
+        vms (list): The names of the VMs.
+        state (str): The state to wait for.
+        interval (float, optional): The maximal delay between checks. Defaults to 5.
+        timeout (float, optional): The maximum time to wait. Defaults to 60.
+        count (int, optional): How many VMs must reach the state. Defaults
+            to all of them.
+        events (iterator, optional): Change events that end at the timeout,
+            e.g. from WatcherClient.events. Once they end early, the VMs
+            are polled. Defaults to None.
+
+    Returns:
+        list: One dict per VM with vm, state and status, where status is
+        "reached", "timeout" or, if fewer than all VMs were requested,
+        "pending".
+    """
+    count = len(vms) if count is None else count
+    reached = set()
+    previous = None
+    delays = backoff(interval)
+    start_time = time.time()
+    while True:
+        current = states()
+        reached.update(vm for vm in vms if current.get(vm) == state)
+        if len(reached) >= count:
+            remaining = "pending"
+            break
+        elapsed = time.time() - start_time
+        if elapsed > timeout:
+            remaining = "timeout"
+            break
+        if events is not None:
+            if next(events, None) is None:
+                events = None
+            continue
+        if previous is not None and current != previous:
+            delays = backoff(interval)
+        previous = current
+        time.sleep(min(next(delays), max(timeout - elapsed, 0)))
+    return [
+        {
+            "vm": vm,
+            "state": state,
+            "status": "reached" if vm in reached else remaining,
+        }
+        for vm in vms
+    ]
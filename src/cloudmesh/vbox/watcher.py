@@ -0,0 +1,374 @@
+"""
+A shared state watcher for all VMs of a host.
+
+The watcher polls VBoxManage once per interval for all VMs, keeps the
+result in memory, and answers status queries and sends change
+notifications to any number of local clients over a Unix socket. Clients
+therefore no longer run their own showvminfo calls.
+
+Start it with::
+
+    python -m cloudmesh.vbox.watcher --interval=1
+
+The protocol consists of one JSON object per line. A client sends a request
+such as {"command": "status", "vm": "vm1"} and receives one response line.
+After {"command": "subscribe"} the server confirms the subscription with
+{"subscribed": true} and then sends one line per state change until the
+client disconnects.
+"""
+
+import argparse
+import json
+import logging
+import os
+import queue
+import socket
+import socketserver
+import subprocess
+import threading
+import time
+
+from cloudmesh.vbox.parse import parse_inventory
+
+SOCKET = os.path.expanduser("~/.cloudmesh/vbox/watcher.sock")
+
+log = logging.getLogger(__name__)
+
+
+class Watcher:
+    """
+    Polls the state of all VMs and serves it over a Unix socket.
+    """
+
+    def __init__(self, path=SOCKET, interval=1.0):
+        """
+        Initialize the Watcher.
+
+        Args:
+            path (str, optional): The path of the Unix socket. Defaults to
+                ~/.cloudmesh/vbox/watcher.sock.
+            interval (float, optional): Seconds between two polls. Defaults to 1.0.
+        """
+        self.path = path
+        self.interval = interval
+        self.table = {}
+        self.subscribers = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._server = None
+
+    def poll(self):
+        """
+        Query all VMs once, update the table and notify the subscribers.
+
+        If VBoxManage fails, e.g. while VBoxSVC restarts, the previous table
+        is kept instead of reporting all VMs as removed.
+
+        Returns:
+            list: The change events, each a dict with vm, state and previous.
+        """
+        result = subprocess.run(
+            ["VBoxManage", "list", "--long", "vms"], capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            log.warning(
+                "VBoxManage list failed with status %d: %s",
+                result.returncode,
+                result.stderr.strip(),
+            )
+            return []
+        table = {vm["name"]: vm for vm in parse_inventory(result.stdout)}
+        events = []
+        with self._lock:
+            for name, vm in table.items():
+                previous = self.table.get(name, {}).get("state")
+                if previous != vm["state"]:
+                    events.append(
+                        {"vm": name, "state": vm["state"], "previous": previous}
+                    )
+            for name in self.table.keys() - table.keys():
+                events.append(
+                    {"vm": name, "state": None, "previous": self.table[name]["state"]}
+                )
+            self.table = table
+            for subscriber in self.subscribers:
+                for event in events:
+                    subscriber.put(event)
+        return events
+
+    def _loop(self):
+        while not self._stopped.is_set():
+            try:
+                self.poll()
+            except Exception:
+                # keep serving the last table and retry in the next round
+                log.exception("Polling the VMs failed")
+            self._stopped.wait(self.interval)
+
+    def handle(self, request):
+        """
+        Answer a single request.
+
+        Args:
+            request (dict): The request with a command and its arguments.
+
+        Returns:
+            The response that is sent back as JSON.
+        """
+        command = request.get("command")
+        with self._lock:
+            if command == "status":
+                vm = self.table.get(request.get("vm"))
+                return {"vm": request.get("vm"), "state": vm and vm["state"]}
+            elif command == "states":
+                return {name: vm["state"] for name, vm in self.table.items()}
+            elif command == "inventory":
+                return list(self.table.values())
+        return {"error": f"unknown command: {command}"}
+
+    def start(self):
+        """
+        Start polling and serving in background threads.
+        """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self.poll()
+        watcher = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    request = json.loads(line)
+                    if request.get("command") == "subscribe":
+                        watcher.stream(self.wfile)
+                        return
+                    response = watcher.handle(request)
+                    self.wfile.write((json.dumps(response) + "\n").encode())
+                    self.wfile.flush()
+
+        self._server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def stream(self, wfile):
+        """
+        Send change events to a subscriber until it disconnects.
+
+        Args:
+            wfile (file): The stream of the subscriber.
+        """
+        events = queue.Queue()
+        with self._lock:
+            self.subscribers.append(events)
+        try:
+            # from here on no change is missed, the client may read the table
+            wfile.write(b'{"subscribed": true}\n')
+            wfile.flush()
+            while not self._stopped.is_set():
+                try:
+                    event = events.get(timeout=self.interval)
+                except queue.Empty:
+                    continue
+                wfile.write((json.dumps(event) + "\n").encode())
+                wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            with self._lock:
+                self.subscribers.remove(events)
+
+    def stop(self):
+        """
+        Stop polling and serving and remove the socket.
+        """
+        self._stopped.set()
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class WatcherClient:
+    """
+    Queries a running Watcher.
+    """
+
+    def __init__(self, path=SOCKET):
+        """
+        Initialize the WatcherClient.
+
+        Args:
+            path (str, optional): The path of the Unix socket. Defaults to
+                ~/.cloudmesh/vbox/watcher.sock.
+        """
+        self.path = path
+        self._socket = None
+        self._file = None
+        self._lock = threading.Lock()
+
+    def _connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.connect(self.path)
+        return sock, sock.makefile("rwb")
+
+    def request(self, **request):
+        """
+        Send a request and return the response.
+
+        Args:
+            request (dict): The command and its arguments.
+
+        Returns:
+            The decoded response.
+        """
+        with self._lock:
+            if self._socket is None:
+                self._socket, self._file = self._connect()
+            self._file.write((json.dumps(request) + "\n").encode())
+            self._file.flush()
+            return json.loads(self._file.readline())
+
+    def status(self, vm):
+        """
+        Get the status of a VM.
+
+        Args:
+            vm (str): The name of the VM.
+
+        Returns:
+            str: The status of the VM or "Unknown".
+        """
+        return self.request(command="status", vm=vm)["state"] or "Unknown"
+
+    def states(self):
+        """
+        Get the state of all VMs.
+
+        Returns:
+            dict: The state of each VM keyed by name.
+        """
+        return self.request(command="states")
+
+    def inventory(self):
+        """
+        Get the inventory of all VMs.
+
+        Returns:
+            list: A list of dicts with name, UUID, state, memory, cpus and nics of each VM.
+        """
+        return self.request(command="inventory")
+
+    def events(self, timeout=None):
+        """
+        Subscribe to state changes.
+
+        The subscription is in place when this returns, so a change after
+        a following status or states query is not missed.
+
+        Args:
+            timeout (float, optional): Seconds after which the events end.
+                Defaults to None, never.
+
+        Returns:
+            Subscription: An iterator of change events, each a dict with vm,
+            state and previous.
+        """
+        sock, stream = self._connect()
+        try:
+            stream.write(b'{"command": "subscribe"}\n')
+            stream.flush()
+            stream.readline()
+        except OSError:
+            stream.close()
+            sock.close()
+            raise
+        return Subscription(sock, stream, timeout)
+
+    def close(self):
+        """
+        Close the connection to the watcher.
+        """
+        with self._lock:
+            if self._socket is not None:
+                self._file.close()
+                self._socket.close()
+                self._socket = None
+
+
+class Subscription:
+    """
+    The change events of a watcher, see WatcherClient.events.
+    """
+
+    def __init__(self, sock, stream, timeout=None):
+        """
+        Initialize the Subscription.
+
+        Args:
+            sock (socket.socket): The subscribed connection.
+            stream (file): The stream of the connection.
+            timeout (float, optional): Seconds after which the events end.
+                Defaults to None, never.
+        """
+        self._socket = sock
+        self._file = stream
+        self._deadline = None if timeout is None else time.monotonic() + timeout
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._file is None:
+            raise StopIteration
+        if self._deadline is not None:
+            remaining = self._deadline - time.monotonic()
+            if remaining <= 0:
+                self.close()
+                raise StopIteration
+            self._socket.settimeout(remaining)
+        try:
+            line = self._file.readline()
+        except socket.timeout:
+            line = b""
+        if not line:
+            self.close()
+            raise StopIteration
+        return json.loads(line)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        """
+        End the subscription.
+        """
+        if self._file is not None:
+            self._file.close()
+            self._socket.close()
+            self._file = None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Watch the state of all VMs")
+    parser.add_argument("--socket", default=SOCKET)
+    parser.add_argument("--interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    logging.basicConfig(format="%(asctime)s %(levelname)s %(message)s")
+    watcher = Watcher(path=args.socket, interval=args.interval)
+    watcher.start()
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
+if __name__ == "__main__":
+    main()
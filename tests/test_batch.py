@@ -0,0 +1,52 @@
+import threading
+import time
+
+from cloudmesh.vbox.batch import Batch
+from cloudmesh.vbox.batch import aggregate
+
+
+class Tracker:
+    """
+    Records the highest number of concurrent calls per host.
+    """
+
+    def __init__(self, host):
+        self.host = host
+        self.running = {}
+        self.peak = {}
+        self._lock = threading.Lock()
+
+    def __call__(self, name, timeout=None):
+        host = self.host[name]
+        with self._lock:
+            self.running[host] = self.running.get(host, 0) + 1
+            self.peak[host] = max(self.peak.get(host, 0), self.running[host])
+        time.sleep(0.05)
+        with self._lock:
+            self.running[host] -= 1
+        return host
+
+
+class TestBatch:
+    def test_per_host_limits_each_host(self):
+        host = {f"vm{i}": f"host{i % 2}" for i in range(8)}
+        tracker = Tracker(host)
+        batch = Batch(parallelism=8, per_host=2, host=host)
+        entries = batch.run(tracker, "vm[0-7]")
+        assert [entry["result"] for entry in entries] == [
+            host[f"vm{i}"] for i in range(8)
+        ]
+        assert tracker.peak == {"host0": 2, "host1": 2}
+
+    def test_errors_are_reported_per_vm(self):
+        def fail(name, timeout=None):
+            if name == "vm2":
+                raise ValueError("broken")
+            return "ok"
+
+        entries = Batch().run(fail, ["vm1", "vm2", "vm3"])
+        assert [entry["status"] for entry in entries] == ["ok", "error", "ok"]
+        assert aggregate(entries) == [
+            {"names": ["vm1", "vm3"], "status": "ok", "result": "ok", "error": None},
+            {"names": ["vm2"], "status": "error", "result": None, "error": "broken"},
+        ]
@@ -0,0 +1,74 @@
+import subprocess
+import time
+
+import pytest
+
+from cloudmesh.vbox.cache import TTLCache
+from cloudmesh.vbox.fake import FakeVBoxManage
+from cloudmesh.vbox.vbox import Vbox
+
+
+@pytest.fixture
+def vbox(tmp_path):
+    with FakeVBoxManage(vms=2) as fake:
+        vbox = Vbox(cache_ttl=60, output="dict", catalog=str(tmp_path / "images.jsonl"))
+        yield fake, vbox
+
+
+class TestTTLCache:
+    def test_entries_expire(self):
+        cache = TTLCache(ttl=0.1)
+        cache.put("vm1", "status", "running")
+        assert cache.get("vm1", "status") == "running"
+        time.sleep(0.15)
+        assert cache.get("vm1", "status") is None
+        assert cache.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+    def test_least_recently_used_vm_is_evicted(self):
+        cache = TTLCache(size=2)
+        cache.put("vm1", "status", "a")
+        cache.put("vm2", "status", "b")
+        cache.get("vm1", "status")
+        cache.put("vm3", "status", "c")
+        assert cache.get("vm2", "status") is None
+        assert cache.get("vm1", "status") == "a"
+
+    def test_invalidate_drops_all_kinds(self):
+        cache = TTLCache()
+        cache.put("vm1", "status", "a")
+        cache.put("vm1", "info", "b")
+        cache.put("vm2", "info", "c")
+        cache.invalidate("vm1")
+        assert cache.get("vm1", "info") is None
+        assert cache.get("vm2", "info") == "c"
+        cache.invalidate()
+        assert cache.stats()["size"] == 0
+
+
+class TestVboxCache:
+    def test_results_are_cached(self, vbox):
+        _, vbox = vbox
+        assert vbox.status("vm1") == "powered off"
+        assert vbox.info("vm1")["VMState"] == "poweroff"
+        # a change by another client is only seen once the entry expires
+        subprocess.run(["VBoxManage", "startvm", "vm1"], check=True)
+        assert vbox.status("vm1") == "powered off"
+        assert vbox.info("vm1")["VMState"] == "poweroff"
+        assert vbox.cache.stats() == {"hits": 2, "misses": 2, "size": 1}
+
+    def test_mutating_calls_invalidate(self, vbox):
+        fake, vbox = vbox
+        assert vbox.status("vm1") == "powered off"
+        assert vbox.status("vm2") == "powered off"
+        vbox.start("vm1")
+        assert vbox.status("vm1") == "running"
+        assert vbox.info("vm1")["VMState"] == "running"
+        vbox.rename("vm2", "renamed")
+        assert vbox.status("vm2") != "powered off"
+
+    def test_uncached_status(self, vbox):
+        fake, vbox = vbox
+        assert vbox.status("vm1") == "powered off"
+        vbox.cache.put("vm1", "status", "stale")
+        assert vbox.status("vm1") == "stale"
+        assert vbox.status("vm1", cached=False) == "powered off"
@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from cloudmesh.vbox.catalog import Catalog
+
+
+@pytest.fixture
+def images(tmp_path):
+    paths = []
+    for name in ["a", "b"]:
+        path = tmp_path / f"{name}.vdi"
+        path.write_bytes(name.encode() * 10)
+        paths.append(str(path))
+    return paths
+
+
+class TestCatalog:
+    def test_register_and_remove(self, tmp_path, images):
+        catalog = Catalog(str(tmp_path / "images.jsonl"))
+        entry = catalog.register(images[0])
+        assert (entry["name"], entry["format"], entry["size"]) == ("a", "vdi", 10)
+        assert catalog.register(images[0]) is entry
+        catalog.remove("a")
+        assert catalog.get("a") is None
+        assert Catalog(catalog.path).list() == []
+
+    def test_compact_keeps_changes_of_other_processes(self, tmp_path, images):
+        path = str(tmp_path / "images.jsonl")
+        first = Catalog(path)
+        first.register(images[0])
+        second = Catalog(path)
+        second.register(images[1])
+        first.compact()
+        assert [entry["name"] for entry in first.list()] == ["a", "b"]
+        with open(path) as f:
+            assert len(f.readlines()) == 3
+        assert [entry["name"] for entry in Catalog(path).list()] == ["a", "b"]
+
+    def test_touch_after_compaction_elsewhere(self, tmp_path, images):
+        path = str(tmp_path / "images.jsonl")
+        first = Catalog(path)
+        first.register(images[0])
+        second = Catalog(path)
+        # enough touches to compact the index in the second catalog
+        for _ in range(100):
+            second.touch("a")
+        first.register(images[1])
+        first.touch("a")
+        assert [entry["name"] for entry in first.list()] == ["a", "b"]
+        with open(path) as f:
+            lines = [json.loads(line) for line in f]
+        assert len(lines) < 100
+        assert [entry["name"] for entry in Catalog(path).list()] == ["a", "b"]
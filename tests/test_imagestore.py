@@ -0,0 +1,52 @@
+import os
+
+import pytest
+
+from cloudmesh.vbox.imagestore import ImageStore
+
+
+@pytest.fixture
+def images(tmp_path, monkeypatch):
+    # a relative store directory, as the catalog registers absolute paths
+    monkeypatch.chdir(tmp_path)
+    os.mkdir("files")
+    for name, content in [("a", b"a" * 100), ("b", b"b" * 100), ("c", b"c" * 50)]:
+        with open(os.path.join("files", name + ".vdi"), "wb") as f:
+            f.write(content)
+    return lambda name: os.path.join("files", name + ".vdi")
+
+
+class TestImageStore:
+    def test_copies_are_stored_once(self, images):
+        store = ImageStore("store")
+        first = store.add(images("a"), name="one")
+        second = store.add(images("a"), name="two")
+        assert first["path"] == second["path"]
+        assert store.usage() == 100
+        assert store.files()[first["path"]]["names"] == ["one", "two"]
+
+    def test_quota_evicts_least_recently_used(self, images):
+        store = ImageStore("store", quota=150)
+        store.add(images("a"))
+        store.add(images("b"))
+        assert store.usage() == 100
+        assert [entry["name"] for entry in store.catalog.list()] == ["b"]
+        store.catalog.touch("b")
+        store.add(images("c"))
+        assert store.usage() == 150
+        assert [entry["name"] for entry in store.catalog.list()] == ["b", "c"]
+
+    def test_disks_in_use_are_kept(self, images):
+        used = []
+        store = ImageStore("store", quota=150, in_use=lambda: used)
+        path = store.add(images("a"))["path"]
+        used.append(path)
+        store.add(images("b"))
+        # the older file is in use, so the newer one is evicted
+        assert store.usage() == 200
+        assert store.evict() == ["b"]
+        assert os.path.exists(path)
+        used.clear()
+        assert store.evict(quota=0) == ["a"]
+        assert not os.path.exists(path)
+        assert store.usage() == 0
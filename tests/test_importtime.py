@@ -0,0 +1,27 @@
+import subprocess
+import sys
+
+# the plugin is loaded on every start of cms, these are only needed to run it
+DEFERRED = ["cloudmesh.vbox.vbox", "cloudmesh.common.variables"]
+
+
+def imported(module):
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    names = set()
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and line.count("|") == 2:
+            names.add(line.rsplit("|", 1)[1].strip())
+    return names
+
+
+class TestImportTime:
+    def test_plugin_defers_heavy_imports(self):
+        names = imported("cloudmesh.vbox.command.vbox")
+        assert "cloudmesh.vbox.command.vbox" in names
+        for module in DEFERRED:
+            assert module not in names
@@ -0,0 +1,92 @@
+import os
+from datetime import datetime
+
+import pytest
+
+from cloudmesh.vbox.logreader import LogReader
+from cloudmesh.vbox.logreader import seconds
+
+
+def write_log(path, count, start=0):
+    with open(path, "a") as f:
+        if start == 0:
+            f.write("00:00:00.000000 Log opened 2024-01-15T10:00:00.000000Z\n")
+        for i in range(start, start + count):
+            f.write(f"00:{i // 60:02d}:{i % 60:02d}.500000 line {i}\n")
+            if i % 10 == 0:
+                f.write(f"  detail of line {i}\n")
+
+
+@pytest.fixture
+def log(tmp_path):
+    path = str(tmp_path / "VBox.log")
+    write_log(path, 600)
+    reader = LogReader(path, block=1024)
+    yield path, reader
+    reader.close()
+
+
+class TestLogReader:
+    def test_seconds(self):
+        assert seconds(b"01:02:03.250000 text") == 3723.25
+        assert seconds(b"  no time") is None
+
+    def test_index_is_sparse(self, log):
+        _, reader = log
+        reader.refresh()
+        size = os.path.getsize(reader.path)
+        assert len(reader.offsets) == len(reader.times)
+        assert len(reader.offsets) <= size // 1024 + 1
+        assert list(reader.times) == sorted(reader.times)
+        assert reader.opened == datetime(2024, 1, 15, 10, 0)
+
+    def test_time_range(self, log):
+        _, reader = log
+        lines = list(reader.lines(100, 110.6))
+        assert lines[0] == "00:01:40.500000 line 100\n"
+        assert lines[1] == "  detail of line 100\n"
+        assert lines[-1] == "  detail of line 110\n"
+        assert len(lines) == 13
+
+    def test_datetime_range(self, log):
+        _, reader = log
+        start = datetime(2024, 1, 15, 10, 9, 59)
+        assert list(reader.lines(start)) == ["00:09:59.500000 line 599\n"]
+
+    def test_appended_blocks_are_indexed(self, log):
+        path, reader = log
+        reader.refresh()
+        indexed = len(reader.offsets)
+        write_log(path, 600, start=600)
+        assert list(reader.lines(1199)) == ["00:19:59.500000 line 1199\n"]
+        assert len(reader.offsets) > indexed
+
+    def test_rotated_log_is_indexed_again(self, log):
+        path, reader = log
+        reader.refresh()
+        os.remove(path)
+        write_log(path, 5)
+        assert reader.tail(2) == [
+            "00:00:03.500000 line 3\n",
+            "00:00:04.500000 line 4\n",
+        ]
+        assert list(reader.lines(0.5, 0.6)) == [
+            "00:00:00.500000 line 0\n",
+            "  detail of line 0\n",
+        ]
+
+    def test_search(self, log):
+        _, reader = log
+        assert list(reader.search(r"^\d.* line 59\d$")) == [
+            f"00:09:{50 + i}.500000 line {590 + i}\n" for i in range(10)
+        ]
+        assert list(reader.search(r"^  detail of line 59")) == [
+            "  detail of line 590\n"
+        ]
+        # the same matches with a time range, which searches line by line
+        assert list(reader.search(r"^  detail of line 59", start=0)) == [
+            "  detail of line 590\n"
+        ]
+        assert list(reader.search(r"^\d.* line 59\d$", 0, 10**6)) == list(
+            reader.search(r"^\d.* line 59\d$")
+        )
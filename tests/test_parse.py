@@ -0,0 +1,83 @@
+from cloudmesh.vbox.parse import group
+from cloudmesh.vbox.parse import parse_info
+from cloudmesh.vbox.parse import unescape
+
+SHOWVMINFO = r"""name="vm1"
+memory=1024
+cpus=2
+VMState="running"
+description="a \"quoted\" value with = and \\ and a\nnewline"
+"key=with=equals"="x"
+"GuestProperty/quoted\"key"="y"
+nic1="nat"
+macaddress1="080027A1B2C3"
+cableconnected1="on"
+nic2="none"
+storagecontrollername0="SATA"
+storagecontrollertype0="IntelAhci"
+storagecontrollerportcount0=30
+"SATA-0-0"="/vms/vm1/disk.vdi"
+"SATA-ImageUUID-0-0"="d6e1a5c2-0000-0000-0000-000000000001"
+"SATA-1-0"="none"
+uart1="off"
+"""
+
+
+class TestParseInfo:
+    def test_raw_values(self):
+        info = parse_info(SHOWVMINFO)
+        assert info["name"] == "vm1"
+        assert info["memory"] == "1024"
+        assert info["cableconnected1"] == "on"
+        assert info["description"] == 'a "quoted" value with = and \\ and a\nnewline'
+
+    def test_quoted_keys(self):
+        info = parse_info(SHOWVMINFO)
+        assert info["key=with=equals"] == "x"
+        assert info['GuestProperty/quoted"key'] == "y"
+        assert info["SATA-0-0"] == "/vms/vm1/disk.vdi"
+
+    def test_typed_values_are_grouped(self):
+        info = parse_info(SHOWVMINFO, typed=True)
+        assert info["memory"] == 1024
+        assert info["VMState"] == "running"
+        assert info["uart1"] is False
+        assert info["nics"] == {
+            1: {"nic": "nat", "macaddress": "080027A1B2C3", "cableconnected": True},
+            2: {"nic": "none"},
+        }
+        assert info["storagecontrollers"] == {
+            0: {"name": "SATA", "type": "IntelAhci", "portcount": 30}
+        }
+        assert info["disks"] == {
+            "SATA-0-0": {
+                "path": "/vms/vm1/disk.vdi",
+                "imageuuid": "d6e1a5c2-0000-0000-0000-000000000001",
+            },
+            "SATA-1-0": {"path": "none"},
+        }
+        assert "macaddress1" not in info
+
+    def test_lazy_keys(self):
+        assert parse_info(SHOWVMINFO, keys=["VMState", "name"]) == {
+            "name": "vm1",
+            "VMState": "running",
+        }
+        assert parse_info(SHOWVMINFO, typed=True, keys=["cpus", "missing"]) == {
+            "cpus": 2
+        }
+
+    def test_lines_without_value_are_skipped(self):
+        assert parse_info('Time offset\nname="vm1"\n') == {"name": "vm1"}
+
+
+class TestHelpers:
+    def test_unescape(self):
+        assert unescape("plain") == "plain"
+        assert unescape(r"a\"b\\c\td") == 'a"b\\c\td'
+
+    def test_group_keeps_unknown_indexed_keys(self):
+        info = group({"uart1": False, "other-0-0": "x", "nic1": "nat"})
+        assert info["uart1"] is False
+        assert info["other-0-0"] == "x"
+        assert info["disks"] == {}
@@ -0,0 +1,50 @@
+import subprocess
+
+import pytest
+
+from cloudmesh.vbox.fake import FakeVBoxManage
+from cloudmesh.vbox.pool import WarmPool
+from cloudmesh.vbox.vbox import Vbox
+
+
+@pytest.fixture
+def vbox(tmp_path):
+    with FakeVBoxManage(vms=2) as fake:
+        yield fake, Vbox(output="dict", catalog=str(tmp_path / "images.jsonl"))
+
+
+class TestWarmPool:
+    def test_failed_clone_is_deleted(self, vbox):
+        fake, vbox = vbox
+        pool = WarmPool(vbox, "missing", size=1, timeout=5)
+        with pytest.raises(subprocess.CalledProcessError):
+            pool.fill()
+        assert not pool.ready
+        assert sorted(fake.state()) == ["vm1", "vm2"]
+
+    @pytest.mark.parametrize("state", ["saved", "running"])
+    def test_vm_is_handed_out_saved(self, vbox, state):
+        fake, vbox = vbox
+        pool = WarmPool(vbox, "vm1", size=1, state=state, timeout=5)
+        assert pool.fill() == 1
+        assert vbox.status(pool.ready[0][0]) == state
+        assert pool.acquire("new") == "new"
+        assert vbox.status("new") == "saved"
+        vbox.start("new")
+        assert vbox.status("new") == "running"
+
+    def test_taken_name_keeps_vm(self, vbox):
+        fake, vbox = vbox
+        pool = WarmPool(vbox, "vm1", size=1, timeout=5)
+        pool.fill()
+        ready = list(pool.ready)
+        assert pool.acquire("vm2") is None
+        assert list(pool.ready) == ready
+
+    def test_missing_vm_is_dropped(self, vbox):
+        fake, vbox = vbox
+        pool = WarmPool(vbox, "vm1", size=1, timeout=5)
+        pool.fill()
+        vbox.destroy(pool.ready[0][0])
+        assert pool.acquire("new") is None
+        assert not pool.ready
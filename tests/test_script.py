@@ -0,0 +1,64 @@
+import subprocess
+import time
+
+import pytest
+
+from cloudmesh.vbox.fake import FakeSsh
+from cloudmesh.vbox.vbox import Vbox
+
+
+@pytest.fixture
+def vbox(tmp_path):
+    with FakeSsh(latency=0):
+        yield Vbox(username="u", output="dict", catalog=str(tmp_path / "images.jsonl"))
+
+
+class TestScriptStream:
+    def test_lines_share_one_shell(self, vbox, tmp_path):
+        script = f"cd {tmp_path}\n\npwd\nfalse\nX=1\necho $X"
+        entries = list(vbox.script_stream("vm1", script))
+        assert [entry["line"] for entry in entries] == [1, 3, 4, 5, 6]
+        assert [entry["exit"] for entry in entries] == [0, 0, 1, 0, 0]
+        assert entries[1]["output"] == f"{tmp_path}\n"
+        assert entries[4] == {
+            "line": 6,
+            "command": "echo $X",
+            "output": "1\n",
+            "exit": 0,
+        }
+
+    def test_lines_cannot_read_the_script(self, vbox):
+        entries = list(vbox.script_stream("vm1", "cat\necho after"))
+        assert [entry["output"] for entry in entries] == ["", "after\n"]
+
+    def test_early_exit_is_reported(self, vbox):
+        entries = []
+        with pytest.raises(subprocess.CalledProcessError) as error:
+            for entry in vbox.script_stream("vm1", "echo a\nexit 3\necho never"):
+                entries.append(entry)
+        assert error.value.returncode == 3
+        assert [(entry["line"], entry["exit"]) for entry in entries] == [(1, 0), (2, 3)]
+        assert entries[0]["output"] == "a\n"
+
+    def test_large_script(self, vbox):
+        script = "\n".join(f"echo {i}" for i in range(5000))
+        entries = list(vbox.script_stream("vm1", script))
+        assert len(entries) == 5000
+        assert entries[-1]["output"] == "4999\n"
+
+    def test_consumer_stops_early(self, vbox):
+        start = time.monotonic()
+        entries = vbox.script_stream("vm1", "echo first\nsleep 10\necho never")
+        assert next(entries)["output"] == "first\n"
+        entries.close()
+        assert time.monotonic() - start < 5
+
+    def test_run_stream_stops_early(self, vbox):
+        start = time.monotonic()
+        lines = vbox.run_stream("vm1", "echo first; sleep 10; echo never")
+        assert next(lines) == "first\n"
+        lines.close()
+        assert time.monotonic() - start < 5
+
+    def test_script_stream_mode(self, vbox):
+        assert vbox.script("vm1", "echo a\necho b", mode="stream") == "a\nb\n"
@@ -0,0 +1,36 @@
+import subprocess
+
+import pytest
+
+from cloudmesh.vbox.fake import FakeVBoxManage
+from cloudmesh.vbox.vbox import BOOTED
+from cloudmesh.vbox.vbox import Vbox
+
+
+@pytest.fixture
+def vbox(tmp_path):
+    with FakeVBoxManage(vms=2):
+        yield Vbox(output="dict", catalog=str(tmp_path / "images.jsonl"))
+
+
+class TestBootSnapshot:
+    @pytest.mark.parametrize("state", ["powered off", "running", "saved"])
+    def test_image_keeps_its_state(self, vbox, state):
+        if state != "powered off":
+            vbox.start("vm1")
+        if state == "saved":
+            vbox.suspend("vm1")
+        vbox.create("fast", image="vm1", fast=True)
+        assert vbox.status("vm1", cached=False) == state
+        assert vbox.status("fast") == "saved"
+        assert BOOTED in vbox.snapshots("vm1")
+
+    def test_failed_boot_takes_no_snapshot(self, vbox, monkeypatch):
+        def timeout(vm, state, interval=5, timeout=60):
+            return {"vm": vm, "state": state, "status": "timeout"}
+
+        monkeypatch.setattr(vbox, "_wait", timeout)
+        with pytest.raises(subprocess.TimeoutExpired):
+            vbox.create("fast", image="vm1", fast=True)
+        assert vbox.status("vm1", cached=False) == "powered off"
+        assert vbox.snapshots("vm1") == []
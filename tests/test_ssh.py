@@ -0,0 +1,66 @@
+import asyncio
+import os
+import subprocess
+import time
+
+import pytest
+
+from cloudmesh.vbox.asyncvbox import AsyncVbox
+from cloudmesh.vbox.fake import FakeSsh
+from cloudmesh.vbox.ssh import SshPool
+
+
+@pytest.fixture
+def pool(tmp_path):
+    with FakeSsh(latency=0):
+        yield SshPool(directory=str(tmp_path), idle=0.2)
+
+
+def connect(pool, destination):
+    command = pool.command(destination, "echo hi")
+    return subprocess.run(command, capture_output=True, text=True).stdout
+
+
+class TestSshPool:
+    def test_master_is_reused(self, pool):
+        assert connect(pool, "u@vm1") == "hi\n"
+        assert os.path.exists(pool.control_path("u@vm1"))
+        assert connect(pool, "u@vm1") == "hi\n"
+        assert pool.used == {"u@vm1"}
+
+    def test_control_paths_are_short(self, pool):
+        path = pool.control_path("cloudmesh@" + "x" * 200)
+        assert len(os.path.basename(path)) == 16
+
+    def test_running_command_outlives_idle(self, pool):
+        command = pool.command("u@vm1", "sleep 0.5; echo done")
+        running = subprocess.Popen(command, stdout=subprocess.PIPE, text=True)
+        time.sleep(0.3)
+        assert connect(pool, "u@vm2") == "hi\n"
+        assert os.path.exists(pool.control_path("u@vm1"))
+        assert running.communicate()[0] == "done\n"
+        assert pool.used == {"u@vm1", "u@vm2"}
+
+    def test_close_all(self, pool):
+        connect(pool, "u@vm1")
+        connect(pool, "u@vm2")
+        pool.close_all()
+        assert pool.used == set()
+        assert os.listdir(pool.directory) == []
+
+    def test_async_commands_do_not_close_masters(self, pool, monkeypatch):
+        def blocking(destination):
+            raise AssertionError("the blocking close was called")
+
+        monkeypatch.setattr(pool, "close", blocking)
+        vbox = AsyncVbox(username="u", output="dict", ssh_pool=pool)
+
+        async def main():
+            running = asyncio.ensure_future(vbox.run("vm1", "sleep 0.5; echo done"))
+            await asyncio.sleep(0.3)
+            assert await vbox.run("vm2", "echo hi") == "hi\n"
+            assert await running == "done\n"
+
+        asyncio.run(main())
+        assert os.path.exists(pool.control_path("u@vm1"))
+        assert pool.used == {"u@vm1", "u@vm2"}
@@ -0,0 +1,64 @@
+import calendar
+
+import pytest
+
+from cloudmesh.vbox.store import DAY
+from cloudmesh.vbox.store import MetricStore
+
+# 2024-01-15 00:00:00 UTC
+START = calendar.timegm((2024, 1, 15, 0, 0, 0))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = MetricStore(str(tmp_path / "metrics"))
+    # two VMs, one sample per minute for an hour
+    store.append(
+        (START + 60 * i, vm, "CPU/Load/User", float(i + offset))
+        for i in range(60)
+        for vm, offset in [("vm1", 0), ("vm2", 100)]
+    )
+    return store
+
+
+class TestMetricStore:
+    def test_query(self, store):
+        history = store.query(
+            "CPU/Load/User", vm="vm1", start=START + 60, end=START + 180
+        )
+        assert history == {
+            "vm1": [(START + 60, 1.0), (START + 120, 2.0), (START + 180, 3.0)]
+        }
+        assert store.query("CPU/Load/User", vm="missing") == {}
+        assert store.query("RAM/Usage/Used") == {}
+
+    def test_summary(self, store):
+        assert store.summary("CPU/Load/User") == {
+            "vm1": {"mean": 29.5, "min": 0.0, "max": 59.0, "count": 60},
+            "vm2": {"mean": 129.5, "min": 100.0, "max": 159.0, "count": 60},
+        }
+
+    def test_vm_names_are_kept(self, store):
+        reopened = MetricStore(store.directory)
+        assert reopened.vms == ["vm1", "vm2"]
+        assert len(reopened.query("CPU/Load/User")["vm2"]) == 60
+
+    def test_compact_downsamples_expired_days(self, store):
+        before = store.summary("CPU/Load/User")
+        # raw samples are kept for 7 days
+        assert store.compact(now=START + 7 * DAY) == 0
+        assert store.compact(now=START + 8 * DAY) == 1
+        history = store.query("CPU/Load/User", vm="vm1")["vm1"]
+        # 5 minute means, stamped at the start of their bucket
+        assert history[:2] == [(START, 2.0), (START + 300, 7.0)]
+        assert len(history) == 12
+        # min, max and the number of raw samples survive the downsampling
+        assert store.summary("CPU/Load/User") == before
+
+    def test_compact_walks_all_resolutions(self, store):
+        before = store.summary("CPU/Load/User")
+        assert store.compact(now=START + 91 * DAY) == 2
+        assert len(store.query("CPU/Load/User", vm="vm1")["vm1"]) == 1
+        assert store.summary("CPU/Load/User") == before
+        assert store.compact(now=START + 731 * DAY) == 1
+        assert store.query("CPU/Load/User") == {}
@@ -0,0 +1,108 @@
+import os
+import subprocess
+import threading
+import time
+
+import pytest
+
+from cloudmesh.vbox.fake import FakeVBoxManage
+from cloudmesh.vbox.vbox import Vbox
+from cloudmesh.vbox.watcher import Watcher
+from cloudmesh.vbox.watcher import WatcherClient
+
+
+@pytest.fixture
+def watcher(tmp_path):
+    with FakeVBoxManage(vms=2) as fake:
+        watcher = Watcher(path=str(tmp_path / "watcher.sock"), interval=0.05)
+        watcher.start()
+        client = WatcherClient(watcher.path)
+        yield fake, watcher, client
+        client.close()
+        watcher.stop()
+
+
+class TestWatcher:
+    def test_status(self, watcher):
+        _, _, client = watcher
+        assert client.status("vm1") == "powered off"
+        assert client.status("missing") == "Unknown"
+        assert client.states() == {"vm1": "powered off", "vm2": "powered off"}
+        assert [vm["name"] for vm in client.inventory()] == ["vm1", "vm2"]
+
+    def test_unknown_command(self, watcher):
+        _, _, client = watcher
+        assert client.request(command="nothing") == {
+            "error": "unknown command: nothing"
+        }
+
+    def test_events(self, watcher):
+        _, server, client = watcher
+        events = client.events()
+        # the watcher confirmed the subscription
+        assert server.subscribers
+        subprocess.run(["VBoxManage", "startvm", "vm1"], check=True)
+        assert next(events) == {
+            "vm": "vm1",
+            "state": "running",
+            "previous": "powered off",
+        }
+        events.close()
+
+    def test_failed_poll_keeps_table(self, watcher):
+        fake, server, client = watcher
+        state = os.path.join(fake.directory, "vms.json")
+        with open(state) as f:
+            content = f.read()
+        # a broken state file makes the fake VBoxManage exit with an error
+        with open(state, "w") as f:
+            f.write("{")
+        assert server.poll() == []
+        assert client.status("vm1") == "powered off"
+        with open(state, "w") as f:
+            f.write(content)
+
+    def test_loop_survives_errors(self, watcher):
+        fake, server, client = watcher
+        executable = os.path.join(fake.directory, "VBoxManage")
+        os.rename(executable, executable + ".off")
+        with pytest.raises(FileNotFoundError):
+            server.poll()
+        os.rename(executable + ".off", executable)
+        subprocess.run(["VBoxManage", "startvm", "vm2"], check=True)
+        for _ in range(100):
+            if client.status("vm2") == "running":
+                break
+            server._stopped.wait(0.05)
+        assert client.status("vm2") == "running"
+
+    def test_events_end_at_timeout(self, watcher):
+        _, _, client = watcher
+        start = time.monotonic()
+        assert list(client.events(timeout=0.2)) == []
+        assert time.monotonic() - start < 1
+
+    def test_wait_blocks_on_events(self, watcher, tmp_path):
+        _, server, _ = watcher
+        vbox = Vbox(
+            watcher=server.path,
+            output="dict",
+            catalog=str(tmp_path / "images.jsonl"),
+        )
+        calls = []
+        states = vbox._watcher.states
+
+        def counted():
+            calls.append(time.monotonic())
+            return states()
+
+        vbox._watcher.states = counted
+        timer = threading.Timer(1.0, subprocess.run, [["VBoxManage", "startvm", "vm1"]])
+        timer.start()
+        start = time.monotonic()
+        assert vbox.wait_all(["vm1"], "running", timeout=10)[0]["status"] == "reached"
+        # polling would have checked five times and seen the change after 1.5 s
+        assert len(calls) == 2
+        assert time.monotonic() - start < 1.4
+        assert vbox.wait("vm2", "running", timeout=0.3)["status"] == "timeout"
+        vbox.close()